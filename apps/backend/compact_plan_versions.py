@@ -0,0 +1,34 @@
+"""
+One-time compaction: rewrite stored plan versions into keyframe + delta form.
+
+    python apps/backend/compact_plan_versions.py [--interval N] [--vacuum]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.db import init_db, compact_plan_versions, _conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interval", type=int, default=None, help="keyframe every N versions")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    init_db()
+    stats = compact_plan_versions(keyframe_interval=args.interval)
+    if args.vacuum:
+        conn = _conn()
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,39 @@
 import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from services.db import init_db, _conn
+from deps import get_current_user
+from services.db import (
+    init_db,
+    _conn,
+    pool_stats,
+    close_pool,
+    session_cache_stats,
+    plan_version_cache_stats,
+)
+from services.maintenance import expiry_sweeper
+from services.nutrition.batch import shutdown_batch_pool, start_batch_pool
+from services.nutrition.generation_cache import generation_cache_stats
+from routes.rules.result_cache import rules_cache_stats
 
 load_dotenv()
 init_db()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    expiry_sweeper.start()
+    start_batch_pool()
+    yield
+    await expiry_sweeper.stop()
+    shutdown_batch_pool()
+    close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 _DEV_ORIGINS = [
@@ -53,6 +77,21 @@ def health():
         "version": os.getenv("APP_VERSION", "dev"),
     }
 
+
+@app.get("/health/details")
+def health_details(user=Depends(get_current_user)):
+    # Pool, cache and sweeper counters; kept off the public /health.
+    sweeper = expiry_sweeper.stats()
+    sweeper.pop("last_error", None)
+    return {
+        "db_pool": pool_stats(),
+        "session_cache": session_cache_stats(),
+        "plan_version_cache": plan_version_cache_stats(),
+        "nutrition_generation_cache": generation_cache_stats(),
+        "rules_result_cache": rules_cache_stats(),
+        "expiry_sweeper": sweeper,
+    }
+
 # routers
 from routes.plans import router as plans_router
 from routes.nutrition import router as nutrition_router
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 from services.nutrition.generate import normalize_supported_diet
 
@@ -20,6 +20,9 @@ class NutritionMealSnapshot(BaseModel):
 
     key: str
     name: str
+    # Accepted meals only; lets incremental regenerate keep a meal as-is.
+    ingredients: Optional[List[Dict[str, Any]]] = None
+    macros: Optional[Dict[str, Any]] = None
 
 
 class NutritionVersionV1(BaseModel):
@@ -59,6 +62,20 @@ class NutritionGenerateResponse(BaseModel):
     plan_id: int
 
 
+class NutritionBatchGenerateRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: List[NutritionGenerateRequest] = Field(min_length=1)
+    # days > 1 plans consecutive days for a single item
+    days: int = Field(default=1, ge=1, le=14)
+
+    @model_validator(mode="after")
+    def validate_days(self) -> "NutritionBatchGenerateRequest":
+        if self.days > 1 and len(self.items) != 1:
+            raise ValueError("days > 1 needs exactly one item")
+        return self
+
+
 class NutritionRegenerateRequest(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -73,11 +90,26 @@ class NutritionRegenerateRequest(BaseModel):
     max_attempts: int = Field(ge=1, le=50)
     batch_size: int = Field(ge=1, le=20)
 
+    # Incremental mode: give one of these (0-based indices into
+    # prev_snapshot.accepted_meals) to re-pick only some slots.
+    replace_slots: Optional[List[int]] = None
+    lock_slots: Optional[List[int]] = None
+
     @field_validator("diet", mode="before")
     @classmethod
     def validate_diet(cls, value: Optional[str]) -> Optional[str]:
         return normalize_supported_diet(value)
 
+    @model_validator(mode="after")
+    def validate_slot_selection(self) -> "NutritionRegenerateRequest":
+        if self.replace_slots is not None and self.lock_slots is not None:
+            raise ValueError("Give replace_slots or lock_slots, not both")
+        n = len(self.prev_snapshot.accepted_meals)
+        for idx in (self.replace_slots or []) + (self.lock_slots or []):
+            if not 0 <= idx < n:
+                raise ValueError(f"Slot index {idx} out of range for {n} previous meals")
+        return self
+
 
 class NutritionRegenerateResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
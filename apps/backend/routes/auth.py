@@ -23,14 +23,11 @@ from services.db import (
     delete_user,
     create_login_code,
     verify_login_code,
-    purge_expired_login_codes,
     create_email_verification_token,
     consume_email_verification_token,
-    purge_expired_verification_tokens,
     create_password_reset_token,
     consume_password_reset_token,
     update_password_hash,
-    purge_expired_reset_tokens,
 )
 from deps import get_current_user
 from routes.dependencies import otp_rate_limit
@@ -171,11 +168,6 @@ async def request_code(req: RequestCodeRequest, _=Depends(otp_rate_limit)):
     code = str(secrets.randbelow(1_000_000)).zfill(6)
     code_hash = _hash_code(code)
 
-    try:
-        purge_expired_login_codes()
-    except Exception:
-        pass
-
     create_login_code(email, code_hash)
 
     try:
@@ -353,11 +345,6 @@ def password_login(req: PasswordLoginRequest, _=Depends(otp_rate_limit)):
 
 @router.get("/verify-email")
 def verify_email(token: str):
-    try:
-        purge_expired_verification_tokens()
-    except Exception:
-        pass
-
     user_id = consume_email_verification_token(token)
     if not user_id:
         raise HTTPException(status_code=400, detail="Verification link is invalid or has expired.")
@@ -424,11 +411,6 @@ def reset_password(req: ResetPasswordRequest):
     if len(req.password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
 
-    try:
-        purge_expired_reset_tokens()
-    except Exception:
-        pass
-
     user_id = consume_password_reset_token(req.token)
     if not user_id:
         raise HTTPException(status_code=400, detail="Reset link is invalid or has expired.")
@@ -1,12 +1,22 @@
 # apps/backend/routes/logs.py
-from fastapi import APIRouter, Query
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
 
-from services.db import init_db, add_log, get_logs
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Dict, Any, Iterator, Literal, Union
+
+from services.db import LOG_COLUMNS, add_log, add_logs_bulk, get_logs, iter_logs, list_logs_page
+from services.pagination import page_cursors, resolve_keyset
 
 router = APIRouter()
-init_db()  # ensure table + index exist once on import
+
+LOGS_BULK_MAX_ITEMS = int(os.getenv("LOGS_BULK_MAX_ITEMS", "200"))
+LOGS_EXPORT_CHUNK_SIZE = int(os.getenv("LOGS_EXPORT_CHUNK_SIZE", "500"))
 
 # Request model (what clients send)
 class Log(BaseModel):
@@ -26,6 +36,11 @@ class LogRow(BaseModel):
     focus: Optional[str] = None
     timestamp: str  # stored by SQLite as text
 
+class LogPage(BaseModel):
+    items: List[LogRow]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
 @router.post("/", response_model=Dict[str, LogRow])
 def add(log: Log):
     """Insert a log row and return it."""
@@ -33,8 +48,142 @@ def add(log: Log):
     # 'added' is a dict from services.db; validate to LogRow on the way out
     return {"added": LogRow(**added)}
 
-@router.get("/", response_model=List[LogRow])
-def all_logs(focus: Optional[str] = Query(None, description="Filter by focus (upper/lower/full)")):
-    """Return logs, newest first. Optional focus filter."""
-    rows = get_logs(focus)
-    return [LogRow(**r) for r in rows]
+@router.post("/bulk")
+def add_bulk(items: List[Dict[str, Any]]):
+    """
+    Insert a whole workout in one transaction. Each item is validated on its
+    own: valid items are inserted, invalid ones are reported by index.
+    """
+    if len(items) > LOGS_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items: {len(items)} > {LOGS_BULK_MAX_ITEMS}",
+        )
+
+    valid: List[tuple[int, Log]] = []
+    errors: List[Dict[str, Any]] = []
+    for index, raw in enumerate(items):
+        try:
+            valid.append((index, Log.model_validate(raw)))
+        except ValidationError as e:
+            errors.append(
+                {
+                    "index": index,
+                    "errors": [
+                        {"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()
+                    ],
+                }
+            )
+
+    ids = add_logs_bulk([(l.name, l.reps, l.weight_kg, l.rir, l.focus) for _, l in valid])
+    inserted = [{"index": index, "id": log_id} for (index, _), log_id in zip(valid, ids)]
+    return {"inserted": inserted, "errors": errors}
+
+def _sql_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Match SQLite's CURRENT_TIMESTAMP format (UTC); naive values are taken as UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _filters(
+    focus: Optional[str],
+    name: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> Dict[str, Optional[str]]:
+    return {
+        "focus": focus,
+        "name": name,
+        "since": _sql_timestamp(since),
+        "until": _sql_timestamp(until),
+    }
+
+
+@router.get("/", response_model=Union[List[LogRow], LogPage])
+def list_logs(
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; enables cursor paging (default 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor / prev_cursor"),
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=1),
+    focus: Optional[str] = Query(None, description="Filter by focus (upper/lower/full)"),
+    name: Optional[str] = Query(None, description="Filter by exact exercise name"),
+    since: Optional[datetime] = Query(None, description="Only sets logged at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only sets logged before this time"),
+):
+    """
+    Return logs, newest first.
+
+    Without paging params this is the full list, as before. Passing `limit`,
+    `cursor`, `before_id` or `after_id` returns one page as
+    {items, next_cursor, prev_cursor}.
+    """
+    filters = _filters(focus, name, since, until)
+    if limit is None and cursor is None and before_id is None and after_id is None:
+        return get_logs(**filters)
+
+    try:
+        before_id, after_id = resolve_keyset(cursor, before_id, after_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, has_more = list_logs_page(
+        limit=limit or 100,
+        before_id=before_id,
+        after_id=after_id,
+        **filters,
+    )
+    next_cursor, prev_cursor = page_cursors(items, has_more, before_id, after_id)
+    return {"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+def _ndjson_chunks(rows: Iterator[tuple], chunk_size: int) -> Iterator[str]:
+    buf: List[str] = []
+    for row in rows:
+        buf.append(json.dumps(dict(zip(LOG_COLUMNS, row)), separators=(",", ":")) + "\n")
+        if len(buf) >= chunk_size:
+            yield "".join(buf)
+            buf.clear()
+    if buf:
+        yield "".join(buf)
+
+
+def _csv_chunks(rows: Iterator[tuple], chunk_size: int) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(LOG_COLUMNS)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_size:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+            pending = 0
+    yield out.getvalue()
+
+
+@router.get("/export")
+def export_logs(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    focus: Optional[str] = Query(None, description="Filter by focus (upper/lower/full)"),
+    name: Optional[str] = Query(None, description="Filter by exact exercise name"),
+    since: Optional[datetime] = Query(None, description="Only sets logged at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only sets logged before this time"),
+):
+    """
+    Stream every matching log, newest first, as NDJSON or CSV. Rows are read
+    and written in LOGS_EXPORT_CHUNK_SIZE batches, so memory stays flat
+    regardless of table size.
+    """
+    chunk = max(1, LOGS_EXPORT_CHUNK_SIZE)
+    rows = iter_logs(**_filters(focus, name, since, until), chunk_size=chunk)
+    if format == "csv":
+        return StreamingResponse(
+            _csv_chunks(rows, chunk),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="logs.csv"'},
+        )
+    return StreamingResponse(_ndjson_chunks(rows, chunk), media_type="application/x-ndjson")
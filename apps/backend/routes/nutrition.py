@@ -1,21 +1,34 @@
 from __future__ import annotations
 
+import queue
 import re
+import threading
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Callable, Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from services.nutrition.generate import GenerationRequest, generate_safe_meals
+from services.nutrition.allergens import allergen_mask, build_allergen_set, meal_rejection_reason
+from services.nutrition.generate import (
+    GenerationRequest,
+    GenerationResult,
+    generate_safe_meals,
+    required_diet_tags_for_user,
+)
 from services.nutrition.regenerate import regenerate_nutrition_v1
 from services.nutrition.versioning import (
     NutritionTargets,
+    NutritionVersionV1,
     diff_nutrition,
     explain_nutrition_diff,
 )
-from services.nutrition.stub_meals import generate_stub_meals
+from services.nutrition.stub_meals import generate_stub_days, generate_stub_meals, regenerate_stub_slots
 from services.nutrition.macros import calculate_macro_calc_v4_metric
 
 from models.nutrition import (
+    NutritionBatchGenerateRequest,
     NutritionGenerateRequest,
     NutritionGenerateResponse,
     NutritionRegenerateRequest,
@@ -23,8 +36,11 @@ from models.nutrition import (
     MacroCalcRequest,
     MacroCalcResponse,
 )
+from services.nutrition.batch import NUTRITION_BATCH_MAX_ITEMS, run_batch
 from services.nutrition.boosters import apply_calorie_fill_boosters
+from services.nutrition.generation_cache import cached_generation, generation_cache_key
 from deps import get_current_user
+from services.pagination import page_cursors, resolve_keyset
 
 
 
@@ -131,7 +147,10 @@ def _fail_closed_calorie_guard(target: int | None, accepted: list[dict]) -> None
 
 def _stub_llm_generate(req: GenerationRequest, attempt: int):
     stub = generate_stub_meals(req, attempt)
-    meals = stub.get("meals", [])
+    return _stub_llm_meals(stub.get("meals", []), req, attempt)
+
+
+def _stub_llm_meals(meals, req: GenerationRequest, attempt: int) -> list[dict]:
     if not isinstance(meals, list):
         return []
 
@@ -162,6 +181,184 @@ def _stub_llm_generate(req: GenerationRequest, attempt: int):
 
     return out
 
+
+def _run_with_boosters(
+    gen_req: GenerationRequest,
+    booster_target: int | None,
+    llm,
+) -> GenerationResult:
+    gen = generate_safe_meals(gen_req, llm)
+    if booster_target is not None:
+        apply_calorie_fill_boosters(
+            meals=gen.accepted,
+            target_calories=booster_target,
+            diet=gen_req.diet,
+            allergies=gen_req.allergies,
+        )
+    return gen
+
+
+def _generate_with_boosters(
+    gen_req: GenerationRequest,
+    selected_target: int | None,
+    attempt_offset: int = 0,
+) -> GenerationResult:
+    """Stub generation + calorie boosters, memoized on the canonical request."""
+    booster_target = int(selected_target) if selected_target is not None else None
+
+    def _run() -> GenerationResult:
+        return _run_with_boosters(
+            gen_req,
+            booster_target,
+            lambda r, attempt: _stub_llm_generate(r, attempt + attempt_offset),
+        )
+
+    return cached_generation(
+        generation_cache_key(gen_req, attempt_offset, booster_target),
+        _run,
+    )
+
+
+# Incremental picks must close to within this of target_calories (the stub's
+# calorie-close tolerance); only the replaced meals can absorb the difference.
+INCREMENTAL_CALORIE_TOLERANCE = 100
+
+
+def _incremental_attempt(
+    gen_req: GenerationRequest,
+    prev_meals: list[dict],
+    replace: set[int],
+    version: int,
+    attempt: int,
+    selected_target: int | None,
+) -> tuple[list[dict], set[int]] | None:
+    """One slot re-pick: (accepted meals, replaced indices), or None if it missed."""
+    try:
+        stub = regenerate_stub_slots(gen_req, prev_meals, replace, attempt)
+    except ValueError:
+        return None
+
+    replaced = set(stub["meta"]["replaced"])
+    carried = set(stub["meta"]["carried"])
+    allergen_set = build_allergen_set(gen_req.allergies)
+    blocked_mask = allergen_mask(allergen_set)
+    required_diet = required_diet_tags_for_user(gen_req.diet)
+
+    accepted: list[dict] = []
+    for i, m in enumerate(stub["meals"]):
+        m = dict(m)
+        m["template_key"] = m.get("key")
+        m["key"] = f"meal_{i+1}_(attempt_{version})" if i in replaced else prev_meals[i]["key"]
+        # The stub only offers safe templates; kept fail-closed regardless.
+        # Carried meals were checked by the stub without their booster rows.
+        if i not in carried and meal_rejection_reason(
+            m, allergen_set, required_diet_tags=required_diet, blocked_mask=blocked_mask
+        ):
+            return None
+        accepted.append(m)
+
+    if selected_target is not None and replaced:
+        kept_total = _sum_plan_calories([m for i, m in enumerate(accepted) if i not in replaced])
+        apply_calorie_fill_boosters(
+            meals=[accepted[i] for i in sorted(replaced)],
+            target_calories=int(selected_target) - kept_total,
+            diet=gen_req.diet,
+            allergies=gen_req.allergies,
+        )
+        if abs(_sum_plan_calories(accepted) - int(selected_target)) > INCREMENTAL_CALORIE_TOLERANCE:
+            return None
+    return accepted, replaced
+
+
+def _regenerate_incremental(
+    req: NutritionRegenerateRequest,
+    targets: NutritionTargets,
+    selected_target: int | None,
+) -> NutritionRegenerateResponse:
+    """
+    Re-pick only the requested slots of prev_snapshot; the rest keep their
+    snapshot key and, when the snapshot carries them and diet/allergies are
+    unchanged, their exact ingredients and macros. Boosters only touch the
+    replaced meals.
+
+    Like the full path, picks are retried over `max_attempts` seeds. When no
+    attempt is safe and on target (e.g. the kept meals leave too little
+    room), the whole day is regenerated instead and every slot is reported
+    as replaced.
+    """
+    prev_meals = [m.model_dump() for m in req.prev_snapshot.accepted_meals]
+    n = len(prev_meals)
+    prev_constraints = req.prev_snapshot.constraints_snapshot
+    if (
+        prev_constraints.get("diet") != req.diet
+        or build_allergen_set(list(prev_constraints.get("allergies") or [])) != build_allergen_set(req.allergies)
+    ):
+        # Boosters in the kept meals were chosen for other constraints: rebuild them.
+        for m in prev_meals:
+            m["ingredients"] = m["macros"] = None
+    if req.replace_slots is not None:
+        replace = set(req.replace_slots)
+    else:
+        replace = set(range(n)) - set(req.lock_slots or [])
+
+    prev_version = int(req.prev_snapshot.version)
+    version = prev_version + 1
+    gen_req = GenerationRequest(
+        diet=req.diet,
+        allergies=req.allergies,
+        meals_needed=n,
+        max_attempts=req.max_attempts,
+        batch_size=n,
+        target_calories=float(selected_target) if selected_target is not None else None,
+        calorie_cap_per_meal=int((selected_target / n) * 2.0) if selected_target is not None and n else None,
+    )
+
+    picked = None
+    attempts_used = 0
+    for attempt in range(1, gen_req.max_attempts + 1):
+        attempts_used = attempt
+        picked = _incremental_attempt(
+            gen_req, prev_meals, replace, version, prev_version + attempt, selected_target
+        )
+        if picked is not None:
+            break
+
+    if picked is None:
+        full = _regenerate_full(req, targets, selected_target)
+        full.output["replaced_slots"] = list(range(len(full.output["accepted"])))
+        return full
+
+    accepted, replaced = picked
+    _fail_closed_calorie_guard(selected_target, accepted)
+
+    output = {
+        "accepted": accepted,
+        "rejected": [],
+        "attempts_used": attempts_used,
+        "targets": targets,
+        "replaced_slots": sorted(replaced),
+    }
+
+    from services.nutrition.versioning import build_nutrition_version_v1
+
+    snap = build_nutrition_version_v1(
+        version=version,
+        targets=targets,
+        accepted_meals=accepted,
+        rejected_meals=[],
+        constraints_snapshot=_constraints_snapshot(req),
+    )
+
+    diff = diff_nutrition(req.prev_snapshot.model_dump(), snap)
+
+    return NutritionRegenerateResponse(
+        output=output,
+        version_snapshot=snap,
+        diff=diff,
+        explanations=explain_nutrition_diff(diff),
+    )
+
+
 def _constraints_snapshot(req: NutritionGenerateRequest | NutritionRegenerateRequest) -> dict:
     return {
         "diet": req.diet,
@@ -173,8 +370,10 @@ def _constraints_snapshot(req: NutritionGenerateRequest | NutritionRegenerateReq
     }
 
 
-@router.post("/generate", response_model=NutritionGenerateResponse)
-def nutrition_generate(req: NutritionGenerateRequest, user=Depends(get_current_user)):
+def _generation_request(
+    req: NutritionGenerateRequest,
+) -> tuple[NutritionTargets, int | None, float | None, GenerationRequest]:
+    """(targets, selected target, calories used for defaults, generation request)."""
     targets: NutritionTargets = req.targets.model_dump()
     selected_target = _selected_target_from_req(req, targets)
 
@@ -202,16 +401,27 @@ def nutrition_generate(req: NutritionGenerateRequest, user=Depends(get_current_u
         target_calories=float(selected_target) if selected_target is not None else None,
         calorie_cap_per_meal=per_meal_cap,
     )
+    return targets, selected_target, tc, gen_req
 
-    gen = generate_safe_meals(gen_req, _stub_llm_generate)
 
-    selected_target = _selected_target_from_req(req, targets)
-    if selected_target is not None:
-        apply_calorie_fill_boosters(
-            meals=gen.accepted,
-            target_calories=int(selected_target),
-            diet=req.diet,
-            allergies=req.allergies,
+def _generate_plan(
+    req: NutritionGenerateRequest,
+    day_meals: Optional[list[dict]] = None,
+) -> tuple[dict, NutritionVersionV1, str]:
+    """
+    Generate one plan: (output, version snapshot, default title). Nothing is
+    saved. `day_meals` (one day of generate_stub_days) replaces the stub
+    generator; such plans go through the same checks but skip the cache.
+    """
+    targets, selected_target, tc, gen_req = _generation_request(req)
+
+    if day_meals is None:
+        gen = _generate_with_boosters(gen_req, selected_target)
+    else:
+        gen = _run_with_boosters(
+            gen_req,
+            int(selected_target) if selected_target is not None else None,
+            lambda r, attempt: _stub_llm_meals(day_meals, r, attempt),
         )
 
     _fail_closed_calorie_guard(selected_target, gen.accepted)
@@ -234,10 +444,17 @@ def nutrition_generate(req: NutritionGenerateRequest, user=Depends(get_current_u
         "targets": targets,
     }
 
-    import json as _json
-    from services import db as _db
     diet_label = f"{req.diet} · " if req.diet else ""
     title = f"Nutrition — {diet_label}{int(tc)} kcal"
+    return output, snap, title
+
+
+@router.post("/generate", response_model=NutritionGenerateResponse)
+def nutrition_generate(req: NutritionGenerateRequest, user=Depends(get_current_user)):
+    output, snap, title = _generate_plan(req)
+
+    import json as _json
+    from services import db as _db
     saved = _db.add_nutrition_plan(
         title=title,
         input_json=_json.dumps(req.model_dump()),
@@ -247,10 +464,137 @@ def nutrition_generate(req: NutritionGenerateRequest, user=Depends(get_current_u
 
     return NutritionGenerateResponse(output=output, version_snapshot=snap, plan_id=saved["id"])
 
+
+def _batch_job(job: tuple[dict, int, Optional[list[dict]]]) -> dict:
+    """
+    Process-pool entry point: one (request payload, day, scheduled meals)
+    job. Every error comes back as a value so one bad item doesn't end the
+    batch (or cut the stream short after its 200 headers).
+    """
+    payload, _day, day_meals = job
+    try:
+        req = NutritionGenerateRequest.model_validate(payload)
+        output, snap, title = _generate_plan(req, day_meals=day_meals)
+    except HTTPException as e:
+        return {"ok": False, "status": e.status_code, "detail": e.detail}
+    except ValueError as e:
+        return {"ok": False, "status": 400, "detail": str(e)}
+    except Exception as e:
+        return {"ok": False, "status": 500, "detail": f"Internal error: {type(e).__name__}"}
+    return {"ok": True, "output": output, "version_snapshot": snap, "title": title}
+
+
+def _run_and_save_batch(
+    jobs: list[tuple[dict, int, Optional[list[dict]]]],
+    days: int,
+    owner_id: int,
+    emit: Callable[[Optional[dict]], None],
+) -> None:
+    """Run every job, emit one line per result, save, then emit the final line."""
+    import json as _json
+    from services import db as _db
+
+    try:
+        done: dict[int, dict] = {}
+        for index, result in run_batch(_batch_job, jobs):
+            done[index] = result
+            line: dict[str, Any] = {"index": index}
+            if days > 1:
+                line["day"] = jobs[index][1] + 1
+            line.update({k: v for k, v in result.items() if k != "title"})
+            emit(line)
+
+        # Everything that succeeded is saved together once the batch is done.
+        saved_order = [i for i in range(len(jobs)) if done[i]["ok"]]
+        rows = []
+        for i in saved_order:
+            payload, day, _ = jobs[i]
+            title = done[i]["title"] + (f" · day {day + 1}" if days > 1 else "")
+            rows.append((title, _json.dumps(payload), _json.dumps(done[i]["output"]), owner_id))
+        try:
+            ids = _db.add_nutrition_plans_bulk(rows)
+        except Exception as e:
+            # Nothing was saved (one transaction); say so instead of just ending.
+            emit({"done": False, "error": f"Saving plans failed: {type(e).__name__}"})
+            return
+
+        plan_ids: list[Optional[int]] = [None] * len(jobs)
+        for i, plan_id in zip(saved_order, ids):
+            plan_ids[i] = plan_id
+        emit({"done": True, "plan_ids": plan_ids})
+    finally:
+        emit(None)
+
+
+def _batch_lines(jobs: list[tuple[dict, int, Optional[list[dict]]]], days: int, owner_id: int) -> Iterator[str]:
+    """
+    Stream NDJSON lines from a producer thread. The producer runs and saves
+    the whole batch whether or not the client keeps reading, so a
+    disconnect doesn't lose plans that were already generated.
+    """
+    import json as _json
+
+    lines: queue.Queue[Optional[dict]] = queue.Queue()
+    threading.Thread(
+        target=_run_and_save_batch,
+        args=(jobs, days, owner_id, lines.put),
+        name="nutrition-batch-producer",
+        daemon=True,
+    ).start()
+    while True:
+        line = lines.get()
+        if line is None:
+            return
+        yield _json.dumps(line, separators=(",", ":")) + "\n"
+
+
+@router.post("/generate/batch")
+def nutrition_generate_batch(req: NutritionBatchGenerateRequest, user=Depends(get_current_user)):
+    """
+    Generate many plans in one call: one per item, or one per day when
+    `days` > 1 (days are scheduled together for cross-day variety). Streams one NDJSON line per plan as it finishes (in
+    completion order, tagged with its index), then a final line with the
+    saved plan ids once all plans are stored in a single transaction (or
+    {"done": false, "error": ...} if that transaction fails). Plans are
+    saved even if the client disconnects before the final line.
+    """
+    n = len(req.items) * req.days
+    if n > NUTRITION_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items: {n} > {NUTRITION_BATCH_MAX_ITEMS}",
+        )
+
+    if req.days > 1:
+        item = req.items[0]
+        gen_req = _generation_request(item)[3]
+        try:
+            week = generate_stub_days(gen_req, req.days, attempt=1)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        jobs = [(item.model_dump(), day, week[day]["meals"]) for day in range(req.days)]
+    else:
+        jobs = [(item.model_dump(), 0, None) for item in req.items]
+    return StreamingResponse(
+        _batch_lines(jobs, req.days, user["id"]),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.post("/regenerate", response_model=NutritionRegenerateResponse)
 def nutrition_regenerate(req: NutritionRegenerateRequest, _=Depends(get_current_user)):
     targets: NutritionTargets = req.targets.model_dump()
     selected_target = _selected_target_from_req(req, targets)
+    if req.replace_slots is not None or req.lock_slots is not None:
+        return _regenerate_incremental(req, targets, selected_target)
+    return _regenerate_full(req, targets, selected_target)
+
+
+def _regenerate_full(
+    req: NutritionRegenerateRequest,
+    targets: NutritionTargets,
+    selected_target: int | None,
+) -> NutritionRegenerateResponse:
     tc = float(selected_target) if selected_target is not None else _infer_target_calories(targets)
 
     meals_needed_final = int(req.meals_needed)
@@ -279,19 +623,7 @@ def nutrition_regenerate(req: NutritionRegenerateRequest, _=Depends(get_current_
 
     attempt_offset = int(req.prev_snapshot.version)
 
-    gen = generate_safe_meals(
-        gen_req,
-        lambda r, attempt: _stub_llm_generate(r, attempt + attempt_offset),
-    )
-
-    selected_target = _selected_target_from_req(req, targets)
-    if selected_target is not None:
-        apply_calorie_fill_boosters(
-            meals=gen.accepted,
-            target_calories=int(selected_target),
-            diet=req.diet,
-            allergies=req.allergies,
-        )
+    gen = _generate_with_boosters(gen_req, selected_target, attempt_offset)
 
     _fail_closed_calorie_guard(selected_target, gen.accepted)
 
@@ -323,6 +655,8 @@ def nutrition_regenerate(req: NutritionRegenerateRequest, _=Depends(get_current_
         diff=diff,
         explanations=explanations,
     )
+
+
 @router.post("/macro-calc", response_model=MacroCalcResponse)
 def macro_calc(req: MacroCalcRequest, _=Depends(get_current_user)):
     # Fail-closed validation (keep deterministic + explicit)
@@ -373,10 +707,23 @@ def macro_calc(req: MacroCalcRequest, _=Depends(get_current_user)):
 
 
 @router.get("/plans")
-def list_my_nutrition_plans(user=Depends(get_current_user)):
+def list_my_nutrition_plans(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor / prev_cursor"),
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=1),
+    user=Depends(get_current_user),
+):
     from services import db as _db
-    items = _db.list_nutrition_plans(owner_id=user["id"])
-    return {"items": items}
+    try:
+        before_id, after_id = resolve_keyset(cursor, before_id, after_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items, has_more = _db.list_nutrition_plans_page(
+        owner_id=user["id"], limit=limit, before_id=before_id, after_id=after_id
+    )
+    next_cursor, prev_cursor = page_cursors(items, has_more, before_id, after_id)
+    return {"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
 
 
 @router.get("/plans/{plan_id}")
@@ -7,9 +7,11 @@ import copy
 from services.db import (
     add_plan,
     list_plans,
+    list_plans_page,
     get_plan,
     get_latest_plan_version,
     list_plan_versions,
+    list_plan_version_summaries,
     create_plan_version,
     get_plan_version,
     set_active_plan,
@@ -18,6 +20,8 @@ from services.db import (
 )
 
 
+from typing import Literal, Optional
+
 from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel
 from deps import get_optional_current_user, get_current_user
@@ -34,9 +38,11 @@ from models.plans import (
 
 
 from .rules.engine import apply_rules_v1
+from .rules.result_cache import cached_apply_rules
 from openai import OpenAI
 from datetime import datetime, timezone
 from services.plan_diff import compute_plan_diff
+from services.pagination import page_cursors, resolve_keyset
 
 
 
@@ -194,6 +200,7 @@ def generate_plan(req: GeneratePlanRequest, user=Depends(get_optional_current_us
         data = json.loads(content)
 
         plan = GeneratePlanResponse(**data)
+        # fresh LLM output never repeats: cache only the apply path
         plan = apply_rules_v1(plan=plan, req=req)
 
         # Build Phase 1 input_state (stored with version 1)
@@ -243,10 +250,25 @@ def generate_plan(req: GeneratePlanRequest, user=Depends(get_optional_current_us
 def list_saved_plans(
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor / prev_cursor"),
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=1),
     user=Depends(get_current_user),
 ):
-    rows = list_plans(limit=limit, offset=offset, owner_id=user["id"])
-    active_plan_id = get_user_active_plan(user["id"])
+    next_cursor = prev_cursor = None
+    if offset:
+        # Legacy offset paging; prefer cursors, which stay fast on deep pages.
+        rows = list_plans(limit=limit, offset=offset, owner_id=user["id"])
+        active_plan_id = get_user_active_plan(user["id"])
+    else:
+        try:
+            before_id, after_id = resolve_keyset(cursor, before_id, after_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        rows, has_more, active_plan_id = list_plans_page(
+            owner_id=user["id"], limit=limit, before_id=before_id, after_id=after_id
+        )
+        next_cursor, prev_cursor = page_cursors(rows, has_more, before_id, after_id)
 
     items = []
     for r in rows:
@@ -254,7 +276,14 @@ def list_saved_plans(
         item["plan_id"] = item.pop("id")
         items.append(item)
 
-    return {"items": items, "limit": limit, "offset": offset, "active_plan_id": active_plan_id}
+    return {
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "active_plan_id": active_plan_id,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
 
 
 @router.get("/{plan_id}", summary="Get a saved plan by id")
@@ -371,19 +400,54 @@ def edit_saved_plan(plan_id: int, body: EditPlanRequest, user: dict = Depends(ge
     )
 
 @router.get("/{plan_id}/versions", summary="List versions for a plan")
-def get_plan_versions(plan_id: int, user: dict = Depends(get_current_user)):
+def get_plan_versions(
+    plan_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    before_version: Optional[int] = Query(None, ge=1),
+    view: Literal["full", "summary"] = Query("full"),
+    user: dict = Depends(get_current_user),
+):
     row = get_plan(plan_id)
     if not row or row.get("owner_id") != user["id"]:
         raise HTTPException(status_code=404, detail="Plan not found")
 
-    items = list_plan_versions(plan_id)
+    if view == "summary":
+        # Lightweight sidebar listing; fetch full versions via /versions/{version}
+        items = list_plan_version_summaries(plan_id, limit=limit, before_version=before_version)
+    else:
+        items = list_plan_versions(plan_id, limit=limit, before_version=before_version)
+        for it in items:
+            is_restored, restored_from = extract_restore_meta(it.get("diff"))
+            it["is_restored"] = is_restored
+            it["restored_from"] = restored_from
+
+    next_before_version = None
+    if limit is not None and len(items) == limit and items[-1]["version"] > 1:
+        next_before_version = items[-1]["version"]
+
+    return {"plan_id": plan_id, "items": items, "next_before_version": next_before_version}
 
-    for it in items:
-        is_restored, restored_from = extract_restore_meta(it.get("diff"))
-        it["is_restored"] = is_restored
-        it["restored_from"] = restored_from
 
-    return {"plan_id": plan_id, "items": items}
+@router.get("/{plan_id}/versions/{version}", summary="Get one version of a plan")
+def get_single_plan_version(plan_id: int, version: int, user: dict = Depends(get_current_user)):
+    row = get_plan(plan_id)
+    if not row or row.get("owner_id") != user["id"]:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
+    target = get_plan_version(plan_id, version)
+    if not target:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    is_restored, restored_from = extract_restore_meta(target.get("diff"))
+    return PlanResponse(
+        plan_id=plan_id,
+        version=target["version"],
+        input=target["input"],
+        output=target["output"],
+        diff=target.get("diff"),
+        is_restored=is_restored,
+        restored_from=restored_from,
+    )
 
 # Phase 1 note:
 # - constraints_tokens are enforced immediately in the rules engine
@@ -476,7 +540,7 @@ def apply_plan_patch(plan_id: int, patch: PlanEditPatch, user: dict = Depends(ge
     req_fields = {k: new_input.get(k) for k in GeneratePlanRequest.model_fields.keys()}
     req_obj = SimpleNamespace(**req_fields, avoid=new_input.get("avoid", []))
     plan_obj = GeneratePlanResponse(**base_output)
-    new_plan_obj = apply_rules_v1(plan=plan_obj, req=req_obj)
+    new_plan_obj = cached_apply_rules(plan_obj, req_obj)
 
     new_output = new_plan_obj.model_dump()
         # Reason hint for explainable diffs (deterministic; derived only from patch)
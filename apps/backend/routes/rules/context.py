@@ -0,0 +1,137 @@
+"""
+Per-request rule context.
+
+Everything the rules engine derives from the request (equipment bans and
+preferences parsed from constraints text, tokens and avoid lists, the
+equipment bitmask, the expanded focus set) is computed once per
+apply_rules_v1 call and handed to every helper, instead of each helper
+re-parsing the request per day or per template slot.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, FrozenSet, List, Optional
+
+from routes.rules.exercise_index import (
+    EQ_BARBELL,
+    EQ_BODYWEIGHT,
+    EQ_CABLE,
+    EQ_DUMBBELL,
+    EQ_MACHINE,
+    _FOCUS_TAG_ALIASES,
+    classify,
+)
+
+_DB_PAT = re.compile(r"\bdumbbell(s)?\b|\bdb\b", re.I)
+
+# Natural-language forms of the Phase 1 tokens (matched on lower-cased constraints)
+_NO_DUMBBELLS_RE = re.compile(r"\bno\s+dumbbells?\b|\bavoid\s+dumbbells?\b")
+_NO_BARBELLS_RE = re.compile(r"\bno\s+barbells?\b|\bavoid\s+barbells?\b")
+_PREFER_MACHINES_RE = re.compile(r"\bprefer\s+machines?\b|\bmachines?\s+only\b")
+_PREFER_CABLES_RE = re.compile(r"\bprefer\s+cables?\b|\bcables?\s+only\b")
+_AVOID_SHOULDERS_RE = re.compile(r"\bavoid\s+shoulders?\b")
+
+# equipment -> (bits of which at least one is required, bits that are forbidden)
+_EQUIPMENT_MASKS = {
+    "bodyweight": (EQ_BODYWEIGHT, EQ_DUMBBELL | EQ_BARBELL | EQ_MACHINE | EQ_CABLE),
+    "dumbbells": (EQ_DUMBBELL | EQ_BODYWEIGHT, EQ_BARBELL | EQ_MACHINE | EQ_CABLE),
+}
+
+
+def _expand_focus_set(focus_muscles: List[str]) -> frozenset:
+    """Expand broad muscle group names to the specific tags used in the exercise catalog."""
+    expanded: set = set()
+    for m in focus_muscles:
+        ml = m.lower()
+        expanded.update(_FOCUS_TAG_ALIASES.get(ml, {ml}))
+    return frozenset(expanded)
+
+
+@dataclass(frozen=True)
+class RuleContext:
+    req: Any
+    text: str                       # lower-cased constraints
+    equipment: str
+    equipment_required: int         # EQ_* bits; 0 means any equipment
+    equipment_forbidden: int
+    no_dumbbells: bool
+    no_barbells: bool
+    prefer_machines: bool
+    prefer_cables: bool
+    avoid_shoulders: bool
+    wants_machines: bool
+    wants_barbells: bool
+    focus_muscles: Optional[List[str]]
+    focus_set: FrozenSet[str]       # catalog tags covered by focus_muscles
+    session_minutes: int
+    has_sharms: bool = False
+
+    @classmethod
+    def build(cls, req: Any, has_sharms: bool = False) -> "RuleContext":
+        text = (req.constraints or "").lower()
+        avoid_tokens = {str(x).strip().lower() for x in (getattr(req, "avoid", None) or [])}
+        # Phase 1 canonical tokens (preferred)
+        tokens = set((getattr(req, "constraints_tokens", None) or []) + (getattr(req, "preferences_tokens", None) or []))
+
+        # Support both old natural language ("no barbells") and new token format ("BANS: no_barbells")
+        no_dumbbells = "no_dumbbells" in tokens or bool(_NO_DUMBBELLS_RE.search(text)) or "no_dumbbells" in text
+        no_barbells = "no_barbells" in tokens or bool(_NO_BARBELLS_RE.search(text)) or "no_barbells" in text
+        prefer_machines = (
+            "prefer_machines" in tokens or bool(_PREFER_MACHINES_RE.search(text)) or "prefer_machines" in text
+        )
+        prefer_cables = "prefer_cables" in tokens or bool(_PREFER_CABLES_RE.search(text)) or "prefer_cables" in text
+        # Prefer req.avoid tokens (explicit avoidance list) but fall back to parsing constraints text
+        avoid_shoulders = (
+            "shoulders" in avoid_tokens
+            or "avoid_shoulders" in avoid_tokens
+            or "avoid: shoulders" in text
+            or "avoid_shoulders" in text
+            or bool(_AVOID_SHOULDERS_RE.search(text))
+        )
+
+        # Derive equipment bans from the structured equipment field
+        equipment = getattr(req, "equipment", "full_gym")
+        if equipment == "dumbbells":
+            no_barbells = True
+        elif equipment == "bodyweight":
+            no_barbells = True
+            no_dumbbells = True
+        required, forbidden = _EQUIPMENT_MASKS.get(equipment, (0, 0))
+
+        focus_muscles = req.focus_muscles
+        return cls(
+            req=req,
+            text=text,
+            equipment=equipment,
+            equipment_required=required,
+            equipment_forbidden=forbidden,
+            no_dumbbells=no_dumbbells,
+            no_barbells=no_barbells,
+            prefer_machines=prefer_machines,
+            prefer_cables=prefer_cables,
+            avoid_shoulders=avoid_shoulders,
+            wants_machines="machine" in text,  # also covers "prefer machines" / "machines only"
+            wants_barbells=not no_barbells and ("prefer barbell" in text or "barbells preferred" in text),
+            focus_muscles=focus_muscles,
+            focus_set=_expand_focus_set(focus_muscles) if focus_muscles else frozenset(),
+            session_minutes=req.session_minutes,
+            has_sharms=has_sharms,
+        )
+
+    def allows(self, name: str) -> bool:
+        """True if `name` fits the request's equipment."""
+        if not self.equipment_required:
+            return True
+        eq = classify(name).equipment
+        return bool(eq & self.equipment_required) and not eq & self.equipment_forbidden
+
+    def violates_bans(self, name: str) -> bool:
+        """String-level check against the parsed no_dumbbells / no_barbells bans."""
+        n = (name or "").lower()
+        if self.no_dumbbells and (_DB_PAT.search(n) or "dumbbell" in n):
+            return True
+        if self.no_barbells and classify(n).equipment & EQ_BARBELL:
+            return True
+        return False
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import replace
 from typing import List, Optional, Tuple
 
 from models.plans import GeneratePlanRequest, GeneratePlanResponse, DayPlan, ExerciseItem
@@ -7,16 +8,23 @@ from models.plans import GeneratePlanRequest, GeneratePlanResponse, DayPlan, Exe
 from routes.rules.exercise_catalog import (
     EXERCISES,
     is_compound,
-    is_isolation,
+    all_isolations,
     get_isolations_for_focus,
     get_compounds_for_focus,
     normalize_name,
 )
-
-import re
+from routes.rules.exercise_index import (
+    EQ_BARBELL,
+    EQ_BODYWEIGHT,
+    EQ_CABLE,
+    EQ_DUMBBELL,
+    EQ_MACHINE,
+    classify,
+)
+from routes.rules.context import _DB_PAT, RuleContext, _expand_focus_set
+from routes.rules.passes import DayJob, PassRunner, RulePass, RuleTrace
 
 
-_CANON = {k.lower(): k for k in EXERCISES.keys()}
 # -----------------------------
 # LyftLogic v2 priorities (minimal set for templates)
 # -----------------------------
@@ -73,9 +81,6 @@ CABLE_CRUNCH = ["Cable Crunch"]
 FLAT_PRESS = ["Machine Chest Press", "Smith Machine Bench Press", "Chest Press", "Dumbbell Bench Press", "Push-Ups"]
 UPPER_BACK_ROW = ["Chest Supported Row", "Machine Row", "Hammer Strength Row", "Seated Cable Row", "T-Bar Row", "Single Arm Dumbbell Rows", "Inverted Rows"]
 
-
-_DB_PAT = re.compile(r"\bdumbbell(s)?\b|\bdb\b", re.I)
-
 # Minimal swap map: feel free to expand over time
 _SWAP = {
     # curls
@@ -130,134 +135,37 @@ def _lc(s: Optional[str]) -> str:
     return (s or "").strip().lower()
 
 def _canon_like(name: str) -> Optional[str]:
-    n = normalize_name(name)          # your normalize_name
-    if not n:
-        return None
-    # try exact canonical
-    canon = _CANON.get(n.lower())
-    if canon:
-        return canon
-    # fallback: substring contains match (handles punctuation / parenthesis diffs)
-    for k in EXERCISES.keys():
-        if normalize_name(k) == n:
-            return k
-    return None
+    return classify(name).canon
 
 
-def _wants_machines(req: GeneratePlanRequest) -> bool:
-    c = _lc(req.constraints)
-    return "prefer machines" in c or "machines only" in c or "machine" in c
-
-def _wants_barbells(req: GeneratePlanRequest) -> bool:
-    flags = _notes_flags(req)
-    if flags["no_barbells"]:
-        return False
-    c = _lc(req.constraints)
-    return "prefer barbell" in c or "barbells preferred" in c
-
 def _is_barbell_like(name: str) -> bool:
-    n = _lc(name)
-    if "dumbbell" in n or "db " in f"{n} ":
-        return False
-    return any(k in n for k in (
-        "barbell",
-        "ez bar",
-        "back squat",
-        "front squat",
-        "deadlift",
-        "romanian deadlift",
-        "stiff-leg deadlift",
-        "rdl",
-        "bent-over barbell row",
-        "barbell bench press",
-        "t-bar row",
-        "barbell overhead press",
-        "barbell row",
-        "incline bench press",
-        "hip thrust"
-    ))
-
-
-_MACHINE_TOKENS = (
-    "machine",
-    "smith",
-    "hack squat",
-    "leg press",
-    "pec deck",
-    "pulldown",
-    "pushdown",
-    "seated calf",
-    "lever",
-    "leg extension",
-    "leg curl",
-    "adductor",
-    "abductor",
-    "pullover",
-)
-_CABLE_TOKENS = ("cable", "face pull")
-_DUMBBELL_TOKENS = ("dumbbell", "db ")
-_BODYWEIGHT_TOKENS = (
-    "bodyweight",
-    "push-up",
-    "push up",
-    "pull up",
-    "pull-up",
-    "inverted row",
-    "pike push",
-    "lunge",
-    "split squat",
-    "glute bridge",
-    "walkout",
-    "bodyweight calf raise",
-    "standing calf raise",
-    "crunch",
-    "plank",
-    "hanging leg raise",
-)
+    return bool(classify(name).equipment & EQ_BARBELL)
 
 
 def _exercise_tags(name: str) -> tuple[str, ...]:
-    cn = _canon_like(name) or name
-    meta = EXERCISES.get(cn)
-    return meta.tags if meta else ()
+    return classify(name).tags
 
 
 def _is_machine_like(name: str) -> bool:
-    n = _lc(name)
-    tags = _exercise_tags(name)
-    return "machine" in tags or any(tok in n for tok in _MACHINE_TOKENS)
+    return bool(classify(name).equipment & EQ_MACHINE)
 
 
 def _is_cable_like(name: str) -> bool:
-    n = _lc(name)
-    tags = _exercise_tags(name)
-    return "cable" in tags or any(tok in n for tok in _CABLE_TOKENS)
+    return bool(classify(name).equipment & EQ_CABLE)
 
 
 def _is_dumbbell_like(name: str) -> bool:
-    n = _lc(name)
-    tags = _exercise_tags(name)
-    return "dumbbell" in tags or any(tok in n for tok in _DUMBBELL_TOKENS)
+    return bool(classify(name).equipment & EQ_DUMBBELL)
 
 
 def _is_bodyweight_like(name: str) -> bool:
-    n = _lc(name)
-    tags = _exercise_tags(name)
-    return "bodyweight" in tags or any(tok in n for tok in _BODYWEIGHT_TOKENS)
+    return bool(classify(name).equipment & EQ_BODYWEIGHT)
 
 
 def _allowed_for_equipment(name: str, equipment: str) -> bool:
     if equipment == "full_gym":
         return True
-    if equipment == "bodyweight":
-        return _is_bodyweight_like(name) and not (
-            _is_dumbbell_like(name) or _is_barbell_like(name) or _is_machine_like(name) or _is_cable_like(name)
-        )
-    if equipment == "dumbbells":
-        return (_is_dumbbell_like(name) or _is_bodyweight_like(name)) and not (
-            _is_barbell_like(name) or _is_machine_like(name) or _is_cable_like(name)
-        )
-    return True
+    return classify(name).allowed_for(equipment)
 
 
 def _filter_for_equipment(names: List[str], equipment: str) -> List[str]:
@@ -306,27 +214,15 @@ def _is_shoulder_dominant(name: str) -> bool:
     n = _lc(name)
     return any(tok in n for tok in _SHOULDER_BLOCKLIST_SUBSTR)
 
-def _first_safe_filler(banned: set[str], req: GeneratePlanRequest) -> Optional[str]:
+def _first_safe_filler(banned: set[str], ctx: RuleContext) -> Optional[str]:
     """
     Pick a deterministic safe filler that doesn't violate equipment bans.
     """
-    flags = _notes_flags(req)
-    no_db = flags["no_dumbbells"]
-    no_bb = flags["no_barbells"]
-
-    def violates(name: str) -> bool:
-        n = (name or "").lower()
-        if no_db and (_DB_PAT.search(n) or "dumbbell" in n):
-            return True
-        if no_bb and _is_barbell_like(n):
-            return True
-        return False
-
     for cand in _AVOID_SHOULDERS_SAFE_ISO:
         cn = _canon_name(cand) or cand
         if normalize_name(cn) in banned:
             continue
-        if violates(cn):
+        if ctx.violates_bans(cn):
             continue
         # ensure catalog knows it (optional, but safer)
         if _canon_name(cn) is None and cn not in EXERCISES:
@@ -335,10 +231,8 @@ def _first_safe_filler(banned: set[str], req: GeneratePlanRequest) -> Optional[s
 
     return None
 
-def _enforce_avoid_shoulders(day: DayPlan, req: GeneratePlanRequest) -> None:
-    flags = _notes_flags(req)
-    # REMOVE AFTER TEST: debug print to confirm flags and req.avoid
-    if not flags.get("avoid_shoulders", False):
+def _enforce_avoid_shoulders(day: DayPlan, ctx: RuleContext) -> None:
+    if not ctx.avoid_shoulders:
         return
 
     # If the day is explicitly SHARMS/Shoulder day, we still must produce a valid day
@@ -348,7 +242,7 @@ def _enforce_avoid_shoulders(day: DayPlan, req: GeneratePlanRequest) -> None:
     def replace_or_drop(ex: ExerciseItem) -> Optional[ExerciseItem]:
         if not _is_shoulder_dominant(ex.name or ""):
             return ex
-        repl = _first_safe_filler(banned, req)
+        repl = _first_safe_filler(banned, ctx)
         if not repl:
             return None
         ex.name = repl
@@ -372,27 +266,14 @@ def _enforce_avoid_shoulders(day: DayPlan, req: GeneratePlanRequest) -> None:
     day.accessories = new_acc
 
 
-def _enforce_prefer_cables(day, req) -> None:
-    flags = _notes_flags(req)
-    avoid_shoulders = flags.get("avoid_shoulders", False)
-    if not flags.get("prefer_cables", False):
+def _enforce_prefer_cables(day, ctx: RuleContext) -> None:
+    if not ctx.prefer_cables:
         return
 
     # machines preference overrides cables preference
-    if flags.get("prefer_machines", False):
+    if ctx.prefer_machines:
         return
 
-    no_db = flags.get("no_dumbbells", False)
-    no_bb = flags.get("no_barbells", False)
-
-    def violates(name: str) -> bool:
-        n = (name or "").lower()
-        if no_db and (_DB_PAT.search(n) or "dumbbell" in n):
-            return True
-        if no_bb and _is_barbell_like(n):
-            return True
-        return False
-
     for ex in (day.main + day.accessories):
         key = (ex.name or "").strip().lower()
         target = _PREFER_CABLES_SWAP.get(key)
@@ -402,11 +283,11 @@ def _enforce_prefer_cables(day, req) -> None:
         cn = _canon_like(target)
         if not cn:
             continue
-        if avoid_shoulders and _is_shoulder_dominant(cn):  
+        if ctx.avoid_shoulders and _is_shoulder_dominant(cn):
             continue
 
         # don't swap into something banned
-        if violates(cn):
+        if ctx.violates_bans(cn):
             continue
 
         ex.name = cn
@@ -492,7 +373,7 @@ def _movement_bucket(session_minutes: int) -> Tuple[int, int]:
         return (6, 8)
     return (7, 9)
 
-def _trim_or_pad_movements(day: DayPlan, req: GeneratePlanRequest) -> None:
+def _trim_or_pad_movements(day: DayPlan, ctx: RuleContext) -> None:
     """
     Ensure movements (main + accessories) hit the bucket.
     Deterministic + cap-safe:
@@ -502,7 +383,7 @@ def _trim_or_pad_movements(day: DayPlan, req: GeneratePlanRequest) -> None:
       - enforce compound cap
       - pad isolation-first (no duplicates), compounds only if under cap
     """
-    lo, hi = _movement_bucket(req.session_minutes)
+    lo, hi = _movement_bucket(ctx.session_minutes)
 
     def total() -> int:
         return len(day.main) + len(day.accessories)
@@ -516,7 +397,7 @@ def _trim_or_pad_movements(day: DayPlan, req: GeneratePlanRequest) -> None:
         day.accessories.pop()
 
     # 2) enforce compound cap after trimming
-    _enforce_compound_cap(day, req.session_minutes)
+    _enforce_compound_cap(day, ctx.session_minutes)
     _dedupe_day(day)
 
     # 3) if already meets minimum, stop
@@ -549,33 +430,31 @@ def _trim_or_pad_movements(day: DayPlan, req: GeneratePlanRequest) -> None:
                     sharms_iso.append(n)
 
         # 3) Only add a lateral raise if we don't already have one
-        flags = _notes_flags(req)
-        if (not has_lateral) and (not flags.get("avoid_shoulders", False)):
+        if (not has_lateral) and (not ctx.avoid_shoulders):
             for n in LATERAL:
                 if normalize_name(n) not in existing:
                     sharms_iso.append(n)
 
-        iso_pool = _filter_for_equipment(sharms_iso, req.equipment)
+        iso_pool = [n for n in sharms_iso if ctx.allows(n)]
         comp_pool = []
 
     else:
-        flags = _notes_flags(req)
         iso_pool = [
             n for n in get_isolations_for_focus(day.focus)
-            if normalize_name(n) not in existing and _allowed_for_equipment(n, req.equipment)
+            if normalize_name(n) not in existing and ctx.allows(n)
         ]
         comp_pool = [
             n for n in get_compounds_for_focus(day.focus)
-            if normalize_name(n) not in existing and _allowed_for_equipment(n, req.equipment)
+            if normalize_name(n) not in existing and ctx.allows(n)
         ]
 
         # If avoiding shoulders, filter out shoulder-dominant movements from filler pools
-        if flags.get("avoid_shoulders", False):
+        if ctx.avoid_shoulders:
             iso_pool = [n for n in iso_pool if not _is_shoulder_dominant(n)]
             comp_pool = [n for n in comp_pool if not _is_shoulder_dominant(n)]
 
     def can_add_compound() -> bool:
-        return _count_compounds(day) < _compound_cap(req.session_minutes, day.focus)
+        return _count_compounds(day) < _compound_cap(ctx.session_minutes, day.focus)
 
     while total() < lo:
         if iso_pool:
@@ -588,7 +467,7 @@ def _trim_or_pad_movements(day: DayPlan, req: GeneratePlanRequest) -> None:
         day.accessories.append(
             ExerciseItem(
                 name=name,
-                sets=1 if req.session_minutes <= 35 else 2,
+                sets=1 if ctx.session_minutes <= 35 else 2,
                 reps=_normalize_reps(name, ""),                 # becomes 6-8 or 8-12
                 rest_seconds=_normalize_rest_seconds(name, None),
                 notes="",
@@ -598,19 +477,18 @@ def _trim_or_pad_movements(day: DayPlan, req: GeneratePlanRequest) -> None:
 
     # 5) final safety pass
     _dedupe_day(day)
-    _enforce_compound_cap(day, req.session_minutes)
+    _enforce_compound_cap(day, ctx.session_minutes)
     _dedupe_day(day)
 
 
-def _enforce_barbell_priority(day: DayPlan, req: GeneratePlanRequest) -> None:
+def _enforce_barbell_priority(day: DayPlan, ctx: RuleContext) -> None:
     """
     If user prefers barbells and equipment allows, ensure main lifts are barbell-like.
     We do minimal swaps (only if clearly missing).
     """
-    flags = _notes_flags(req)
-    if flags["no_barbells"]:
+    if ctx.no_barbells:
         return
-    if not (_wants_barbells(req) and req.equipment == "full_gym" and not _wants_machines(req)):
+    if not (ctx.wants_barbells and ctx.equipment == "full_gym" and not ctx.wants_machines):
         return
 
     # If main has zero barbell-like compounds, replace first compound-ish main with barbell variant.
@@ -652,11 +530,7 @@ def _count_compounds(day) -> int:
     items = (getattr(day, "main", []) or []) + (getattr(day, "accessories", []) or [])
     cnt = 0
     for ex in items:
-        n = normalize_name(ex.name)
-        if not n:
-            continue
-        canon = _CANON.get(n.lower(), n)
-        if is_compound(canon):
+        if normalize_name(ex.name) and classify(ex.name).is_compound:
             cnt += 1
     return cnt
 
@@ -671,7 +545,7 @@ def _replace_unknown_exercises(day) -> None:
     focus = getattr(day, "focus", "")
     iso_pool = [n for n in get_isolations_for_focus(focus) if normalize_name(n) not in used]
     if not iso_pool:
-        iso_pool = [n for n in EXERCISES.keys() if is_isolation(n) and normalize_name(n) not in used]
+        iso_pool = [n for n in all_isolations() if normalize_name(n) not in used]
 
     for ex in items:
         n = normalize_name(ex.name)
@@ -679,7 +553,7 @@ def _replace_unknown_exercises(day) -> None:
             continue
 
         # 1) Case-insensitive canonical match
-        canon = _CANON.get(n.lower())
+        canon = classify(n).canon
         if canon:
             ex.name = canon
             used.add(normalize_name(canon))
@@ -701,7 +575,7 @@ def _dedupe_day(day) -> None:
         n = normalize_name(ex.name)
         if not n:
             continue
-        canon = _CANON.get(n.lower(), n)
+        canon = classify(n).canon or n
         nn = normalize_name(canon)
         if nn and nn not in seen:
             ex.name = canon  # normalize stored name too
@@ -720,16 +594,15 @@ def _enforce_compound_cap(day, session_minutes: int) -> None:
 
     iso_pool = [n for n in get_isolations_for_focus(getattr(day, "focus", "")) if normalize_name(n) not in used]
     if not iso_pool:
-        iso_pool = [n for n in EXERCISES.keys() if is_isolation(n) and normalize_name(n) not in used]
+        iso_pool = [n for n in all_isolations() if normalize_name(n) not in used]
 
     compounds_seen = 0
     for ex in items:
         n = normalize_name(ex.name)
         if not n:
             continue
-        canon = _CANON.get(n.lower(), n)
 
-        if is_compound(canon):
+        if classify(n).is_compound:
             compounds_seen += 1
             if compounds_seen > cap and iso_pool:
                 new_name = iso_pool.pop(0)
@@ -791,40 +664,7 @@ def _template_to_focus(template_key: str) -> str:
     return "Upper"
 
 def _canon_name(name: str) -> Optional[str]:
-    n = normalize_name(name)
-    if not n:
-        return None
-    # case-insensitive canonical mapping to EXERCISES key
-    canon = _CANON.get(n.lower())
-    if canon:
-        return canon
-    # if it's already an exact key
-    if n in EXERCISES:
-        return n
-    return None
-
-
-_FOCUS_TAG_ALIASES: dict[str, frozenset] = {
-    "legs":       frozenset({"quads", "hamstrings", "glutes", "calves", "legs", "adductors", "abductors"}),
-    "arms":       frozenset({"biceps", "triceps", "arms"}),
-    "shoulders":  frozenset({"shoulders", "side_delts", "front_delts", "rear_delts"}),
-    "back":       frozenset({"back", "lats", "upper_back", "rear_delts"}),
-    "chest":      frozenset({"chest"}),
-    "core":       frozenset({"abs", "core"}),
-    "glutes":     frozenset({"glutes"}),
-    "quads":      frozenset({"quads"}),
-    "hamstrings": frozenset({"hamstrings"}),
-    "calves":     frozenset({"calves"}),
-}
-
-
-def _expand_focus_set(focus_muscles: List[str]) -> frozenset:
-    """Expand broad muscle group names to the specific tags used in the exercise catalog."""
-    expanded: set = set()
-    for m in focus_muscles:
-        ml = m.lower()
-        expanded.update(_FOCUS_TAG_ALIASES.get(ml, {ml}))
-    return frozenset(expanded)
+    return classify(name).canon
 
 
 def _pick_first_valid(
@@ -840,7 +680,7 @@ def _pick_first_valid(
     has_focus = bool(focus_muscles)
 
     if has_equip_pref or has_focus:
-        focus_set = _expand_focus_set(focus_muscles) if has_focus else frozenset()
+        focus_names = {m.lower() for m in focus_muscles} if has_focus else set()
 
         def equip_score(n: str) -> int:
             nl = n.lower()
@@ -859,13 +699,9 @@ def _pick_first_valid(
             return 0
 
         def focus_score(n: str) -> int:
-            if not focus_set:
-                return 0
-            cn = _canon_name(n)
-            meta = EXERCISES.get(cn) if cn else None
-            if meta and any(t in focus_set for t in meta.tags):
+            if not focus_names:
                 return 0
-            return 1
+            return 0 if focus_names & classify(n).focus_tags else 1
 
         ordered = sorted(priority, key=lambda n: (focus_score(n), equip_score(n)))
     else:
@@ -884,15 +720,15 @@ def _pick_first_valid(
     return None
 
 
-def _row_pool(req: GeneratePlanRequest):
-    if _wants_machines(req):
+def _row_pool(ctx: RuleContext):
+    if ctx.wants_machines:
         return [
             "Machine Row",
             "Hammer Strength Row",
             "Seated Cable Row",
             "Chest Supported Row",
         ]
-    if "no barbells" in _lc(req.constraints):
+    if "no barbells" in ctx.text:
         return [
             "Chest Supported Row",
             "Machine Row",
@@ -906,22 +742,21 @@ def _row_pool(req: GeneratePlanRequest):
     ]
 
 
-def _template_slots(template_key: str, req: GeneratePlanRequest) -> Tuple[List[List[str]], List[List[str]]]:
+def _template_slots(template_key: str, ctx: RuleContext) -> Tuple[List[List[str]], List[List[str]]]:
     t = (template_key or "").upper()
-    flags = _notes_flags(req)
-    avoid_shoulders = flags.get("avoid_shoulders", False)
+    avoid_shoulders = ctx.avoid_shoulders
 
     if t == "UPPER_A":
         main = [CHEST_COMPOUND, LAT_COMPOUND, CHEST_ISO]
         if avoid_shoulders:
             # replace lateral slot with triceps/abs filler to avoid shoulders
-            acc = [_row_pool(req), TRI_SIDES, BICEPS]
+            acc = [_row_pool(ctx), TRI_SIDES, BICEPS]
         else:
-            acc = [_row_pool(req), LATERAL, BICEPS]
+            acc = [_row_pool(ctx), LATERAL, BICEPS]
         return main, acc
 
     if t == "UPPER_B":
-        main = [_row_pool(req), CHEST_COMPOUND, LAT_COMPOUND]
+        main = [_row_pool(ctx), CHEST_COMPOUND, LAT_COMPOUND]
         if avoid_shoulders:
             # replace rear delt slot with triceps overhead or abs
             acc = [CHEST_ISO, TRI_OVERHEAD, BICEPS]
@@ -1033,7 +868,7 @@ def _template_slots(template_key: str, req: GeneratePlanRequest) -> Tuple[List[L
     if t == "PULL":
         main = [
             LAT_COMPOUND,    # back 1
-            _row_pool(req),  # back 2
+            _row_pool(ctx),  # back 2
             UPPER_BACK_ROW,  # back 3
         ]
         acc = [
@@ -1074,14 +909,14 @@ def _triceps_slots_for_day(template_key: str, has_sharms: bool) -> list[list[str
         return [TRI_SIDES]  # FB_C default
     return []
 
-def _apply_glute_leg_day(day: DayPlan, template_key: str, req: GeneratePlanRequest) -> None:
+def _apply_glute_leg_day(day: DayPlan, template_key: str, ctx: RuleContext) -> None:
     """Fixed structure for glute-bias leg days. Structure differs by template."""
-    hinge_name = _pick_first_valid(HINGE_HAM, set(), equipment=req.equipment)  # SLDL-first for both
-    abs_name   = _pick_first_valid(ABS, set(), equipment=req.equipment)
-    hip_name = _pick_first_valid(HIP_THRUST, set(), equipment=req.equipment) or "Glute Bridge"
-    curl_name = _pick_first_valid(HAM_CURL, set(), equipment=req.equipment) or "Hamstring Walkouts"
-    quad_name = _pick_first_valid(LEG_EXT, set(), equipment=req.equipment) or "Bodyweight Squat"
-    split_name = _pick_first_valid(["Bulgarian Split Squat", "Reverse Lunge", "Bodyweight Split Squat"], set(), equipment=req.equipment) or "Reverse Lunge"
+    hinge_name = _pick_first_valid(HINGE_HAM, set(), equipment=ctx.equipment)  # SLDL-first for both
+    abs_name   = _pick_first_valid(ABS, set(), equipment=ctx.equipment)
+    hip_name = _pick_first_valid(HIP_THRUST, set(), equipment=ctx.equipment) or "Glute Bridge"
+    curl_name = _pick_first_valid(HAM_CURL, set(), equipment=ctx.equipment) or "Hamstring Walkouts"
+    quad_name = _pick_first_valid(LEG_EXT, set(), equipment=ctx.equipment) or "Bodyweight Squat"
+    split_name = _pick_first_valid(["Bulgarian Split Squat", "Reverse Lunge", "Bodyweight Split Squat"], set(), equipment=ctx.equipment) or "Reverse Lunge"
 
     if template_key == "LOWER_HAM":
         # Hip Thrust → Leg Curl → SLDL → Leg Extension → Bulgarian Split Squat → Abs
@@ -1129,12 +964,12 @@ def _ensure_hamstring_day_squat(day: DayPlan) -> None:
         ))
 
 
-def _prioritize_focus_exercises(day: DayPlan, focus_muscles: List[str]) -> None:
+def _prioritize_focus_exercises(day: DayPlan, ctx: RuleContext) -> None:
     """Move exercises targeting focus_muscles to the front of the combined list.
     Merges main + accessories into a single list with focused exercises first.
     Stable sort — relative order within focused/non-focused groups is preserved.
     """
-    focus_set = _expand_focus_set(focus_muscles)
+    focus_set = ctx.focus_set
 
     def is_focused(ex: ExerciseItem) -> bool:
         meta = EXERCISES.get(normalize_name(ex.name))
@@ -1149,10 +984,10 @@ def _prioritize_focus_exercises(day: DayPlan, focus_muscles: List[str]) -> None:
     day.accessories[:] = ordered[main_len:]
 
 
-def _apply_template(day: DayPlan, req: GeneratePlanRequest, template_key: str, has_sharms: bool) -> None:
-    main_slots, acc_slots = _template_slots(template_key, req)
+def _apply_template(day: DayPlan, ctx: RuleContext, template_key: str) -> None:
+    main_slots, acc_slots = _template_slots(template_key, ctx)
     acc_slots = list(acc_slots)  # in case it's a tuple
-    acc_slots += _triceps_slots_for_day(template_key, has_sharms)
+    acc_slots += _triceps_slots_for_day(template_key, ctx.has_sharms)
     
     if not main_slots and not acc_slots:
         return
@@ -1162,23 +997,22 @@ def _apply_template(day: DayPlan, req: GeneratePlanRequest, template_key: str, h
     def build_items(slots: List[List[str]]) -> List[ExerciseItem]:
         items: List[ExerciseItem] = []
         for slot in slots:
-            flags = _notes_flags(req)
             pick = _pick_first_valid(
                 slot,
                 banned=banned,
-                prefer_machines=flags["prefer_machines"],
-                prefer_cables=flags.get("prefer_cables", False),
-                focus_muscles=req.focus_muscles,
-                equipment=req.equipment,
+                prefer_machines=ctx.prefer_machines,
+                prefer_cables=ctx.prefer_cables,
+                focus_muscles=ctx.focus_muscles,
+                equipment=ctx.equipment,
             )
             if not pick:
                 continue
 
             # If user asked to avoid shoulders, ensure we don't pick shoulder-dominant moves
-            if flags.get("avoid_shoulders", False) and _is_shoulder_dominant(pick):
+            if ctx.avoid_shoulders and _is_shoulder_dominant(pick):
                 alternative = None
                 for raw in slot:
-                    cand = _pick_first_valid([raw], banned=banned, prefer_machines=flags["prefer_machines"], prefer_cables=flags.get("prefer_cables", False), equipment=req.equipment)
+                    cand = _pick_first_valid([raw], banned=banned, prefer_machines=ctx.prefer_machines, prefer_cables=ctx.prefer_cables, equipment=ctx.equipment)
                     if cand and not _is_shoulder_dominant(cand):
                         alternative = cand
                         break
@@ -1240,8 +1074,7 @@ def _enforce_time_cap(day, session_minutes: int) -> None:
         day.accessories = day.accessories[:allowed_accessories]
 
 def _estimate_exercise_seconds(ex: ExerciseItem) -> int:
-    canon = _canon_like(ex.name) or ex.name
-    compound = is_compound(canon)
+    compound = classify(ex.name).is_compound
     warmup_rest = WARMUP_REST_COMPOUND if compound else WARMUP_REST_ISO
     warmup = WARMUP_SET_SECONDS + warmup_rest
     working = ex.sets * WORK_SET_SECONDS
@@ -1275,40 +1108,95 @@ def _remove_optional_warmups(day: DayPlan) -> None:
         out.append(w)
     day.warmup = out
 
+def _set_delta_seconds(ex: ExerciseItem, new_sets: int) -> int:
+    """Change in _estimate_exercise_seconds(ex) if ex.sets became new_sets."""
+    old_sets = ex.sets
+    return (new_sets - old_sets) * WORK_SET_SECONDS + (
+        max(0, new_sets - 1) - max(0, old_sets - 1)
+    ) * ex.rest_seconds
+
+
+class _DayTime:
+    """
+    Running _estimate_day_seconds(day) for _enforce_session_minutes.
+
+    Built once per call; every edit to the day goes through these methods,
+    which adjust the total by that exercise's own cost instead of re-summing
+    the day.
+    """
+
+    def __init__(self, day: DayPlan):
+        self.day = day
+        self.warmup_sec = len(day.warmup or []) * WARMUP_ITEM_SECONDS
+        items = day.main + day.accessories
+        self.count = len(items)
+        self.ex_sec = sum(_estimate_exercise_seconds(ex) for ex in items)
+
+    def total(self) -> int:
+        if not self.count:
+            return 0
+        return self.warmup_sec + self.ex_sec
+
+    def pop(self, items: list[ExerciseItem]) -> ExerciseItem:
+        ex = items.pop()
+        self.count -= 1
+        self.ex_sec -= _estimate_exercise_seconds(ex)
+        return ex
+
+    def append(self, items: list[ExerciseItem], ex: ExerciseItem) -> None:
+        items.append(ex)
+        self.count += 1
+        self.ex_sec += _estimate_exercise_seconds(ex)
+
+    def set_sets(self, ex: ExerciseItem, sets: int) -> None:
+        self.ex_sec += _set_delta_seconds(ex, sets)
+        ex.sets = sets
+
+    def reduce_sets_to_fit(self, ex: ExerciseItem, target_sec: int) -> None:
+        """Drop sets one at a time (floor 1) until the day fits, in one step."""
+        excess = self.total() - target_sec
+        if ex.sets <= 1 or excess <= 0:
+            return
+        per_set = WORK_SET_SECONDS + ex.rest_seconds  # saved by each drop while sets >= 2
+        drops = min(ex.sets - 1, -(-excess // per_set))
+        self.set_sets(ex, ex.sets - drops)
+
+    def remove_optional_warmups(self) -> None:
+        _remove_optional_warmups(self.day)
+        self.warmup_sec = len(self.day.warmup or []) * WARMUP_ITEM_SECONDS
+
+
 def _enforce_session_minutes(day: DayPlan, req: GeneratePlanRequest) -> None:
     target_sec = (req.session_minutes or 60) * 60
     if not (day.main or day.accessories):
         return
 
-    def estimate() -> int:
-        return _estimate_day_seconds(day)
+    est = _DayTime(day)
 
     # 1) If over target: remove lowest-priority accessories first
-    while day.accessories and estimate() > target_sec:
-        day.accessories.pop()
+    while day.accessories and est.total() > target_sec:
+        est.pop(day.accessories)
 
     # 2) Reduce accessory sets down to floor
-    if day.accessories and estimate() > target_sec:
+    if day.accessories and est.total() > target_sec:
         for ex in reversed(day.accessories):
-            while ex.sets > 1 and estimate() > target_sec:
-                ex.sets -= 1
+            est.reduce_sets_to_fit(ex, target_sec)
 
     # 3) Reduce main work to one set before dropping required movements.
-    if day.main and estimate() > target_sec:
+    if day.main and est.total() > target_sec:
         for ex in reversed(day.main):
-            while ex.sets > 1 and estimate() > target_sec:
-                ex.sets -= 1
+            est.reduce_sets_to_fit(ex, target_sec)
 
     # 4) Remove optional warmup bullets (if any are marked optional)
-    if estimate() > target_sec:
-        _remove_optional_warmups(day)
+    if est.total() > target_sec:
+        est.remove_optional_warmups()
 
     # 5) If still over, trim lower-priority main exercises but keep at least one movement.
-    while len(day.main) > 1 and estimate() > target_sec:
-        day.main.pop()
+    while len(day.main) > 1 and est.total() > target_sec:
+        est.pop(day.main)
 
     # 6) If under target by a large margin: add volume deterministically
-    if estimate() + UNDER_TARGET_MARGIN_SECONDS <= target_sec and day.accessories:
+    if est.total() + UNDER_TARGET_MARGIN_SECONDS <= target_sec and day.accessories:
         primary_count = max(1, len(day.accessories) // 2)
         primary = day.accessories[:primary_count]
         secondary = day.accessories[primary_count:]
@@ -1316,24 +1204,23 @@ def _enforce_session_minutes(day: DayPlan, req: GeneratePlanRequest) -> None:
         def try_add_set(ex: ExerciseItem) -> bool:
             if ex.sets >= 3:
                 return False
-            ex.sets += 1
-            if estimate() > target_sec:
-                ex.sets -= 1
+            if est.total() + _set_delta_seconds(ex, ex.sets + 1) > target_sec:
                 return False
+            est.set_sets(ex, ex.sets + 1)
             return True
 
         for ex in primary:
-            if estimate() + UNDER_TARGET_MARGIN_SECONDS > target_sec:
+            if est.total() + UNDER_TARGET_MARGIN_SECONDS > target_sec:
                 break
             try_add_set(ex)
 
         for ex in secondary:
-            if estimate() + UNDER_TARGET_MARGIN_SECONDS > target_sec:
+            if est.total() + UNDER_TARGET_MARGIN_SECONDS > target_sec:
                 break
             try_add_set(ex)
 
         # Optional short finisher if equipment allows and within cap
-        if req.session_minutes > 45 and estimate() + UNDER_TARGET_MARGIN_SECONDS <= target_sec:
+        if req.session_minutes > 45 and est.total() + UNDER_TARGET_MARGIN_SECONDS <= target_sec:
             if req.equipment in ("full_gym", "dumbbells", "bodyweight"):
                 used = {normalize_name(e.name) for e in (day.main + day.accessories)}
                 pool = [
@@ -1352,63 +1239,9 @@ def _enforce_session_minutes(day: DayPlan, req: GeneratePlanRequest) -> None:
                         rest_seconds=180,
                         notes="Optional finisher if time permits.",
                     )
-                    day.accessories.append(finisher)
-                    if estimate() > target_sec:
-                        day.accessories.pop()
-
-def _notes_flags(req) -> dict:
-    text = (req.constraints or "").lower()
-    avoid_tokens = {str(x).strip().lower() for x in (getattr(req, "avoid", None) or [])}
-    # Phase 1 canonical tokens (preferred)
-    tokens = set((getattr(req, "constraints_tokens", None) or []) + (getattr(req, "preferences_tokens", None) or []))
-
-    # Support both old natural language ("no barbells") and new token format ("BANS: no_barbells")
-    no_dumbbells = (
-        ("no_dumbbells" in tokens)
-        or bool(re.search(r"\bno\s+dumbbells?\b|\bavoid\s+dumbbells?\b", text))
-        or ("no_dumbbells" in text)
-    )
-    no_barbells = (
-        ("no_barbells" in tokens)
-        or bool(re.search(r"\bno\s+barbells?\b|\bavoid\s+barbells?\b", text))
-        or ("no_barbells" in text)
-    )
-    prefer_machines = (
-        ("prefer_machines" in tokens)
-        or bool(re.search(r"\bprefer\s+machines?\b|\bmachines?\s+only\b", text))
-        or ("prefer_machines" in text)
-    )
-    prefer_cables = (
-        ("prefer_cables" in tokens)
-        or bool(re.search(r"\bprefer\s+cables?\b|\bcables?\s+only\b", text))
-        or ("prefer_cables" in text)
-    )
-    # Prefer req.avoid tokens (explicit avoidance list) but fall back to parsing constraints text
-    avoid_shoulders = (
-        ("shoulders" in avoid_tokens)
-        or ("avoid_shoulders" in avoid_tokens)
-        or ("avoid: shoulders" in text)
-        or ("avoid_shoulders" in text)
-        or bool(re.search(r"\bavoid\s+shoulders?\b", text))
-    )
-
-
-    # Derive equipment bans from the structured equipment field
-    equipment = getattr(req, 'equipment', 'full_gym')
-    if equipment == 'dumbbells':
-        no_barbells = True
-    elif equipment == 'bodyweight':
-        no_barbells = True
-        no_dumbbells = True
-
-    return {
-        "no_dumbbells": no_dumbbells,
-        "no_barbells": no_barbells,
-        "prefer_machines": prefer_machines,
-        "prefer_cables": prefer_cables,
-        "avoid_shoulders": avoid_shoulders,
-    }
-
+                    est.append(day.accessories, finisher)
+                    if est.total() > target_sec:
+                        est.pop(day.accessories)
 
 def _pick_replacement(name: str, prefer_machines: bool, no_dumbbells: bool, no_barbells: bool) -> str | None:
     key = (name or "").strip().lower()
@@ -1439,7 +1272,7 @@ def _pick_replacement(name: str, prefer_machines: bool, no_dumbbells: bool, no_b
     return filtered[0]
 
 
-def _pick_equipment_replacement(ex: ExerciseItem, day: DayPlan, req: GeneratePlanRequest, used: set[str]) -> str | None:
+def _pick_equipment_replacement(ex: ExerciseItem, day: DayPlan, ctx: RuleContext, used: set[str]) -> str | None:
     old_tags = set(_exercise_tags(ex.name))
     same_kind = is_compound(ex.name)
     focus = getattr(day, "focus", "")
@@ -1453,7 +1286,7 @@ def _pick_equipment_replacement(ex: ExerciseItem, day: DayPlan, req: GeneratePla
         nn = normalize_name(cn)
         if not nn or nn in used:
             continue
-        if not _allowed_for_equipment(cn, req.equipment):
+        if not ctx.allows(cn):
             continue
         tags = set(_exercise_tags(cn))
         scored.append((-len(old_tags & tags), cn))
@@ -1464,20 +1297,20 @@ def _pick_equipment_replacement(ex: ExerciseItem, day: DayPlan, req: GeneratePla
     return scored[0][1]
 
 
-def _enforce_strict_equipment(day: DayPlan, req: GeneratePlanRequest) -> None:
-    if req.equipment == "full_gym":
+def _enforce_strict_equipment(day: DayPlan, ctx: RuleContext) -> None:
+    if ctx.equipment == "full_gym":
         return
 
     used: set[str] = set()
     out: list[ExerciseItem] = []
     for ex in (day.main + day.accessories):
-        if _allowed_for_equipment(ex.name, req.equipment):
+        if ctx.allows(ex.name):
             ex.name = _canon_like(ex.name) or ex.name
             out.append(ex)
             used.add(normalize_name(ex.name))
             continue
 
-        repl = _pick_equipment_replacement(ex, day, req, used)
+        repl = _pick_equipment_replacement(ex, day, ctx, used)
         if not repl:
             continue
         ex.name = repl
@@ -1490,32 +1323,23 @@ def _enforce_strict_equipment(day: DayPlan, req: GeneratePlanRequest) -> None:
     day.accessories = out[main_len:]
 
 
-def _enforce_equipment_from_notes(day, req) -> None:
-    flags = _notes_flags(req)
-    no_db = flags["no_dumbbells"]
-    no_bb = flags["no_barbells"]
-    prefer_m = flags["prefer_machines"]
+def _enforce_equipment_from_notes(day, ctx: RuleContext) -> None:
+    no_db = ctx.no_dumbbells
+    no_bb = ctx.no_barbells
+    prefer_m = ctx.prefer_machines
 
     if not (no_db or no_bb or prefer_m):
         return
 
-    def violates(name: str) -> bool:
-        n = (name or "").lower()
-        if no_db and (_DB_PAT.search(n) or "dumbbell" in n):
-            return True
-        if no_bb and _is_barbell_like(n):
-            return True
-        return False
-
     def process_list(lst):
         out = []
         for ex in lst:
             n = ex.name or ""
-            if violates(n):
+            if ctx.violates_bans(n):
                 repl = _pick_replacement(n, prefer_m, no_db, no_bb)
                 if repl:
                     # If avoiding shoulders, don't swap into shoulder-dominant replacements
-                    if flags.get("avoid_shoulders", False) and _is_shoulder_dominant(repl):
+                    if ctx.avoid_shoulders and _is_shoulder_dominant(repl):
                         # drop if the only safe replacement is a shoulder movement
                         continue
                     ex.name = repl
@@ -1530,7 +1354,7 @@ def _enforce_equipment_from_notes(day, req) -> None:
                     repl = _pick_replacement(n, prefer_m, no_db, no_bb)
                     if repl:
                         # avoid swapping into shoulder-dominant moves if user avoids shoulders
-                        if flags.get("avoid_shoulders", False) and _is_shoulder_dominant(repl):
+                        if ctx.avoid_shoulders and _is_shoulder_dominant(repl):
                             pass
                         else:
                             ex.name = repl
@@ -1541,11 +1365,131 @@ def _enforce_equipment_from_notes(day, req) -> None:
     day.accessories = process_list(day.accessories)
 
 
+# -----------------------------
+# day pass pipeline
+# -----------------------------
+
+def _normalize_day_items(day: DayPlan) -> None:
+    for ex in (day.main + day.accessories):
+        ex.sets = _normalize_sets(ex.sets)
+        ex.reps = _normalize_reps(ex.name, ex.reps)
+        ex.rest_seconds = _normalize_rest_seconds(ex.name, ex.rest_seconds)
+
+        # notes: remove any RPE-like content if it snuck in
+        nl = _lc(ex.notes)
+        if "rpe" in nl:
+            ex.notes = ""
+
+
+def _wants_glute_leg_day(job: DayJob) -> bool:
+    if job.template_key not in ("LOWER_QUAD", "LOWER_HAM") or not job.ctx.focus_muscles:
+        return False
+    return "glutes" in {m.lower() for m in job.ctx.focus_muscles}
+
+
+def _unless_chest_back(p: RulePass) -> RulePass:
+    # CHEST_BACK keeps its template volume: no trim/pad, dedupe or cap pass
+    return replace(p, applies=lambda job: job.template_key != "CHEST_BACK" and p.applies(job))
+
+
+_NAMES = frozenset({"exercises"})
+
+_TEMPLATE = RulePass("template", lambda j: _apply_template(j.day, j.ctx, j.template_key))
+_GLUTE_LEG_DAY = RulePass(
+    "glute_leg_day",
+    lambda j: _apply_glute_leg_day(j.day, j.template_key, j.ctx),
+    applies=_wants_glute_leg_day,
+)
+_HAMSTRING_SQUAT = RulePass(
+    "hamstring_squat",
+    lambda j: _ensure_hamstring_day_squat(j.day),
+    applies=lambda j: j.template_key == "LOWER_HAM",
+)
+_FOCUS_PRIORITY = RulePass(
+    "focus_priority",
+    lambda j: _prioritize_focus_exercises(j.day, j.ctx),
+    applies=lambda j: bool(j.ctx.focus_muscles),
+)
+_EQUIPMENT_FROM_NOTES = RulePass("equipment_from_notes", lambda j: _enforce_equipment_from_notes(j.day, j.ctx))
+_STRICT_EQUIPMENT = RulePass(
+    "strict_equipment",
+    lambda j: _enforce_strict_equipment(j.day, j.ctx),
+    reads=_NAMES,
+    idempotent=True,
+    applies=lambda j: j.ctx.equipment != "full_gym",
+)
+_PREFER_CABLES = RulePass("prefer_cables", lambda j: _enforce_prefer_cables(j.day, j.ctx))
+_BARBELL_PRIORITY = RulePass("barbell_priority", lambda j: _enforce_barbell_priority(j.day, j.ctx))
+_NORMALIZE = RulePass("normalize", lambda j: _normalize_day_items(j.day))
+_TRIM_OR_PAD = RulePass("trim_or_pad", lambda j: _trim_or_pad_movements(j.day, j.ctx))
+_DEDUPE = RulePass("dedupe", lambda j: _dedupe_day(j.day), reads=_NAMES, idempotent=True)
+# not idempotent: a second run can fall back from the focus pool to all isolations
+_COMPOUND_CAP = RulePass(
+    "compound_cap",
+    lambda j: _enforce_compound_cap(j.day, j.ctx.session_minutes),
+    reads=_NAMES,
+)
+_AVOID_SHOULDERS = RulePass(
+    "avoid_shoulders",
+    lambda j: _enforce_avoid_shoulders(j.day, j.ctx),
+    reads=_NAMES,
+    idempotent=True,
+)
+# not idempotent: every run may add sets or a finisher when under target
+_SESSION_MINUTES = RulePass(
+    "session_minutes",
+    lambda j: _enforce_session_minutes(j.day, j.ctx.req),
+    reads=frozenset({"exercises", "volume", "warmup"}),
+)
+
+DAY_PASSES: Tuple[RulePass, ...] = (
+    _TEMPLATE,
+    _GLUTE_LEG_DAY,
+    _HAMSTRING_SQUAT,
+    _FOCUS_PRIORITY,
+    _EQUIPMENT_FROM_NOTES,
+    _STRICT_EQUIPMENT,
+    _PREFER_CABLES,
+    _BARBELL_PRIORITY,
+    _NORMALIZE,
+    # movement counts by time bucket
+    _unless_chest_back(_TRIM_OR_PAD),
+    _unless_chest_back(_DEDUPE),
+    _unless_chest_back(_COMPOUND_CAP),
+    _unless_chest_back(_STRICT_EQUIPMENT),
+    _AVOID_SHOULDERS,
+    _DEDUPE,
+    _STRICT_EQUIPMENT,
+    # deterministic time enforcement against session_minutes
+    _SESSION_MINUTES,
+    _DEDUPE,
+    _STRICT_EQUIPMENT,
+    _SESSION_MINUTES,
+    _STRICT_EQUIPMENT,
+)
+
+# Hard constraints re-checked until stable in fixed-point mode.
+FIXED_POINT_PASSES: Tuple[RulePass, ...] = (_AVOID_SHOULDERS, _DEDUPE, _STRICT_EQUIPMENT)
+RULES_FIXED_POINT_MAX_ROUNDS = 4
+
+
 # -----------------------------
 # rules engine
 # -----------------------------
 
-def apply_rules_v1(plan: GeneratePlanResponse, req: GeneratePlanRequest) -> GeneratePlanResponse:
+def apply_rules_v1(
+    plan: GeneratePlanResponse,
+    req: GeneratePlanRequest,
+    trace: Optional[RuleTrace] = None,
+    fixed_point: bool = False,
+) -> GeneratePlanResponse:
+    """
+    Shape `plan` to the request's split, equipment, avoids and session length.
+
+    `trace` collects per-pass timing and change counts. With `fixed_point`,
+    the hard-constraint passes are repeated after the pipeline until a round
+    changes nothing (at most RULES_FIXED_POINT_MAX_ROUNDS rounds per day).
+    """
     # clamp days (keep your existing behavior)
     effective_days = req.days_per_week
     if effective_days > 6:
@@ -1553,7 +1497,7 @@ def apply_rules_v1(plan: GeneratePlanResponse, req: GeneratePlanRequest) -> Gene
 
     # Decide your split/day templates deterministically
     tpls = _select_day_templates(effective_days)
-    has_sharms = "SHARMS" in tpls
+    ctx = RuleContext.build(req, has_sharms="SHARMS" in tpls)
 
     # IMPORTANT: weekly_split must match the template length (tpls may include REST)
     target_len = len(tpls)
@@ -1579,7 +1523,7 @@ def apply_rules_v1(plan: GeneratePlanResponse, req: GeneratePlanRequest) -> Gene
             plan.weekly_split.append(blank)
 
 
-    # Enforcement order matters:
+    # Enforcement order matters (see DAY_PASSES):
     # 1) Template selection / base split shaping
     # 2) Equipment constraints (no_dumbbells/no_barbells/etc.)
     # 3) Preference swaps (prefer_cables/prefer_machines)
@@ -1597,55 +1541,10 @@ def apply_rules_v1(plan: GeneratePlanResponse, req: GeneratePlanRequest) -> Gene
             day.main = []
             day.accessories = []
             continue
-        _apply_template(day, req, template_key, has_sharms)
-        if req.focus_muscles:
-            focus_lower = {m.lower() for m in req.focus_muscles}
-            if "glutes" in focus_lower and template_key in ("LOWER_QUAD", "LOWER_HAM"):
-                _apply_glute_leg_day(day, template_key, req)
-        if template_key == "LOWER_HAM":
-            _ensure_hamstring_day_squat(day)
-        if req.focus_muscles:
-            _prioritize_focus_exercises(day, req.focus_muscles)
-        _enforce_equipment_from_notes(day, req)
-        _enforce_strict_equipment(day, req)
-        _enforce_prefer_cables(day, req)
-
-
-        # Enforce barbell preference in main (minimal)
-        _enforce_barbell_priority(day, req)
-
-        # Normalize all exercises
-        for ex in (day.main + day.accessories):
-            ex.sets = _normalize_sets(ex.sets)
-            ex.reps = _normalize_reps(ex.name, ex.reps)
-            ex.rest_seconds = _normalize_rest_seconds(ex.name, ex.rest_seconds)
-
-            # notes: remove any RPE-like content if it snuck in
-            nl = _lc(ex.notes)
-            if "rpe" in nl:
-                ex.notes = ""
-
-        # Enforce movement counts by time bucket
-
-        if template_key != "CHEST_BACK":
-            _trim_or_pad_movements(day, req)
-            _dedupe_day(day)
-            _enforce_compound_cap(day, req.session_minutes) 
-            _enforce_strict_equipment(day, req)
-        
-        _enforce_avoid_shoulders(day, req)
-        _dedupe_day(day)
-        _enforce_strict_equipment(day, req)
-
-        # Deterministic time enforcement against session_minutes
-        _enforce_session_minutes(day, req)
-        _dedupe_day(day)
-        _enforce_strict_equipment(day, req)
-        _enforce_session_minutes(day, req)
-        _enforce_strict_equipment(day, req)
-
-        
-        
+        runner = PassRunner(DayJob(day, ctx, template_key), trace)
+        runner.run_all(DAY_PASSES)
+        if fixed_point:
+            runner.run_to_fixed_point(FIXED_POINT_PASSES, RULES_FIXED_POINT_MAX_ROUNDS)
 
     # Notes (short, deterministic, matches your philosophy)
     WARMUP_LINE = "Before each main or accessory lift, do 1 lighter warm-up set at ~50% of your working weight."
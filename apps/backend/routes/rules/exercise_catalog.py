@@ -153,23 +153,35 @@ def is_isolation(name: str) -> bool:
     return bool(meta and meta.kind == KIND_ISOLATION)
 
 
+# Name lists per (kind, region), built once; callers get fresh copies.
+_BY_KIND: Dict[str, Tuple[str, ...]] = {
+    kind: tuple(m.name for m in EXERCISES.values() if m.kind == kind)
+    for kind in (KIND_COMPOUND, KIND_ISOLATION)
+}
+_BY_KIND_REGION: Dict[Tuple[str, str], Tuple[str, ...]] = {
+    (kind, region): tuple(m.name for m in EXERCISES.values() if m.kind == kind and m.region == region)
+    for kind in (KIND_COMPOUND, KIND_ISOLATION)
+    for region in ("upper", "lower")
+}
+
+
+def _focus_region(focus: str) -> str:
+    f = (focus or "").lower()
+    want_lower = ("lower" in f) or ("leg" in f)
+    return "lower" if want_lower else "upper"
+
+
 def all_compounds() -> List[str]:
-    return [m.name for m in EXERCISES.values() if m.kind == KIND_COMPOUND]
+    return list(_BY_KIND[KIND_COMPOUND])
 
 
 def all_isolations() -> List[str]:
-    return [m.name for m in EXERCISES.values() if m.kind == KIND_ISOLATION]
+    return list(_BY_KIND[KIND_ISOLATION])
 
 
 def get_compounds_for_focus(focus: str) -> List[str]:
-    f = (focus or "").lower()
-    want_lower = ("lower" in f) or ("leg" in f)
-    region = "lower" if want_lower else "upper"
-    return [m.name for m in EXERCISES.values() if m.kind == KIND_COMPOUND and m.region == region]
+    return list(_BY_KIND_REGION[(KIND_COMPOUND, _focus_region(focus))])
 
 
 def get_isolations_for_focus(focus: str) -> List[str]:
-    f = (focus or "").lower()
-    want_lower = ("lower" in f) or ("leg" in f)
-    region = "lower" if want_lower else "upper"
-    return [m.name for m in EXERCISES.values() if m.kind == KIND_ISOLATION and m.region == region]
+    return list(_BY_KIND_REGION[(KIND_ISOLATION, _focus_region(focus))])
@@ -0,0 +1,191 @@
+"""
+Compiled exercise classification for the rules engine.
+
+Every catalog name is classified once at import: canonical key, kind,
+region, catalog tags, focus groups those tags satisfy, and an equipment
+bitmask from the catalog tags plus the name-token tables below. Names
+outside the catalog (LLM output, priority-list variants like "Lateral
+Raises (DB)") are classified on first sight and kept in an LRU cache, so
+a rules run does one dict lookup per name instead of catalog scans.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from routes.rules.exercise_catalog import EXERCISES, KIND_COMPOUND, normalize_name
+
+# -----------------------------
+# Equipment bits
+# -----------------------------
+EQ_MACHINE = 1 << 0
+EQ_CABLE = 1 << 1
+EQ_DUMBBELL = 1 << 2
+EQ_BODYWEIGHT = 1 << 3
+EQ_BARBELL = 1 << 4
+
+# -----------------------------
+# Name-token tables (substring matches on the lower-cased name)
+# -----------------------------
+_BARBELL_TOKENS = (
+    "barbell",
+    "ez bar",
+    "back squat",
+    "front squat",
+    "deadlift",
+    "romanian deadlift",
+    "stiff-leg deadlift",
+    "rdl",
+    "bent-over barbell row",
+    "barbell bench press",
+    "t-bar row",
+    "barbell overhead press",
+    "barbell row",
+    "incline bench press",
+    "hip thrust"
+)
+
+_MACHINE_TOKENS = (
+    "machine",
+    "smith",
+    "hack squat",
+    "leg press",
+    "pec deck",
+    "pulldown",
+    "pushdown",
+    "seated calf",
+    "lever",
+    "leg extension",
+    "leg curl",
+    "adductor",
+    "abductor",
+    "pullover",
+)
+_CABLE_TOKENS = ("cable", "face pull")
+_DUMBBELL_TOKENS = ("dumbbell", "db ")
+_BODYWEIGHT_TOKENS = (
+    "bodyweight",
+    "push-up",
+    "push up",
+    "pull up",
+    "pull-up",
+    "inverted row",
+    "pike push",
+    "lunge",
+    "split squat",
+    "glute bridge",
+    "walkout",
+    "bodyweight calf raise",
+    "standing calf raise",
+    "crunch",
+    "plank",
+    "hanging leg raise",
+)
+
+# Broad focus names -> the specific catalog tags they cover.
+_FOCUS_TAG_ALIASES: dict[str, frozenset] = {
+    "legs":       frozenset({"quads", "hamstrings", "glutes", "calves", "legs", "adductors", "abductors"}),
+    "arms":       frozenset({"biceps", "triceps", "arms"}),
+    "shoulders":  frozenset({"shoulders", "side_delts", "front_delts", "rear_delts"}),
+    "back":       frozenset({"back", "lats", "upper_back", "rear_delts"}),
+    "chest":      frozenset({"chest"}),
+    "core":       frozenset({"abs", "core"}),
+    "glutes":     frozenset({"glutes"}),
+    "quads":      frozenset({"quads"}),
+    "hamstrings": frozenset({"hamstrings"}),
+    "calves":     frozenset({"calves"}),
+}
+
+_CANON = {k.lower(): k for k in EXERCISES.keys()}
+
+EXERCISE_CLASS_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class ExerciseClass:
+    canon: Optional[str]          # catalog key, None when unknown
+    kind: Optional[str]           # "compound" | "isolation" | None
+    region: Optional[str]         # "upper" | "lower" | None
+    tags: Tuple[str, ...]         # catalog tags
+    focus_tags: FrozenSet[str]    # tags plus every focus alias they satisfy
+    equipment: int                # EQ_* bits
+
+    @property
+    def is_compound(self) -> bool:
+        return self.kind == KIND_COMPOUND
+
+    def allowed_for(self, equipment: str) -> bool:
+        eq = self.equipment
+        if equipment == "bodyweight":
+            return eq & (EQ_BODYWEIGHT | EQ_DUMBBELL | EQ_BARBELL | EQ_MACHINE | EQ_CABLE) == EQ_BODYWEIGHT
+        if equipment == "dumbbells":
+            return bool(eq & (EQ_DUMBBELL | EQ_BODYWEIGHT)) and not eq & (EQ_BARBELL | EQ_MACHINE | EQ_CABLE)
+        return True
+
+
+def canon_key(name: str) -> Optional[str]:
+    """Case-insensitive catalog key for `name`, else None."""
+    n = normalize_name(name)
+    if not n:
+        return None
+    canon = _CANON.get(n.lower())
+    if canon:
+        return canon
+    return n if n in EXERCISES else None
+
+
+def _equipment_bits(lc: str, tags: Tuple[str, ...]) -> int:
+    bits = 0
+    if "machine" in tags or any(tok in lc for tok in _MACHINE_TOKENS):
+        bits |= EQ_MACHINE
+    if "cable" in tags or any(tok in lc for tok in _CABLE_TOKENS):
+        bits |= EQ_CABLE
+    if "dumbbell" in tags or any(tok in lc for tok in _DUMBBELL_TOKENS):
+        bits |= EQ_DUMBBELL
+    if "bodyweight" in tags or any(tok in lc for tok in _BODYWEIGHT_TOKENS):
+        bits |= EQ_BODYWEIGHT
+    # dumbbell wording always wins over barbell tokens
+    if not ("dumbbell" in lc or "db " in f"{lc} ") and any(tok in lc for tok in _BARBELL_TOKENS):
+        bits |= EQ_BARBELL
+    return bits
+
+
+def _compile(name: str) -> ExerciseClass:
+    canon = canon_key(name)
+    meta = EXERCISES.get(canon) if canon else None
+    tags = meta.tags if meta else ()
+    focus_tags = set(tags)
+    for group, aliases in _FOCUS_TAG_ALIASES.items():
+        if aliases.intersection(tags):
+            focus_tags.add(group)
+    return ExerciseClass(
+        canon=canon,
+        kind=meta.kind if meta else None,
+        region=meta.region if meta else None,
+        tags=tags,
+        focus_tags=frozenset(focus_tags),
+        equipment=_equipment_bits((name or "").strip().lower(), tags),
+    )
+
+
+# Catalog names in the spellings the engine passes around.
+_INDEX: Dict[str, ExerciseClass] = {}
+for _key in EXERCISES:
+    _INDEX[_key] = _compile(_key)
+    _INDEX.setdefault(_key.lower(), _compile(_key.lower()))
+
+
+@lru_cache(maxsize=EXERCISE_CLASS_CACHE_SIZE)
+def _classify_uncached_name(name: str) -> ExerciseClass:
+    return _compile(name)
+
+
+def classify(name: Optional[str]) -> ExerciseClass:
+    """Classification of `name` exactly as spelled (case and padding matter for tokens)."""
+    name = name or ""
+    hit = _INDEX.get(name)
+    if hit is not None:
+        return hit
+    return _classify_uncached_name(name)
@@ -0,0 +1,180 @@
+"""
+Rule pass pipeline for the rules engine.
+
+A day is shaped by an ordered list of passes. Each pass declares which
+parts of the day its decisions read ("exercises", "volume", "notes",
+"warmup") and whether it is idempotent. After an idempotent pass runs,
+the runner snapshots the parts it reads; when the pass comes up again and
+nothing it reads has changed since, running it would be a no-op, so it is
+skipped. Non-idempotent passes (time enforcement adds volume on every run)
+always run.
+
+Fixed-point mode re-runs a chosen subset of idempotent passes after the
+pipeline until a full round changes nothing. An optional RuleTrace records
+per-pass runs, skips, changes and wall time.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Optional, Sequence, Tuple
+
+from models.plans import DayPlan
+
+DAY_FIELDS = ("exercises", "volume", "notes", "warmup")
+_ALL_FIELDS = frozenset(DAY_FIELDS)
+
+
+@dataclass
+class DayJob:
+    """Everything a pass may read besides the day itself."""
+    day: DayPlan
+    ctx: Any            # RuleContext for the whole apply_rules_v1 call
+    template_key: str
+
+
+def _always(job: DayJob) -> bool:
+    return True
+
+
+@dataclass(frozen=True)
+class RulePass:
+    name: str
+    run: Callable[[DayJob], None]
+    reads: FrozenSet[str] = _ALL_FIELDS
+    idempotent: bool = False
+    applies: Callable[[DayJob], bool] = _always
+
+
+@dataclass
+class PassStats:
+    runs: int = 0
+    skips: int = 0
+    changes: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class RuleTrace:
+    passes: Dict[str, PassStats] = field(default_factory=dict)
+    fixed_point_rounds: int = 0
+    converged: Optional[bool] = None
+
+    def stats(self, name: str) -> PassStats:
+        s = self.passes.get(name)
+        if s is None:
+            s = self.passes[name] = PassStats()
+        return s
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "passes": {
+                name: {
+                    "runs": s.runs,
+                    "skips": s.skips,
+                    "changes": s.changes,
+                    "ms": round(s.seconds * 1000.0, 3),
+                }
+                for name, s in sorted(self.passes.items(), key=lambda kv: -kv[1].seconds)
+            },
+            "fixed_point_rounds": self.fixed_point_rounds,
+            "converged": self.converged,
+        }
+
+
+def _items(day: DayPlan) -> list:
+    return list(day.main or []) + list(day.accessories or [])
+
+
+_FIELD_KEYS: Dict[str, Callable[[DayPlan], Tuple]] = {
+    "exercises": lambda day: (
+        tuple([ex.name for ex in (day.main or [])]),
+        tuple([ex.name for ex in (day.accessories or [])]),
+    ),
+    "volume": lambda day: tuple([(ex.sets, ex.reps, ex.rest_seconds) for ex in _items(day)]),
+    "notes": lambda day: tuple([ex.notes for ex in _items(day)]),
+    "warmup": lambda day: tuple(day.warmup or []),
+}
+
+
+def day_state(day: DayPlan, fields: FrozenSet[str] = _ALL_FIELDS) -> Tuple:
+    return tuple(_FIELD_KEYS[f](day) for f in DAY_FIELDS if f in fields)
+
+
+class PassRunner:
+    """
+    Runs passes over one day, remembering what each idempotent pass last saw.
+
+    Whole-day snapshots (for change counts) are only taken when a trace is
+    attached or during fixed-point rounds; otherwise `run` reports True
+    whenever the pass actually ran.
+    """
+
+    def __init__(self, job: DayJob, trace: Optional[RuleTrace] = None):
+        self.job = job
+        self.trace = trace
+        self.track_changes = trace is not None
+        self._seen: Dict[str, Tuple] = {}
+        # Snapshots of the day as it is now, by field set. Nothing but passes
+        # mutates the day, so these stay valid until the next pass runs.
+        self._snaps: Dict[FrozenSet[str], Tuple] = {}
+
+    def _snapshot(self, fields: FrozenSet[str]) -> Tuple:
+        snap = self._snaps.get(fields)
+        if snap is None:
+            snap = self._snaps[fields] = day_state(self.job.day, fields)
+        return snap
+
+    def run(self, p: RulePass) -> bool:
+        """Run `p` unless it is clean; return True if the day changed."""
+        job = self.job
+        if not p.applies(job):
+            return False
+        if p.idempotent:
+            seen = self._seen.get(p.name)
+            if seen is not None and seen == self._snapshot(p.reads):
+                if self.trace is not None:
+                    self.trace.stats(p.name).skips += 1
+                return False
+
+        before = self._snapshot(_ALL_FIELDS) if self.track_changes else None
+        self._snaps = {}
+        if self.trace is None:
+            p.run(job)
+        else:
+            t0 = time.perf_counter()
+            p.run(job)
+            elapsed = time.perf_counter() - t0
+
+        if p.idempotent:
+            self._seen[p.name] = self._snapshot(p.reads)
+        changed = self._snapshot(_ALL_FIELDS) != before if self.track_changes else True
+        if self.trace is not None:
+            s = self.trace.stats(p.name)
+            s.runs += 1
+            s.seconds += elapsed
+            s.changes += int(changed)
+        return changed
+
+    def run_all(self, passes: Sequence[RulePass]) -> bool:
+        changed = False
+        for p in passes:
+            changed = self.run(p) or changed
+        return changed
+
+    def run_to_fixed_point(self, passes: Sequence[RulePass], max_rounds: int) -> bool:
+        """Repeat `passes` until a round changes nothing; False if `max_rounds` ran out."""
+        self.track_changes = True
+        for rounds in range(1, max_rounds + 1):
+            if not self.run_all(passes):
+                self._record_rounds(rounds, True)
+                return True
+        self._record_rounds(max_rounds, False)
+        return False
+
+    def _record_rounds(self, rounds: int, converged: bool) -> None:
+        if self.trace is None:
+            return
+        self.trace.fixed_point_rounds = max(self.trace.fixed_point_rounds, rounds)
+        self.trace.converged = converged if self.trace.converged is None else (self.trace.converged and converged)
@@ -0,0 +1,67 @@
+"""
+In-process cache of apply_rules_v1 results.
+
+The rules engine is deterministic in (plan, request), so repeated applies of
+the same preferences to the same plan version (toggling a preference back
+and forth, retries) can share one result. Keys hold a digest of the input
+plan plus the request fields the engine reads, including the Phase 1
+`avoid`, `constraints_tokens` and `preferences_tokens` lists (sorted: the
+engine only tests membership). Results are deep-copied on the way in and
+out.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+from typing import Any, Dict, Hashable, Optional
+
+from models.plans import GeneratePlanRequest, GeneratePlanResponse
+from routes.rules.engine import apply_rules_v1
+from services.lru_cache import LRUCache
+
+RULES_RESULT_CACHE_SIZE = int(os.getenv("RULES_RESULT_CACHE_SIZE", "256"))
+# Optional; unset means entries live until evicted.
+_TTL = os.getenv("RULES_RESULT_CACHE_TTL_SECONDS")
+RULES_RESULT_CACHE_TTL_SECONDS: Optional[float] = float(_TTL) if _TTL else None
+
+_UNORDERED_FIELDS = ("avoid", "constraints_tokens", "preferences_tokens")
+
+_CACHE = LRUCache(
+    maxsize=RULES_RESULT_CACHE_SIZE,
+    ttl_seconds=RULES_RESULT_CACHE_TTL_SECONDS,
+)
+
+
+def rules_cache_key(plan: GeneratePlanResponse, req: Any) -> Hashable:
+    plan_digest = hashlib.sha256(plan.model_dump_json().encode("utf-8")).hexdigest()
+    fields = {k: getattr(req, k, None) for k in GeneratePlanRequest.model_fields}
+    for k in _UNORDERED_FIELDS:
+        fields[k] = sorted(str(x) for x in (getattr(req, k, None) or []))
+    return (plan_digest, json.dumps(fields, sort_keys=True, default=str))
+
+
+def cached_apply_rules(plan: GeneratePlanResponse, req: Any) -> GeneratePlanResponse:
+    """
+    apply_rules_v1 through the result cache; returns a private copy.
+
+    On a miss `plan` is shaped in place exactly like apply_rules_v1 does; on
+    a hit it is left untouched, so always use the return value.
+    """
+    key = rules_cache_key(plan, req)
+    hit = _CACHE.get(key)
+    if hit is not None:
+        return copy.deepcopy(hit)
+    result = apply_rules_v1(plan=plan, req=req)
+    _CACHE.put(key, copy.deepcopy(result))
+    return result
+
+
+def rules_cache_stats() -> Dict[str, Any]:
+    return _CACHE.stats()
+
+
+def clear_rules_cache() -> None:
+    _CACHE.clear()
@@ -5,275 +5,567 @@ import json
 import secrets
 import hashlib
 from pathlib import Path
-from typing import Optional, Dict, List, Any, Tuple
+from typing import Optional, Dict, List, Any, Tuple, Callable, Iterator
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 import os
+import copy
+import threading
+
+from models.plans import extract_restore_meta
+from services.db_pool import ConnectionPool, PooledConnection
+from services.json_patch import apply_patch, make_patch
+from services.lru_cache import LRUCache
 
 SESSION_EXPIRY_DAYS = int(os.getenv("SESSION_EXPIRY_DAYS", "7"))
 OTP_EXPIRY_MINUTES = int(os.getenv("OTP_EXPIRY_MINUTES", "15"))
 EMAIL_VERIFICATION_EXPIRY_HOURS = int(os.getenv("EMAIL_VERIFICATION_EXPIRY_HOURS", "24"))
 PASSWORD_RESET_EXPIRY_HOURS = int(os.getenv("PASSWORD_RESET_EXPIRY_HOURS", "1"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+# Every Nth plan version (1, N+1, 2N+1, ...) is stored in full; the rest are
+# JSON patches against the previous version.
+PLAN_VERSION_KEYFRAME_INTERVAL = int(os.getenv("PLAN_VERSION_KEYFRAME_INTERVAL", "10"))
+PLAN_VERSION_CACHE_SIZE = int(os.getenv("PLAN_VERSION_CACHE_SIZE", "256"))
 
 # .../apps/backend/services/db.py -> data/gymgpt.db
 DB_DIR = (Path(__file__).resolve().parent / ".." / ".." / "data").resolve()
 DB_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = DB_DIR / "gymgpt.db"
 
-def _conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    # light concurrency safety + durability for dev
-    conn.execute("PRAGMA journal_mode = WAL;")
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
+# Shared by every helper below. The path is read per lease so tests can
+# monkeypatch DB_PATH.
+_POOL = ConnectionPool(lambda: DB_PATH, size=DB_POOL_SIZE)
 
-def init_db() -> None:
-    with _conn() as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS logs(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                reps INTEGER NOT NULL,
-                weight_kg REAL NOT NULL,
-                rir INTEGER NOT NULL,
-                focus TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_logs_name_time ON logs(name, timestamp);"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS plans(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                title TEXT NOT NULL,
-                input_json TEXT NOT NULL,
-                output_json TEXT NOT NULL
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_plans_created_at ON plans(created_at);"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS plan_versions(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                plan_id INTEGER NOT NULL,
-                version INTEGER NOT NULL,
-                input_json TEXT NOT NULL,
-                output_json TEXT NOT NULL,
-                diff_json TEXT, 
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(plan_id) REFERENCES plans(id) ON DELETE CASCADE,
-                UNIQUE(plan_id, version)
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_plan_versions_plan_id ON plan_versions(plan_id);"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now'))
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sessions(
-                token TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL REFERENCES users(id),
-                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
-                expires_at TEXT
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS login_codes(
-                id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                email      TEXT NOT NULL,
-                code_hash  TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
-                expires_at TEXT NOT NULL,
-                used       INTEGER NOT NULL DEFAULT 0
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_login_codes_email ON login_codes(email);"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS nutrition_plans(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                title TEXT NOT NULL,
-                input_json TEXT NOT NULL,
-                output_json TEXT NOT NULL,
-                owner_id INTEGER NOT NULL REFERENCES users(id)
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_nutrition_plans_owner_id ON nutrition_plans(owner_id);"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS email_verification_tokens(
-                id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id    INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                token_hash TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
-                expires_at TEXT NOT NULL,
-                used       INTEGER NOT NULL DEFAULT 0
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_evt_user_id ON email_verification_tokens(user_id);"
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS password_reset_tokens(
-                id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id    INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                token_hash TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
-                expires_at TEXT NOT NULL,
-                used       INTEGER NOT NULL DEFAULT 0
-            );
-            """
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_prt_user_id ON password_reset_tokens(user_id);"
+
+def _conn() -> PooledConnection:
+    """
+    Lease this thread's pooled connection.
+
+    `with _conn() as conn:` commits on success, rolls back on error and returns
+    the connection to the pool; `close()` returns it explicitly.
+    """
+    return _POOL.connection()
+
+
+def pool_stats() -> Dict[str, int]:
+    return _POOL.stats()
+
+
+def close_pool() -> None:
+    _POOL.close_all()
+
+
+# ---------------------------------------------------------------------------
+# Schema registry
+# ---------------------------------------------------------------------------
+
+# (db path, {table: column names}) — filled once by init_db(), dropped by
+# invalidate_schema() whenever a migration alters a table.
+_SCHEMA: Optional[Tuple[Path, Dict[str, frozenset]]] = None
+
+
+def _introspect_schema(conn: sqlite3.Connection) -> Dict[str, frozenset]:
+    tables = [
+        r["name"]
+        for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
         )
-    migrate_add_diff_json()
-    migrate_add_plan_owner()
-    migrate_session_expiry()
-    migrate_database_hardening()
-    migrate_add_active_plan_id()
-    migrate_add_password_hash()
-    migrate_add_email_verified()
+    ]
+    return {
+        t: frozenset(r["name"] for r in conn.execute(f"PRAGMA table_info({t});"))
+        for t in tables
+    }
+
+
+def refresh_schema() -> None:
+    global _SCHEMA
+    with _conn() as conn:
+        _SCHEMA = (DB_PATH, _introspect_schema(conn))
+
+
+def invalidate_schema() -> None:
+    global _SCHEMA
+    _SCHEMA = None
+
+
+def table_columns(table: str) -> frozenset:
+    """Cached column names for `table` (empty if the table does not exist)."""
+    if _SCHEMA is None or _SCHEMA[0] != DB_PATH:
+        refresh_schema()
+    return _SCHEMA[1].get(table, frozenset())
+
+
+# Prebuilt plan statements, keyed by whether plans.owner_id exists (legacy DBs
+# created before migrate_add_plan_owner lack it).
+_PLAN_SQL: Dict[bool, Dict[str, str]] = {
+    True: {
+        "insert": "INSERT INTO plans(title, input_json, output_json, owner_id) VALUES (?,?,?,?)",
+        "select_by_id": "SELECT id, created_at, title, input_json, output_json, owner_id FROM plans WHERE id = ?",
+        "list_all": "SELECT id, created_at, title, owner_id FROM plans ORDER BY id DESC LIMIT ? OFFSET ?",
+        "list_owned": (
+            "SELECT id, created_at, title, owner_id FROM plans WHERE owner_id = ? "
+            "ORDER BY id DESC LIMIT ? OFFSET ?"
+        ),
+    },
+    False: {
+        "insert": "INSERT INTO plans(title, input_json, output_json) VALUES (?,?,?)",
+        "select_by_id": "SELECT id, created_at, title, input_json, output_json FROM plans WHERE id = ?",
+        "list_all": "SELECT id, created_at, title FROM plans ORDER BY id DESC LIMIT ? OFFSET ?",
+    },
+}
+
+
+def _plans_have_owner() -> bool:
+    return "owner_id" in table_columns("plans")
+
+
+# ---------------------------------------------------------------------------
+# Schema migrations
+# ---------------------------------------------------------------------------
+
+def _create_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS logs(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            reps INTEGER NOT NULL,
+            weight_kg REAL NOT NULL,
+            rir INTEGER NOT NULL,
+            focus TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_logs_name_time ON logs(name, timestamp);"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS plans(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            title TEXT NOT NULL,
+            input_json TEXT NOT NULL,
+            output_json TEXT NOT NULL
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plans_created_at ON plans(created_at);"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS plan_versions(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            input_json TEXT NOT NULL,
+            output_json TEXT NOT NULL,
+            diff_json TEXT, 
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(plan_id) REFERENCES plans(id) ON DELETE CASCADE,
+            UNIQUE(plan_id, version)
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plan_versions_plan_id ON plan_versions(plan_id);"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now'))
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions(
+            token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
+            expires_at TEXT
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS login_codes(
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            email      TEXT NOT NULL,
+            code_hash  TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
+            expires_at TEXT NOT NULL,
+            used       INTEGER NOT NULL DEFAULT 0
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_codes_email ON login_codes(email);"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS nutrition_plans(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            title TEXT NOT NULL,
+            input_json TEXT NOT NULL,
+            output_json TEXT NOT NULL,
+            owner_id INTEGER NOT NULL REFERENCES users(id)
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_nutrition_plans_owner_id ON nutrition_plans(owner_id);"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_verification_tokens(
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id    INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            token_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
+            expires_at TEXT NOT NULL,
+            used       INTEGER NOT NULL DEFAULT 0
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_evt_user_id ON email_verification_tokens(user_id);"
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS password_reset_tokens(
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id    INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            token_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
+            expires_at TEXT NOT NULL,
+            used       INTEGER NOT NULL DEFAULT 0
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_prt_user_id ON password_reset_tokens(user_id);"
+    )
 
-def migrate_add_diff_json() -> None:
+
+def migrate_add_diff_json(conn: sqlite3.Connection) -> None:
     """
     One-time safe migration to add diff_json to plan_versions
     """
-    with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(plan_versions);")]
-        if "diff_json" not in cols:
-            conn.execute("ALTER TABLE plan_versions ADD COLUMN diff_json TEXT;")
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(plan_versions);")]
+    if "diff_json" not in cols:
+        conn.execute("ALTER TABLE plan_versions ADD COLUMN diff_json TEXT;")
 
 
-def migrate_add_plan_owner() -> None:
+def migrate_add_plan_owner(conn: sqlite3.Connection) -> None:
     """
     One-time safe migration to add owner_id to plans
     """
-    with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(plans);")]
-        if "owner_id" not in cols:
-            conn.execute("ALTER TABLE plans ADD COLUMN owner_id INTEGER NULL;")
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(plans);")]
+    if "owner_id" not in cols:
+        conn.execute("ALTER TABLE plans ADD COLUMN owner_id INTEGER NULL;")
 
 
-def migrate_session_expiry() -> None:
+def migrate_session_expiry(conn: sqlite3.Connection) -> None:
     """Backfill NULL expires_at with created_at + SESSION_EXPIRY_DAYS, delete already-expired."""
-    with _conn() as conn:
-        # Backfill any sessions that have NULL expires_at
-        conn.execute(
-            """
-            UPDATE sessions
-            SET expires_at = strftime('%%Y-%%m-%%dT%%H:%%M:%%SZ',
-                                     created_at, '+%d days')
-            WHERE expires_at IS NULL
-            """ % SESSION_EXPIRY_DAYS
-        )
-        # Purge sessions that are already expired
-        conn.execute(
-            """
-            DELETE FROM sessions
-            WHERE expires_at IS NOT NULL
-              AND expires_at <= strftime('%Y-%m-%dT%H:%M:%SZ', 'now')
-            """
-        )
+    # Backfill any sessions that have NULL expires_at
+    conn.execute(
+        """
+        UPDATE sessions
+        SET expires_at = strftime('%%Y-%%m-%%dT%%H:%%M:%%SZ',
+                                 created_at, '+%d days')
+        WHERE expires_at IS NULL
+        """ % SESSION_EXPIRY_DAYS
+    )
+    # Purge sessions that are already expired
+    conn.execute(
+        """
+        DELETE FROM sessions
+        WHERE expires_at IS NOT NULL
+          AND expires_at <= strftime('%Y-%m-%dT%H:%M:%SZ', 'now')
+        """
+    )
 
 
-def migrate_add_active_plan_id() -> None:
+def migrate_add_active_plan_id(conn: sqlite3.Connection) -> None:
     """One-time safe migration to add active_plan_id to users."""
-    with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(users);")]
-        if "active_plan_id" not in cols:
-            conn.execute(
-                "ALTER TABLE users ADD COLUMN active_plan_id INTEGER NULL REFERENCES plans(id);"
-            )
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(users);")]
+    if "active_plan_id" not in cols:
+        conn.execute(
+            "ALTER TABLE users ADD COLUMN active_plan_id INTEGER NULL REFERENCES plans(id);"
+        )
 
 
-def migrate_add_password_hash() -> None:
+def migrate_add_password_hash(conn: sqlite3.Connection) -> None:
     """One-time safe migration to add password_hash to users (nullable — OTP users have NULL)."""
-    with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(users);")]
-        if "password_hash" not in cols:
-            conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT NULL;")
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(users);")]
+    if "password_hash" not in cols:
+        conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT NULL;")
 
 
-def migrate_add_email_verified() -> None:
+def migrate_add_email_verified(conn: sqlite3.Connection) -> None:
     """One-time safe migration to add email_verified flag to users. Defaults to 0 (unverified)."""
-    with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(users);")]
-        if "email_verified" not in cols:
-            conn.execute("ALTER TABLE users ADD COLUMN email_verified INTEGER NOT NULL DEFAULT 0;")
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(users);")]
+    if "email_verified" not in cols:
+        conn.execute("ALTER TABLE users ADD COLUMN email_verified INTEGER NOT NULL DEFAULT 0;")
 
 
-def migrate_database_hardening() -> None:
+def migrate_database_hardening(conn: sqlite3.Connection) -> None:
     """Add missing indexes and enforce NOT NULL on sessions.expires_at."""
-    with _conn() as conn:
-        # Index for "My Plans" queries (WHERE owner_id = ?)
+    # Index for "My Plans" queries (WHERE owner_id = ?)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plans_owner_id ON plans(owner_id);"
+    )
+    # Index for session lookups by user
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);"
+    )
+
+    # Enforce NOT NULL on sessions.expires_at:
+    # After migrate_session_expiry(), no NULL rows should exist.
+    # SQLite requires table rebuild to add NOT NULL constraint.
+    cols = {r["name"]: r["notnull"] for r in conn.execute("PRAGMA table_info(sessions);")}
+    if cols.get("expires_at") == 0:
+        # Verify no NULLs remain before rebuilding
+        null_count = conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at IS NULL"
+        ).fetchone()[0]
+        if null_count == 0:
+            conn.execute(
+                """
+                CREATE TABLE sessions_new(
+                    token TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL REFERENCES users(id),
+                    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
+                    expires_at TEXT NOT NULL
+                );
+                """
+            )
+            conn.execute(
+                "INSERT INTO sessions_new SELECT * FROM sessions;"
+            )
+            conn.execute("DROP TABLE sessions;")
+            conn.execute("ALTER TABLE sessions_new RENAME TO sessions;")
+            # Recreate index after table rebuild
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);"
+            )
+
+
+def migrate_plan_version_storage(conn: sqlite3.Connection) -> None:
+    """Add plan_versions.storage: 'full' rows hold JSON, 'delta' rows hold JSON patches."""
+    cols = [r["name"] for r in conn.execute("PRAGMA table_info(plan_versions);")]
+    if "storage" not in cols:
         conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_plans_owner_id ON plans(owner_id);"
+            "ALTER TABLE plan_versions ADD COLUMN storage TEXT NOT NULL DEFAULT 'full';"
+        )
+
+
+def migrate_plan_versions_version_index(conn: sqlite3.Connection) -> None:
+    """Index plan_versions on (plan_id, version DESC) for newest-first keyset pages."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plan_versions_plan_version ON plan_versions(plan_id, version DESC);"
+    )
+    # Prefix of the new index — no longer needed.
+    conn.execute("DROP INDEX IF EXISTS idx_plan_versions_plan_id;")
+
+
+def migrate_owner_keyset_indexes(conn: sqlite3.Connection) -> None:
+    """Composite (owner_id, id DESC) indexes for keyset-paginated plan listings."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_plans_owner_id_id ON plans(owner_id, id DESC);"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_nutrition_plans_owner_id_id ON nutrition_plans(owner_id, id DESC);"
+    )
+    # Prefixes of the composite indexes — no longer needed.
+    conn.execute("DROP INDEX IF EXISTS idx_plans_owner_id;")
+    conn.execute("DROP INDEX IF EXISTS idx_nutrition_plans_owner_id;")
+
+
+def migrate_logs_focus_index(conn: sqlite3.Connection) -> None:
+    """(focus, id DESC) index for focus-filtered, newest-first log pages."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_logs_focus_id ON logs(focus, id DESC);"
+    )
+
+
+# Depth of the exercise_latest summary: the newest N sets per exercise are
+# kept by triggers. Baked into the triggers, so changing it needs a migration.
+EXERCISE_LATEST_DEPTH = 5
+
+_EXERCISE_LATEST_REFILL = f"""
+    DELETE FROM exercise_latest WHERE name = {{name}};
+    INSERT INTO exercise_latest(log_id, name, reps, weight_kg, rir, timestamp)
+        SELECT id, name, reps, weight_kg, rir, timestamp
+        FROM logs
+        WHERE name = {{name}}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT {EXERCISE_LATEST_DEPTH};
+"""
+
+
+def migrate_exercise_latest(conn: sqlite3.Connection) -> None:
+    """
+    exercise_latest summary table (newest EXERCISE_LATEST_DEPTH sets per
+    exercise) kept current by triggers on logs, plus a timestamp index for
+    the recent-window query.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS exercise_latest(
+            log_id    INTEGER PRIMARY KEY,
+            name      TEXT NOT NULL,
+            reps      INTEGER NOT NULL,
+            weight_kg REAL NOT NULL,
+            rir       INTEGER NOT NULL,
+            timestamp DATETIME
+        );
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_exercise_latest_name_time "
+        "ON exercise_latest(name, timestamp DESC, log_id DESC);"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp);")
+
+    conn.execute("DROP TRIGGER IF EXISTS trg_logs_latest_insert;")
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_logs_latest_insert AFTER INSERT ON logs
+        BEGIN
+            INSERT INTO exercise_latest(log_id, name, reps, weight_kg, rir, timestamp)
+                VALUES (NEW.id, NEW.name, NEW.reps, NEW.weight_kg, NEW.rir, NEW.timestamp);
+            DELETE FROM exercise_latest
+            WHERE name = NEW.name
+              AND log_id NOT IN (
+                  SELECT log_id FROM exercise_latest
+                  WHERE name = NEW.name
+                  ORDER BY timestamp DESC, log_id DESC
+                  LIMIT {EXERCISE_LATEST_DEPTH}
+              );
+        END;
+        """
+    )
+    # Deletes and edits are rare: rebuild the affected exercise from logs.
+    conn.execute("DROP TRIGGER IF EXISTS trg_logs_latest_delete;")
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_logs_latest_delete AFTER DELETE ON logs
+        BEGIN
+            {_EXERCISE_LATEST_REFILL.format(name="OLD.name")}
+        END;
+        """
+    )
+    conn.execute("DROP TRIGGER IF EXISTS trg_logs_latest_update;")
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_logs_latest_update AFTER UPDATE ON logs
+        BEGIN
+            {_EXERCISE_LATEST_REFILL.format(name="OLD.name")}
+            {_EXERCISE_LATEST_REFILL.format(name="NEW.name")}
+        END;
+        """
+    )
+
+    conn.execute("DELETE FROM exercise_latest;")
+    conn.execute(
+        f"""
+        INSERT INTO exercise_latest(log_id, name, reps, weight_kg, rir, timestamp)
+        SELECT id, name, reps, weight_kg, rir, timestamp
+        FROM (
+            SELECT l.*, ROW_NUMBER() OVER (
+                PARTITION BY name ORDER BY timestamp DESC, id DESC
+            ) AS rn
+            FROM logs l
         )
-        # Index for session lookups by user
+        WHERE rn <= {EXERCISE_LATEST_DEPTH};
+        """
+    )
+
+
+def migrate_logs_name_index(conn: sqlite3.Connection) -> None:
+    """(name, id DESC) index for name-filtered, newest-first log pages."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs(name, id DESC);"
+    )
+
+
+# Ordered, run-once schema steps. Append new steps with the next version;
+# never renumber or edit a step that has shipped. Steps written before the
+# schema_version table existed are idempotent, so legacy databases replay
+# them once safely.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _create_base_tables),
+    (2, migrate_add_diff_json),
+    (3, migrate_add_plan_owner),
+    (4, migrate_session_expiry),
+    (5, migrate_database_hardening),
+    (6, migrate_add_active_plan_id),
+    (7, migrate_add_password_hash),
+    (8, migrate_add_email_verified),
+    (9, migrate_plan_version_storage),
+    (10, migrate_plan_versions_version_index),
+    (11, migrate_owner_keyset_indexes),
+    (12, migrate_logs_focus_index),
+    (13, migrate_exercise_latest),
+    (14, migrate_logs_name_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _current_schema_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        # Fresh or pre-versioning database
+        return 0
+    return row[0] or 0
+
+
+def init_db() -> None:
+    """
+    Bring the schema up to SCHEMA_VERSION.
+
+    When the database is already current this is a single SELECT. Otherwise
+    each pending step runs in its own IMMEDIATE transaction together with its
+    schema_version row, so a step is applied exactly once even when several
+    workers start at the same time.
+    """
+    with _conn() as conn:
+        current = _current_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return
+
+    with _conn() as conn:
         conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);"
-        )
-
-        # Enforce NOT NULL on sessions.expires_at:
-        # After migrate_session_expiry(), no NULL rows should exist.
-        # SQLite requires table rebuild to add NOT NULL constraint.
-        cols = {r["name"]: r["notnull"] for r in conn.execute("PRAGMA table_info(sessions);")}
-        if cols.get("expires_at") == 0:
-            # Verify no NULLs remain before rebuilding
-            null_count = conn.execute(
-                "SELECT COUNT(*) FROM sessions WHERE expires_at IS NULL"
-            ).fetchone()[0]
-            if null_count == 0:
-                conn.execute(
-                    """
-                    CREATE TABLE sessions_new(
-                        token TEXT PRIMARY KEY,
-                        user_id INTEGER NOT NULL REFERENCES users(id),
-                        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
-                        expires_at TEXT NOT NULL
-                    );
-                    """
-                )
-                conn.execute(
-                    "INSERT INTO sessions_new SELECT * FROM sessions;"
-                )
-                conn.execute("DROP TABLE sessions;")
-                conn.execute("ALTER TABLE sessions_new RENAME TO sessions;")
-                # Recreate index after table rebuild
-                conn.execute(
-                    "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);"
-                )
+            """
+            CREATE TABLE IF NOT EXISTS schema_version(
+                version    INTEGER PRIMARY KEY,
+                applied_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now'))
+            );
+            """
+        )
+
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with _conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Re-check under the write lock: another worker may have won the race.
+            if _current_schema_version(conn) >= version:
+                continue
+            step(conn)
+            conn.execute("INSERT INTO schema_version(version) VALUES (?)", (version,))
+        invalidate_schema()
+    refresh_schema()
 
 
 def add_log(
@@ -295,106 +587,252 @@ def add_log(
         ).fetchone()
         return dict(row)
 
-def get_logs(focus: Optional[str] = None) -> List[Dict]:
+def add_logs_bulk(
+    rows: List[Tuple[str, int, float, int, Optional[str]]],
+) -> List[int]:
+    """
+    Insert many (name, reps, weight_kg, rir, focus) rows in one transaction.
+    Returns the new ids in input order.
+    """
+    if not rows:
+        return []
     with _conn() as conn:
-        if focus:
-            cur = conn.execute(
-                """
-                SELECT id, name, reps, weight_kg, rir, focus, timestamp
+        # IMMEDIATE holds the write lock, so AUTOINCREMENT hands out our ids
+        # contiguously after the current high-water mark.
+        conn.execute("BEGIN IMMEDIATE")
+        start = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO logs(name, reps, weight_kg, rir, focus) VALUES (?,?,?,?,?)",
+            rows,
+        )
+        return [
+            r[0]
+            for r in conn.execute("SELECT id FROM logs WHERE id > ? ORDER BY id", (start,))
+        ]
+
+
+LOG_COLUMNS = ("id", "name", "reps", "weight_kg", "rir", "focus", "timestamp")
+
+
+def _log_filters(
+    focus: Optional[str] = None,
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Tuple[List[str], List[Any]]:
+    """
+    WHERE terms for the log listings. `since`/`until` are compared against the
+    stored "YYYY-MM-DD HH:MM:SS" UTC timestamps (since inclusive, until
+    exclusive), so name + time range is a range scan on idx_logs_name_time,
+    name alone pages on idx_logs_name_id and focus uses idx_logs_focus_id.
+    """
+    terms: List[str] = []
+    params: List[Any] = []
+    if focus:
+        terms.append("focus = ?")
+        params.append(focus)
+    if name:
+        terms.append("name = ?")
+        params.append(name)
+    if since:
+        terms.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        terms.append("timestamp < ?")
+        params.append(until)
+    return terms, params
+
+
+def get_logs(
+    focus: Optional[str] = None,
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> List[Dict]:
+    """Every matching log, newest first (the unpaged GET /logs/ shape)."""
+    terms, params = _log_filters(focus, name, since, until)
+    where = f"WHERE {' AND '.join(terms)}" if terms else ""
+    with _conn() as conn:
+        cur = conn.execute(
+            f"""
+            SELECT {", ".join(LOG_COLUMNS)}
+            FROM logs
+            {where}
+            ORDER BY id DESC
+            """,
+            params,
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+
+def list_logs_page(
+    limit: int = 100,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    focus: Optional[str] = None,
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Tuple[List[Dict], bool]:
+    """Keyset page of logs, newest first: (rows, has_more)."""
+    terms, params = _log_filters(focus, name, since, until)
+    if after_id is not None:
+        terms.append("id > ?")
+        params.append(after_id)
+        order = "ASC"
+    else:
+        if before_id is not None:
+            terms.append("id < ?")
+            params.append(before_id)
+        order = "DESC"
+    where = f"WHERE {' AND '.join(terms)}" if terms else ""
+    with _conn() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {", ".join(LOG_COLUMNS)}
+            FROM logs
+            {where}
+            ORDER BY id {order}
+            LIMIT ?
+            """,
+            (*params, limit + 1),
+        ).fetchall()
+
+    items = [dict(r) for r in rows]
+    has_more = len(items) > limit
+    items = items[:limit]
+    if order == "ASC":
+        items.reverse()
+    return items, has_more
+
+
+def iter_logs(
+    focus: Optional[str] = None,
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    chunk_size: int = 500,
+) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yield matching log rows (as LOG_COLUMNS tuples), newest first.
+
+    Rows are fetched in keyset chunks of `chunk_size`, each on its own short
+    lease, so memory stays flat and no connection is held between chunks —
+    streaming responses may resume the generator on a different thread.
+    """
+    terms, params = _log_filters(focus, name, since, until)
+    before_id: Optional[int] = None
+    while True:
+        page_terms = terms + (["id < ?"] if before_id is not None else [])
+        page_params = params + ([before_id] if before_id is not None else [])
+        where = f"WHERE {' AND '.join(page_terms)}" if page_terms else ""
+        with _conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {", ".join(LOG_COLUMNS)}
                 FROM logs
-                WHERE focus = ?
+                {where}
                 ORDER BY id DESC
+                LIMIT ?
                 """,
-                (focus,),
-            )
-        else:
-            cur = conn.execute(
-                """
-                SELECT id, name, reps, weight_kg, rir, focus, timestamp
-                FROM logs
-                ORDER BY id DESC
-                """
-            )
-        return [dict(r) for r in cur.fetchall()]
+                (*page_params, chunk_size),
+            ).fetchall()
+        for r in rows:
+            yield tuple(r)
+        if len(rows) < chunk_size:
+            return
+        before_id = rows[-1]["id"]
+
 
-def get_recent_sets_map(days: int = 14) -> Dict[str, List[Dict]]:
+def _set_dict(r: sqlite3.Row) -> Dict[str, Any]:
+    return {"reps": r["reps"], "weight_kg": r["weight_kg"], "rir": r["rir"], "timestamp": r["timestamp"]}
+
+
+def get_recent_sets_map(days: int = 14, limit_per_exercise: Optional[int] = None) -> Dict[str, List[Dict]]:
     """
     Returns: { exercise_name: [ {reps, weight_kg, rir, timestamp}, ... ] }
-    Only entries within last `days`.
+    Only entries within last `days`, newest first; `limit_per_exercise` caps
+    each list in SQL.
     """
     since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
     out: Dict[str, List[Dict]] = {}
     with _conn() as conn:
-        cur = conn.execute(
-            """
-            SELECT name, reps, weight_kg, rir, timestamp
-            FROM logs
-            WHERE timestamp >= ?
-            ORDER BY timestamp DESC
-            """,
-            (since,),
-        )
-        for r in cur.fetchall():
-            d = dict(r)
-            out.setdefault(d["name"], []).append(
-                {
-                    "reps": d["reps"],
-                    "weight_kg": d["weight_kg"],
-                    "rir": d["rir"],
-                    "timestamp": d["timestamp"],
-                }
+        if limit_per_exercise is None:
+            cur = conn.execute(
+                """
+                SELECT name, reps, weight_kg, rir, timestamp
+                FROM logs
+                WHERE timestamp >= ?
+                ORDER BY timestamp DESC, id DESC
+                """,
+                (since,),
             )
+        else:
+            cur = conn.execute(
+                """
+                SELECT name, reps, weight_kg, rir, timestamp
+                FROM (
+                    SELECT id, name, reps, weight_kg, rir, timestamp,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY name ORDER BY timestamp DESC, id DESC
+                           ) AS rn
+                    FROM logs
+                    WHERE timestamp >= ?
+                )
+                WHERE rn <= ?
+                ORDER BY timestamp DESC, id DESC
+                """,
+                (since, limit_per_exercise),
+            )
+        for r in cur:
+            out.setdefault(r["name"], []).append(_set_dict(r))
     return out
 
 def get_latest_by_exercise(limit_per_exercise: int = 3) -> Dict[str, List[Dict]]:
     """
     Top-N latest sets for each exercise (useful if you don't want a date window).
+
+    Up to EXERCISE_LATEST_DEPTH this reads the trigger-maintained
+    exercise_latest summary, so the cost tracks the number of exercises rather
+    than the size of the log history.
     """
+    source = "exercise_latest" if limit_per_exercise <= EXERCISE_LATEST_DEPTH else "logs"
+    id_col = "log_id" if source == "exercise_latest" else "id"
+    tmp: Dict[str, List[Dict]] = {}
     with _conn() as conn:
-        # SQLite doesn't have DISTINCT ON; emulate via window function in newer versions
-        # fallback: simple group in Python
         cur = conn.execute(
-            """
+            f"""
             SELECT name, reps, weight_kg, rir, timestamp
-            FROM logs
-            ORDER BY name ASC, timestamp DESC
-            """
+            FROM (
+                SELECT name, reps, weight_kg, rir, timestamp,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY name ORDER BY timestamp DESC, {id_col} DESC
+                       ) AS rn
+                FROM {source}
+            )
+            WHERE rn <= ?
+            ORDER BY name ASC, rn ASC
+            """,
+            (limit_per_exercise,),
         )
-        tmp: Dict[str, List[Dict]] = {}
-        for r in cur.fetchall():
-            d = dict(r)
-            bucket = tmp.setdefault(d["name"], [])
-            if len(bucket) < limit_per_exercise:
-                bucket.append(
-                    {
-                        "reps": d["reps"],
-                        "weight_kg": d["weight_kg"],
-                        "rir": d["rir"],
-                        "timestamp": d["timestamp"],
-                    }
-                )
-        return tmp
-    
+        for r in cur:
+            tmp.setdefault(r["name"], []).append(_set_dict(r))
+    return tmp
+
+
 def add_plan(
     title: str,
     input_json: str,
     output_json: str,
     owner_id: Optional[int] = None,
 ) -> Dict:
+    has_owner = _plans_have_owner()
+    sql = _PLAN_SQL[has_owner]
+    params = (title, input_json, output_json)
+    if has_owner:
+        params += (owner_id,)
     with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(plans);")]
-        if "owner_id" in cols:
-            cur = conn.execute(
-                "INSERT INTO plans(title, input_json, output_json, owner_id) VALUES (?,?,?,?)",
-                (title, input_json, output_json, owner_id),
-            )
-            select_cols = "id, created_at, title, input_json, output_json, owner_id"
-        else:
-            cur = conn.execute(
-                "INSERT INTO plans(title, input_json, output_json) VALUES (?,?,?)",
-                (title, input_json, output_json),
-            )
-            select_cols = "id, created_at, title, input_json, output_json"
+        cur = conn.execute(sql["insert"], params)
         plan_id = cur.lastrowid
 
         # Insert v1 version in the same transaction — both commit together or neither does.
@@ -403,10 +841,7 @@ def add_plan(
             (plan_id, 1, input_json, output_json),
         )
 
-        row = conn.execute(
-            f"SELECT {select_cols} FROM plans WHERE id = ?",
-            (plan_id,),
-        ).fetchone()
+        row = conn.execute(sql["select_by_id"], (plan_id,)).fetchone()
         return dict(row)
 
 
@@ -424,51 +859,71 @@ def list_plans(
     offset: int = 0,
     owner_id: Optional[int] = None,
 ) -> List[Dict]:
+    has_owner = _plans_have_owner()
+    sql = _PLAN_SQL[has_owner]
+    if owner_id is not None:
+        if not has_owner:
+            return []
+        stmt, params = sql["list_owned"], (owner_id, limit, offset)
+    else:
+        stmt, params = sql["list_all"], (limit, offset)
     with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(plans);")]
-        has_owner = "owner_id" in cols
-        if owner_id is not None:
-            if not has_owner:
-                return []
-            cur = conn.execute(
-                """
-                SELECT id, created_at, title, owner_id
-                FROM plans
-                WHERE owner_id = ?
-                ORDER BY id DESC
-                LIMIT ? OFFSET ?
-                """,
-                (owner_id, limit, offset),
-            )
-        else:
-            select_cols = "id, created_at, title"
-            if has_owner:
-                select_cols += ", owner_id"
-            cur = conn.execute(
-                f"""
-                SELECT {select_cols}
-                FROM plans
-                ORDER BY id DESC
-                LIMIT ? OFFSET ?
-                """,
-                (limit, offset),
-            )
+        cur = conn.execute(stmt, params)
         return [dict(r) for r in cur.fetchall()]
 
-def get_plan(plan_id: int) -> Optional[Dict]:
+def _keyset_clause(before_id: Optional[int], after_id: Optional[int]) -> Tuple[str, Tuple[int, ...], str]:
+    """(extra join/where condition, params, ORDER direction) for an id keyset."""
+    if after_id is not None:
+        return " AND p.id > ?", (after_id,), "ASC"
+    if before_id is not None:
+        return " AND p.id < ?", (before_id,), "DESC"
+    return "", (), "DESC"
+
+
+def list_plans_page(
+    owner_id: int,
+    limit: int = 20,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> Tuple[List[Dict], bool, Optional[int]]:
+    """
+    Keyset page of a user's plans, newest first.
+
+    Returns (rows, has_more, active_plan_id). The user's active_plan_id comes
+    back from the same statement: plans are LEFT JOINed onto the users row, so
+    an empty page still yields one row carrying it.
+    """
+    cond, params, order = _keyset_clause(before_id, after_id)
     with _conn() as conn:
-        cols = [r["name"] for r in conn.execute("PRAGMA table_info(plans);")]
-        select_cols = "id, created_at, title, input_json, output_json"
-        if "owner_id" in cols:
-            select_cols += ", owner_id"
-        row = conn.execute(
+        rows = conn.execute(
             f"""
-            SELECT {select_cols}
-            FROM plans
-            WHERE id = ?
+            SELECT u.active_plan_id, p.id, p.created_at, p.title, p.owner_id
+            FROM users u
+            LEFT JOIN plans p ON p.owner_id = u.id{cond}
+            WHERE u.id = ?
+            ORDER BY p.id {order}
+            LIMIT ?
             """,
-            (plan_id,),
-        ).fetchone()
+            (*params, owner_id, limit + 1),
+        ).fetchall()
+
+    active_plan_id = rows[0]["active_plan_id"] if rows else None
+    items = [
+        {"id": r["id"], "created_at": r["created_at"], "title": r["title"], "owner_id": r["owner_id"]}
+        for r in rows
+        if r["id"] is not None
+    ]
+    has_more = len(items) > limit
+    items = items[:limit]
+    if order == "ASC":
+        items.reverse()
+    return items, has_more, active_plan_id
+
+
+def get_plan(plan_id: int) -> Optional[Dict]:
+    sql = _PLAN_SQL[_plans_have_owner()]
+    with _conn() as conn:
+        row = conn.execute(sql["select_by_id"], (plan_id,)).fetchone()
         return dict(row) if row else None
 
 
@@ -490,6 +945,27 @@ def add_nutrition_plan(
         return dict(row)
 
 
+def add_nutrition_plans_bulk(rows: List[Tuple[str, str, str, int]]) -> List[int]:
+    """
+    Insert many (title, input_json, output_json, owner_id) plans in one
+    transaction. Returns the new ids in input order.
+    """
+    if not rows:
+        return []
+    with _conn() as conn:
+        # Same contiguous-id reasoning as add_logs_bulk.
+        conn.execute("BEGIN IMMEDIATE")
+        start = conn.execute("SELECT COALESCE(MAX(id), 0) FROM nutrition_plans").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO nutrition_plans(title, input_json, output_json, owner_id) VALUES (?,?,?,?)",
+            rows,
+        )
+        return [
+            r[0]
+            for r in conn.execute("SELECT id FROM nutrition_plans WHERE id > ? ORDER BY id", (start,))
+        ]
+
+
 def update_nutrition_plan_title(plan_id: int, new_title: str, owner_id: int) -> bool:
     with _conn() as conn:
         cur = conn.execute(
@@ -514,6 +990,34 @@ def list_nutrition_plans(owner_id: int, limit: int = 20, offset: int = 0) -> Lis
         return [dict(r) for r in cur.fetchall()]
 
 
+def list_nutrition_plans_page(
+    owner_id: int,
+    limit: int = 20,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> Tuple[List[Dict], bool]:
+    """Keyset page of a user's nutrition plans, newest first: (rows, has_more)."""
+    cond, params, order = _keyset_clause(before_id, after_id)
+    with _conn() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT p.id, p.created_at, p.title, p.owner_id
+            FROM nutrition_plans p
+            WHERE p.owner_id = ?{cond}
+            ORDER BY p.id {order}
+            LIMIT ?
+            """,
+            (owner_id, *params, limit + 1),
+        ).fetchall()
+
+    items = [dict(r) for r in rows]
+    has_more = len(items) > limit
+    items = items[:limit]
+    if order == "ASC":
+        items.reverse()
+    return items, has_more
+
+
 def get_nutrition_plan(plan_id: int) -> Optional[Dict]:
     with _conn() as conn:
         row = conn.execute(
@@ -523,22 +1027,131 @@ def get_nutrition_plan(plan_id: int) -> Optional[Dict]:
         return dict(row) if row else None
 
 
+# ---------------------------------------------------------------------------
+# Plan versions (keyframe + delta storage)
+# ---------------------------------------------------------------------------
+
+# (db path, plan_id, version) -> (input, output), already reconstructed.
+# Values are never handed out directly; readers get deep copies.
+_PLAN_VERSION_CACHE = LRUCache(maxsize=PLAN_VERSION_CACHE_SIZE)
+
+
+def plan_version_cache_stats() -> Dict[str, Any]:
+    return _PLAN_VERSION_CACHE.stats()
+
+
+def _version_key(plan_id: int, version: int) -> Tuple[str, int, int]:
+    return (str(DB_PATH), plan_id, version)
+
+
+def _is_keyframe(version: int, interval: Optional[int] = None) -> bool:
+    interval = max(1, interval or PLAN_VERSION_KEYFRAME_INTERVAL)
+    return (version - 1) % interval == 0
+
+
+def _json_roundtrip(obj: Any) -> Any:
+    return json.loads(json.dumps(obj))
+
+
+def _reconstruct_version(
+    conn: sqlite3.Connection, plan_id: int, version: int
+) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Materialise (input, output) for one version. Walks forward from the
+    nearest keyframe, or applies a single patch when the previous version is
+    cached. The returned objects are the cached ones — do not mutate.
+    """
+    key = _version_key(plan_id, version)
+    hit = _PLAN_VERSION_CACHE.get(key)
+    if hit is not None:
+        return hit
+
+    prev = _PLAN_VERSION_CACHE.get(_version_key(plan_id, version - 1))
+    if prev is not None:
+        row = conn.execute(
+            """
+            SELECT version, storage, input_json, output_json
+            FROM plan_versions
+            WHERE plan_id = ? AND version = ?
+            """,
+            (plan_id, version),
+        ).fetchone()
+        if not row:
+            return None
+        rows = [row]
+    else:
+        rows = conn.execute(
+            """
+            SELECT version, storage, input_json, output_json
+            FROM plan_versions
+            WHERE plan_id = ?
+              AND version <= ?
+              AND version >= COALESCE(
+                  (SELECT MAX(version) FROM plan_versions
+                   WHERE plan_id = ? AND version <= ? AND storage = 'full'),
+                  0)
+            ORDER BY version
+            """,
+            (plan_id, version, plan_id, version),
+        ).fetchall()
+        if not rows or rows[-1]["version"] != version:
+            return None
+
+    state = prev
+    for row in rows:
+        if row["storage"] == "delta":
+            if state is None:
+                raise ValueError(f"plan {plan_id} v{row['version']}: delta without a base version")
+            state = (
+                apply_patch(copy.deepcopy(state[0]), json.loads(row["input_json"])),
+                apply_patch(copy.deepcopy(state[1]), json.loads(row["output_json"])),
+            )
+        else:
+            state = (json.loads(row["input_json"]), json.loads(row["output_json"]))
+    _PLAN_VERSION_CACHE.put(key, state)
+    return state
+
+
+def _version_row_to_dict(row: sqlite3.Row, state: Tuple[Dict[str, Any], Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "plan_id": row["plan_id"],
+        "version": row["version"],
+        "created_at": row["created_at"],
+        "input": copy.deepcopy(state[0]),
+        "output": copy.deepcopy(state[1]),
+        "diff": json.loads(row["diff_json"]) if row["diff_json"] else None,
+    }
+
+
 def create_plan_version(plan_id: int, version: int, input_obj: Dict[str, Any], output_obj: Dict[str, Any],  diff: Optional[Dict[str, Any]] = None,) -> None:
+    input_obj = _json_roundtrip(input_obj)
+    output_obj = _json_roundtrip(output_obj)
     with _conn() as conn:
+        prev = None
+        if not _is_keyframe(version):
+            prev = _reconstruct_version(conn, plan_id, version - 1)
+        if prev is None:
+            storage = "full"
+            input_json, output_json = json.dumps(input_obj), json.dumps(output_obj)
+        else:
+            storage = "delta"
+            input_json = json.dumps(make_patch(prev[0], input_obj))
+            output_json = json.dumps(make_patch(prev[1], output_obj))
         conn.execute(
             """
-            INSERT INTO plan_versions (plan_id, version, input_json, output_json, diff_json)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT INTO plan_versions (plan_id, version, input_json, output_json, diff_json, storage)
+            VALUES (?, ?, ?, ?, ?, ?)
             """,
-            (plan_id, version, json.dumps(input_obj), json.dumps(output_obj), json.dumps(diff) if diff is not None else None),
+            (plan_id, version, input_json, output_json, json.dumps(diff) if diff is not None else None, storage),
         )
         conn.commit()
+    _PLAN_VERSION_CACHE.put(_version_key(plan_id, version), (input_obj, output_obj))
 
 def get_latest_plan_version(plan_id: int) -> Optional[Dict[str, Any]]:
     with _conn() as conn:
         row = conn.execute(
             """
-            SELECT plan_id, version, input_json, output_json, diff_json, created_at
+            SELECT plan_id, version, diff_json, created_at
             FROM plan_versions
             WHERE plan_id = ?
             ORDER BY version DESC
@@ -549,42 +1162,142 @@ def get_latest_plan_version(plan_id: int) -> Optional[Dict[str, Any]]:
         if not row:
             return None
 
-        d = dict(row)
-        d["input"] = json.loads(d.pop("input_json"))
-        d["output"] = json.loads(d.pop("output_json"))
-        d["diff"] = json.loads(d["diff_json"]) if d.get("diff_json") else None
-        d.pop("diff_json", None)
-        return d
+        state = _reconstruct_version(conn, plan_id, row["version"])
+        return _version_row_to_dict(row, state)
 
 
-def list_plan_versions(plan_id: int) -> List[Dict[str, Any]]:
+def list_plan_versions(
+    plan_id: int,
+    limit: Optional[int] = None,
+    before_version: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Versions newest-first with full input/output. With `limit` and/or
+    `before_version` only that keyset page is materialised.
+    """
+    if limit is not None or before_version is not None:
+        return _list_plan_versions_page(plan_id, limit, before_version)
+
     with _conn() as conn:
         cur = conn.execute(
             """
-            SELECT plan_id, version, input_json, output_json, diff_json, created_at
+            SELECT plan_id, version, storage, input_json, output_json, diff_json, created_at
             FROM plan_versions
             WHERE plan_id = ?
-            ORDER BY version DESC
+            ORDER BY version ASC
             """,
             (plan_id,),
         )
 
         out = []
+        state = None
         for row in cur.fetchall():
-            d = dict(row)
-            d["input"] = json.loads(d.pop("input_json"))
-            d["output"] = json.loads(d.pop("output_json"))
-            d["diff"] = json.loads(d["diff_json"]) if d.get("diff_json") else None
-            d.pop("diff_json", None)
-            out.append(d)
+            key = _version_key(plan_id, row["version"])
+            cached = _PLAN_VERSION_CACHE.get(key)
+            if cached is not None:
+                state = cached
+            elif row["storage"] == "delta":
+                state = (
+                    apply_patch(copy.deepcopy(state[0]), json.loads(row["input_json"])),
+                    apply_patch(copy.deepcopy(state[1]), json.loads(row["output_json"])),
+                )
+                _PLAN_VERSION_CACHE.put(key, state)
+            else:
+                state = (json.loads(row["input_json"]), json.loads(row["output_json"]))
+                _PLAN_VERSION_CACHE.put(key, state)
+            out.append(_version_row_to_dict(row, state))
 
+        out.reverse()
         return out
 
+
+def _version_page_filter(
+    plan_id: int, limit: Optional[int], before_version: Optional[int]
+) -> Tuple[str, Tuple[Any, ...]]:
+    # Keyset page over idx_plan_versions_plan_version; LIMIT -1 means no limit.
+    if before_version is None:
+        return "plan_id = ?", (plan_id, limit if limit is not None else -1)
+    return "plan_id = ? AND version < ?", (plan_id, before_version, limit if limit is not None else -1)
+
+
+def _list_plan_versions_page(
+    plan_id: int, limit: Optional[int], before_version: Optional[int]
+) -> List[Dict[str, Any]]:
+    where, params = _version_page_filter(plan_id, limit, before_version)
+    with _conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT plan_id, version, diff_json, created_at
+            FROM plan_versions
+            WHERE {where}
+            ORDER BY version DESC
+            LIMIT ?
+            """.format(where=where),
+            params,
+        ).fetchall()
+        # Materialise oldest-first so each delta finds its predecessor cached.
+        states = {
+            row["version"]: _reconstruct_version(conn, plan_id, row["version"])
+            for row in reversed(rows)
+        }
+        return [_version_row_to_dict(row, states[row["version"]]) for row in rows]
+
+
+def list_plan_version_summaries(
+    plan_id: int,
+    limit: Optional[int] = None,
+    before_version: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Lightweight newest-first listing for history sidebars: version,
+    created_at, restore metadata and diff counts. Never touches input/output;
+    SQL pulls out only the fields the summary needs, and restore metadata is
+    read from them by extract_restore_meta like every other listing.
+    """
+    where, params = _version_page_filter(plan_id, limit, before_version)
+    with _conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT version,
+                   created_at,
+                   json_type(diff_json, '$.restored_from') IS NOT NULL      AS has_restored_from,
+                   json_extract(diff_json, '$.restored_from')               AS restored_from,
+                   json_array_length(diff_json, '$.replaced_exercises')     AS replaced,
+                   json_array_length(diff_json, '$.removed_exercises')      AS removed,
+                   json_array_length(diff_json, '$.added_exercises')        AS added
+            FROM plan_versions
+            WHERE {where}
+            ORDER BY version DESC
+            LIMIT ?
+            """.format(where=where),
+            params,
+        ).fetchall()
+
+    out = []
+    for row in rows:
+        restore = {"restored_from": row["restored_from"]} if row["has_restored_from"] else None
+        is_restored, restored_from = extract_restore_meta(restore)
+        out.append(
+            {
+                "plan_id": plan_id,
+                "version": row["version"],
+                "created_at": row["created_at"],
+                "is_restored": is_restored,
+                "restored_from": restored_from,
+                "diff_summary": {
+                    "replaced": row["replaced"] or 0,
+                    "removed": row["removed"] or 0,
+                    "added": row["added"] or 0,
+                },
+            }
+        )
+    return out
+
 def get_plan_version(plan_id: int, version: int) -> Optional[Dict[str, Any]]:
     with _conn() as conn:
         row = conn.execute(
             """
-            SELECT plan_id, version, input_json, output_json, diff_json, created_at
+            SELECT plan_id, version, diff_json, created_at
             FROM plan_versions
             WHERE plan_id = ? AND version = ?
             LIMIT 1
@@ -595,12 +1308,63 @@ def get_plan_version(plan_id: int, version: int) -> Optional[Dict[str, Any]]:
         if not row:
             return None
 
-        d = dict(row)
-        d["input"] = json.loads(d.pop("input_json"))
-        d["output"] = json.loads(d.pop("output_json"))
-        d["diff"] = json.loads(d["diff_json"]) if d.get("diff_json") else None
-        d.pop("diff_json", None)
-        return d
+        state = _reconstruct_version(conn, plan_id, version)
+        return _version_row_to_dict(row, state)
+
+
+def compact_plan_versions(keyframe_interval: Optional[int] = None) -> Dict[str, int]:
+    """
+    Rewrite every plan's versions into keyframe + delta layout.
+
+    Safe to re-run: each plan is rewritten inside its own transaction from the
+    reconstructed history, so a partially compacted DB just continues.
+    """
+    interval = max(1, keyframe_interval or PLAN_VERSION_KEYFRAME_INTERVAL)
+    stats = {"plans": 0, "versions": 0, "full": 0, "delta": 0, "bytes_before": 0, "bytes_after": 0}
+    with _conn() as conn:
+        plan_ids = [r[0] for r in conn.execute("SELECT DISTINCT plan_id FROM plan_versions ORDER BY plan_id")]
+
+    for plan_id in plan_ids:
+        with _conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                """
+                SELECT id, version, storage, input_json, output_json
+                FROM plan_versions
+                WHERE plan_id = ?
+                ORDER BY version ASC
+                """,
+                (plan_id,),
+            ).fetchall()
+            prev = None
+            for row in rows:
+                stats["bytes_before"] += len(row["input_json"]) + len(row["output_json"])
+                if row["storage"] == "delta":
+                    state = (
+                        apply_patch(copy.deepcopy(prev[0]), json.loads(row["input_json"])),
+                        apply_patch(copy.deepcopy(prev[1]), json.loads(row["output_json"])),
+                    )
+                else:
+                    state = (json.loads(row["input_json"]), json.loads(row["output_json"]))
+
+                if prev is None or _is_keyframe(row["version"], interval):
+                    storage = "full"
+                    input_json, output_json = json.dumps(state[0]), json.dumps(state[1])
+                else:
+                    storage = "delta"
+                    input_json = json.dumps(make_patch(prev[0], state[0]))
+                    output_json = json.dumps(make_patch(prev[1], state[1]))
+                conn.execute(
+                    "UPDATE plan_versions SET storage = ?, input_json = ?, output_json = ? WHERE id = ?",
+                    (storage, input_json, output_json, row["id"]),
+                )
+                stats[storage] += 1
+                stats["versions"] += 1
+                stats["bytes_after"] += len(input_json) + len(output_json)
+                prev = state
+            stats["plans"] += 1
+    _PLAN_VERSION_CACHE.clear()
+    return stats
 
 
 def get_or_create_user(email: str) -> Dict[str, Any]:
@@ -672,7 +1436,49 @@ def create_session(user_id: int) -> str:
     return token
 
 
+# token -> (user_id, email, expires_dt) for sessions already validated against
+# the DB. Explicit invalidation only reaches this process, so the TTL bounds
+# how long another worker's logout can go unnoticed.
+_SESSION_CACHE = LRUCache(maxsize=SESSION_CACHE_SIZE, ttl_seconds=SESSION_CACHE_TTL_SECONDS)
+
+# A miss reads the DB and then caches the row. An invalidation landing in
+# between must win, so every invalidation bumps a generation and records it
+# per user; a reader skips the put if its user was invalidated after the
+# generation it read before querying. The lock makes check+put and
+# bump+evict atomic with respect to each other.
+_SESSION_INVALIDATION_LOCK = threading.Lock()
+_SESSION_GENERATION = 0
+_USER_INVALIDATED_AT: Dict[int, int] = {}
+
+
+def session_cache_stats() -> Dict[str, Any]:
+    return _SESSION_CACHE.stats()
+
+
+def _invalidate_user_sessions(user_id: int) -> None:
+    global _SESSION_GENERATION
+    with _SESSION_INVALIDATION_LOCK:
+        _SESSION_GENERATION += 1
+        _USER_INVALIDATED_AT[user_id] = _SESSION_GENERATION
+        _SESSION_CACHE.pop_where(lambda _token, entry: entry[0] == user_id)
+
+
+def _cache_session(token: str, user_id: int, email: str, expires_dt: datetime, generation: int) -> None:
+    with _SESSION_INVALIDATION_LOCK:
+        if _USER_INVALIDATED_AT.get(user_id, 0) > generation:
+            return
+        _SESSION_CACHE.put(token, (user_id, email, expires_dt))
+
+
 def get_user_by_session(token: str) -> Optional[Dict[str, Any]]:
+    cached = _SESSION_CACHE.get(token)
+    if cached is not None:
+        user_id, email, expires_dt = cached
+        if expires_dt > datetime.now(timezone.utc):
+            return {"id": user_id, "email": email}
+        _SESSION_CACHE.pop(token)
+
+    generation = _SESSION_GENERATION
     with _conn() as conn:
         row = conn.execute(
             """
@@ -688,23 +1494,30 @@ def get_user_by_session(token: str) -> Optional[Dict[str, Any]]:
 
         expires_at = row["expires_at"]
         if not expires_at:
-            # Session without expiry is invalid — delete and reject
-            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+            # Session without expiry is invalid — reject (column is NOT NULL since hardening)
             return None
 
         expires_dt = datetime.strptime(expires_at, "%Y-%m-%dT%H:%M:%SZ").replace(
             tzinfo=timezone.utc
         )
         if expires_dt <= datetime.now(timezone.utc):
-            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+            # Rejected here, deleted by purge_expired_rows() on the next sweep
             return None
 
+        _cache_session(token, row["id"], row["email"], expires_dt, generation)
         return {"id": row["id"], "email": row["email"]}
 
 
 def delete_session(token: str) -> None:
     with _conn() as conn:
-        conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        row = conn.execute(
+            "DELETE FROM sessions WHERE token = ? RETURNING user_id", (token,)
+        ).fetchone()
+    if row:
+        # also stops a concurrent miss on this token from re-caching it
+        _invalidate_user_sessions(row["user_id"])
+    else:
+        _SESSION_CACHE.pop(token)
 
 
 def create_login_code(email: str, code_hash: str) -> None:
@@ -741,17 +1554,6 @@ def verify_login_code(email: str, code_hash: str) -> bool:
         return True
 
 
-def purge_expired_login_codes() -> None:
-    with _conn() as conn:
-        conn.execute(
-            """
-            DELETE FROM login_codes
-            WHERE expires_at <= strftime('%Y-%m-%dT%H:%M:%SZ','now')
-               OR used = 1
-            """
-        )
-
-
 # ---------------------------------------------------------------------------
 # Email verification tokens
 # ---------------------------------------------------------------------------
@@ -801,17 +1603,6 @@ def consume_email_verification_token(token: str) -> Optional[int]:
         return row["user_id"]
 
 
-def purge_expired_verification_tokens() -> None:
-    with _conn() as conn:
-        conn.execute(
-            """
-            DELETE FROM email_verification_tokens
-            WHERE expires_at <= strftime('%Y-%m-%dT%H:%M:%SZ','now')
-               OR used = 1
-            """
-        )
-
-
 # ---------------------------------------------------------------------------
 # Password reset tokens
 # ---------------------------------------------------------------------------
@@ -866,22 +1657,13 @@ def update_password_hash(user_id: int, new_hash: str) -> None:
             "UPDATE users SET password_hash = ? WHERE id = ?",
             (new_hash, user_id),
         )
+    _invalidate_user_sessions(user_id)
 
 
 def delete_all_sessions_for_user(user_id: int) -> None:
     with _conn() as conn:
         conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
-
-
-def purge_expired_reset_tokens() -> None:
-    with _conn() as conn:
-        conn.execute(
-            """
-            DELETE FROM password_reset_tokens
-            WHERE expires_at <= strftime('%Y-%m-%dT%H:%M:%SZ','now')
-               OR used = 1
-            """
-        )
+    _invalidate_user_sessions(user_id)
 
 
 def set_active_plan(user_id: int, plan_id: int) -> None:
@@ -914,6 +1696,7 @@ def delete_user(user_id: int) -> None:
         conn.execute("DELETE FROM nutrition_plans WHERE owner_id = ?", (user_id,))
         conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
         conn.commit()
+        _invalidate_user_sessions(user_id)
     except Exception:
         conn.rollback()
         raise
@@ -928,3 +1711,29 @@ def get_user_active_plan(user_id: int) -> Optional[int]:
             (user_id,),
         ).fetchone()
         return row["active_plan_id"] if row else None
+
+
+# ---------------------------------------------------------------------------
+# Expiry sweep
+# ---------------------------------------------------------------------------
+
+def purge_expired_rows() -> Dict[str, int]:
+    """
+    Delete expired sessions and expired/used login codes, verification and
+    reset tokens in one transaction. Returns deleted row counts per table.
+    Run by services.maintenance.ExpirySweeper, never on a request path.
+    """
+    now_sql = "strftime('%Y-%m-%dT%H:%M:%SZ','now')"
+    statements = {
+        "sessions": f"DELETE FROM sessions WHERE expires_at <= {now_sql}",
+        "login_codes": f"DELETE FROM login_codes WHERE expires_at <= {now_sql} OR used = 1",
+        "email_verification_tokens": (
+            f"DELETE FROM email_verification_tokens WHERE expires_at <= {now_sql} OR used = 1"
+        ),
+        "password_reset_tokens": (
+            f"DELETE FROM password_reset_tokens WHERE expires_at <= {now_sql} OR used = 1"
+        ),
+    }
+    with _conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return {table: conn.execute(sql).rowcount for table, sql in statements.items()}
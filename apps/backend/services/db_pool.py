@@ -0,0 +1,195 @@
+# apps/backend/services/db_pool.py
+"""
+Thread-local SQLite connection pool.
+
+sqlite3 connections keep their default thread guard (check_same_thread=True),
+so a connection is only ever handed back to the thread that opened it. Each
+thread keeps one pooled connection and reuses it for every lease; PRAGMAs run
+once when the connection is opened. At most `size` pooled connections stay
+open at a time — threads beyond that get an overflow connection that is
+closed as soon as its lease ends.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+
+def _open_connection(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    # light concurrency safety + durability for dev
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+class PooledConnection:
+    """
+    A lease on a pooled connection.
+
+    Use as a context manager (`with pool.connection() as conn:`) to commit on
+    success / roll back on error and return the connection to the pool, or
+    call `close()` to return it explicitly. Attribute access is proxied to the
+    underlying sqlite3.Connection.
+    """
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection, overflow: bool):
+        self._pool = pool
+        self._conn = conn
+        self._overflow = overflow
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._pool._depth() == 1:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Return the connection to the pool (closes it if it was an overflow)."""
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._conn, self._overflow)
+
+
+class ConnectionPool:
+    def __init__(self, path_getter: Callable[[], Path], size: int = 16):
+        self._path_getter = path_getter
+        self.size = max(1, int(size))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # thread ident -> pooled connection owned by that thread
+        self._pooled: Dict[int, sqlite3.Connection] = {}
+        self._paths: Dict[int, Path] = {}
+        self._counters = {
+            "opened": 0,
+            "reused": 0,
+            "overflow": 0,
+            "closed": 0,
+            # dropped from the pool without closing (owner thread gone or
+            # close_all from another thread); GC finalizes them
+            "abandoned": 0,
+            "leases": 0,
+        }
+
+    # ---- leases ----
+
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def connection(self) -> PooledConnection:
+        """Lease this thread's connection (nested leases share it)."""
+        path = Path(self._path_getter())
+        tid = threading.get_ident()
+        local = self._local
+        depth = self._depth()
+
+        if depth > 0:
+            # Nested lease: share the outer lease's connection.
+            local.depth = depth + 1
+            with self._lock:
+                self._counters["leases"] += 1
+                self._counters["reused"] += 1
+            return PooledConnection(self, local.current, local.overflow)
+
+        with self._lock:
+            self._counters["leases"] += 1
+            conn = self._pooled.get(tid)
+            if conn is not None and self._paths.get(tid) != path:
+                # DB_PATH changed (tests): drop the stale connection.
+                self._pooled.pop(tid, None)
+                self._paths.pop(tid, None)
+                self._counters["closed"] += 1
+                stale, conn = conn, None
+                stale.close()
+            if conn is not None:
+                self._counters["reused"] += 1
+                local.depth, local.current, local.overflow = 1, conn, False
+                return PooledConnection(self, conn, False)
+            if len(self._pooled) >= self.size:
+                self._prune_dead_threads()
+            has_slot = len(self._pooled) < self.size
+
+        conn = _open_connection(path)
+        with self._lock:
+            self._counters["opened"] += 1
+            if has_slot:
+                self._pooled[tid] = conn
+                self._paths[tid] = path
+            else:
+                self._counters["overflow"] += 1
+        local.depth, local.current, local.overflow = 1, conn, not has_slot
+        return PooledConnection(self, conn, not has_slot)
+
+    def _release(self, conn: sqlite3.Connection, overflow: bool) -> None:
+        local = self._local
+        depth = self._depth() - 1
+        local.depth = max(depth, 0)
+        if depth > 0:
+            return
+        local.current = None
+        if conn.in_transaction:
+            # Lease ended without commit (explicit close after an error path).
+            conn.rollback()
+        if overflow:
+            conn.close()
+            with self._lock:
+                self._counters["closed"] += 1
+
+    def _prune_dead_threads(self) -> None:
+        # Caller holds self._lock. Connections of finished threads cannot be
+        # closed from here (thread guard), so drop the reference and let GC
+        # finalize them.
+        alive = {t.ident for t in threading.enumerate()}
+        for tid in [t for t in self._pooled if t not in alive]:
+            self._pooled.pop(tid, None)
+            self._paths.pop(tid, None)
+            self._counters["abandoned"] += 1
+
+    # ---- lifecycle ----
+
+    def close_thread_connection(self) -> None:
+        """Close the calling thread's pooled connection, if any."""
+        tid = threading.get_ident()
+        with self._lock:
+            conn = self._pooled.pop(tid, None)
+            self._paths.pop(tid, None)
+            if conn is not None:
+                self._counters["closed"] += 1
+        if conn is not None:
+            conn.close()
+
+    def close_all(self) -> None:
+        """
+        Forget every pooled connection.
+
+        Only the calling thread's connection can be closed here; the others
+        are counted as abandoned and left to GC.
+        """
+        self.close_thread_connection()
+        with self._lock:
+            self._counters["abandoned"] += len(self._pooled)
+            self._pooled.clear()
+            self._paths.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": len(self._pooled),
+                **self._counters,
+            }
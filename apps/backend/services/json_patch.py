@@ -0,0 +1,102 @@
+"""
+Minimal RFC 6902 JSON Patch (add / remove / replace) for JSON-shaped values.
+
+make_patch() is deterministic: dict keys are walked in sorted order and lists
+are diffed index-by-index with a trailing add/remove run, which keeps
+append-only fields like chat_history to a single "add" per new entry.
+
+Applying a patch reproduces dict key order too (so a rebuilt document
+serializes exactly like the original): when adds, which append, would
+leave a dict's keys in a different order, the whole dict is replaced.
+"""
+from typing import Any, Dict, List
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(src: Any, dst: Any) -> List[Dict[str, Any]]:
+    ops: List[Dict[str, Any]] = []
+    _diff(src, dst, "", ops)
+    return ops
+
+
+def _same(src: Any, dst: Any) -> bool:
+    """Equal, including dict key order."""
+    if type(src) is not type(dst):
+        return False
+    if isinstance(src, dict):
+        return list(src) == list(dst) and all(_same(v, dst[k]) for k, v in src.items())
+    if isinstance(src, list):
+        return len(src) == len(dst) and all(_same(a, b) for a, b in zip(src, dst))
+    return src == dst
+
+
+def _diff(src: Any, dst: Any, path: str, ops: List[Dict[str, Any]]) -> None:
+    if _same(src, dst):
+        return
+    if isinstance(src, dict) and isinstance(dst, dict):
+        patched_order = [k for k in src if k in dst] + sorted(k for k in dst if k not in src)
+        if patched_order != list(dst):
+            ops.append({"op": "replace", "path": path, "value": dst})
+            return
+        for key in sorted(src.keys() - dst.keys()):
+            ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key in sorted(dst.keys()):
+            child = f"{path}/{_escape(key)}"
+            if key not in src:
+                ops.append({"op": "add", "path": child, "value": dst[key]})
+            else:
+                _diff(src[key], dst[key], child, ops)
+        return
+    if isinstance(src, list) and isinstance(dst, list):
+        common = min(len(src), len(dst))
+        for i in range(common):
+            _diff(src[i], dst[i], f"{path}/{i}", ops)
+        # remove from the end so earlier indices stay valid
+        for i in range(len(src) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        for i in range(common, len(dst)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": dst[i]})
+        return
+    ops.append({"op": "replace", "path": path, "value": dst})
+
+
+def apply_patch(doc: Any, patch: List[Dict[str, Any]]) -> Any:
+    """Apply `patch` to `doc` in place and return the (possibly new) root."""
+    for op in patch:
+        path = op["path"]
+        if path == "":
+            if op["op"] == "remove":
+                raise ValueError("Cannot remove the document root")
+            doc = op["value"]
+            continue
+        tokens = [_unescape(t) for t in path.split("/")[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        kind = op["op"]
+        if isinstance(parent, list):
+            idx = len(parent) if last == "-" else int(last)
+            if kind == "add":
+                parent.insert(idx, op["value"])
+            elif kind == "remove":
+                del parent[idx]
+            elif kind == "replace":
+                parent[idx] = op["value"]
+            else:
+                raise ValueError(f"Unsupported patch op: {kind}")
+        else:
+            if kind in ("add", "replace"):
+                parent[last] = op["value"]
+            elif kind == "remove":
+                del parent[last]
+            else:
+                raise ValueError(f"Unsupported patch op: {kind}")
+    return doc
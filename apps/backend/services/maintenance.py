@@ -0,0 +1,96 @@
+# apps/backend/services/maintenance.py
+"""
+Background maintenance tasks started from the FastAPI lifespan.
+
+ExpirySweeper periodically purges expired sessions, login codes and
+verification/reset tokens so auth request paths never pay for cleanup.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from services import db
+
+EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEP_INTERVAL_SECONDS", "300"))
+
+
+class ExpirySweeper:
+    def __init__(
+        self,
+        interval_seconds: float = EXPIRY_SWEEP_INTERVAL_SECONDS,
+        purge: Optional[Callable[[], Dict[str, int]]] = None,
+    ):
+        self.interval_seconds = interval_seconds
+        self._purge = purge or db.purge_expired_rows
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_counts: Dict[str, int] = {}
+        self.last_error: Optional[str] = None
+        self.total_deleted: Dict[str, int] = {}
+
+    def run_once(self) -> Dict[str, int]:
+        """Run one sweep synchronously and record its stats."""
+        started = time.perf_counter()
+        try:
+            counts = self._purge()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            raise
+        finally:
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.last_run_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+        self.runs += 1
+        self.last_counts = dict(counts)
+        self.last_error = None
+        for table, n in counts.items():
+            self.total_deleted[table] = self.total_deleted.get(table, 0) + n
+        return counts
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                # sqlite work stays off the event loop
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                pass  # recorded in stats; try again next interval
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.interval_seconds > 0,
+            "interval_seconds": self.interval_seconds,
+            "running": self._task is not None,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": self.last_duration_ms,
+            "last_counts": dict(self.last_counts),
+            "last_error": self.last_error,
+            "total_deleted": dict(self.total_deleted),
+        }
+
+
+expiry_sweeper = ExpirySweeper()
@@ -2,8 +2,17 @@
 from __future__ import annotations
 
 import re
-from typing import Iterable
-from services.nutrition.contracts import Meal
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, Mapping
+try:
+    from services.nutrition.contracts import Meal
+    from services.nutrition.meal_library import MEAL_LIBRARY
+except ImportError:
+    # Standalone (stub_meals.py run from this directory)
+    from contracts import Meal
+    from meal_library import MEAL_LIBRARY
 
 _PUNCT_RE = re.compile(r"[^a-z0-9\s]+")
 _WS_RE = re.compile(r"\s+")
@@ -124,47 +133,129 @@ def build_allergen_set(user_terms: list[str]) -> set[str]:
     return out
 
 
-def _contains_list_is_valid(contains: object) -> bool:
-    if not isinstance(contains, list) or len(contains) == 0:
-        return False
-    for x in contains:
-        if not isinstance(x, str):
-            return False
-        if not normalize_term(x):
-            return False
-    return True
+# ---------------------------------------------------------------------------
+# Token bitmasks
+# ---------------------------------------------------------------------------
+# Every allergen / diet token the meal library and alias map know about gets
+# one bit, assigned once at import, so "do these token sets overlap?" becomes
+# one integer AND. Anything else (free-text user allergies, odd LLM tokens)
+# maps to OVERFLOW_BIT without being registered, and an overlap on that bit
+# alone is settled with a set check. The table never grows at runtime.
+
+OVERFLOW_BIT = 1
+MAX_TOKEN_BITS = 512
+
+
+def _library_tokens() -> set[str]:
+    tokens: set[str] = set()
+    for meal in MEAL_LIBRARY:
+        for ing in meal.get("ingredients") or []:
+            for t in (ing.get("contains") or []) + (ing.get("diet_tags") or []):
+                # stub_meals keys on lowercased raw tokens, allergens.py on normalized ones
+                tokens.add(str(t).lower())
+                tokens.add(normalize_term(str(t)))
+    for aliases in _ALIAS_MAP.values():
+        for t in aliases:
+            tokens.add(t)
+            tokens.add(normalize_term(t))
+    tokens.discard("")
+    return tokens
+
 
+_TOKEN_BITS: Mapping[str, int] = MappingProxyType({
+    t: (1 << n) if n <= MAX_TOKEN_BITS else OVERFLOW_BIT
+    for n, t in enumerate(sorted(_library_tokens()), start=1)
+})
 
-def _diet_tags_list_is_valid(diet_tags: object) -> bool:
-    if not isinstance(diet_tags, list) or len(diet_tags) == 0:
+
+def token_bit(token: str) -> int:
+    return _TOKEN_BITS.get(token, OVERFLOW_BIT)
+
+
+def token_mask(tokens: Iterable[str]) -> int:
+    mask = 0
+    for t in tokens:
+        mask |= token_bit(t)
+    return mask
+
+
+def masks_overlap(mask_a: int, tokens_a: Iterable[str], mask_b: int, tokens_b: Iterable[str]) -> bool:
+    """Exact set-overlap test for two token sets given their masks."""
+    both = mask_a & mask_b
+    if not both:
         return False
-    for x in diet_tags:
+    if both != OVERFLOW_BIT:
+        return True
+    return not set(tokens_a).isdisjoint(tokens_b)
+
+
+def allergen_mask(allergen_set: Iterable[str]) -> int:
+    """Compile a build_allergen_set() result to a mask."""
+    return token_mask(allergen_set)
+
+
+@dataclass(frozen=True)
+class _TokenList:
+    tokens: frozenset[str]  # normalized
+    mask: int
+    valid: bool  # non-empty and every entry normalizes to a token
+
+
+@lru_cache(maxsize=8192)
+def _token_list(raw: tuple[str, ...]) -> _TokenList:
+    normalized = [normalize_term(x) for x in raw]
+    tokens = frozenset(normalized)
+    return _TokenList(tokens=tokens, mask=token_mask(tokens), valid=bool(raw) and all(normalized))
+
+
+def _token_list_of(value: object) -> _TokenList | None:
+    """Cached normalization of a contains / diet_tags list (None if not a list of str)."""
+    if not isinstance(value, list):
+        return None
+    for x in value:
         if not isinstance(x, str):
-            return False
-        if not normalize_term(x):
-            return False
-    return True
+            return None
+    return _token_list(tuple(value))
 
 
-def meal_is_safe(meal: Meal, allergen_set: set[str], required_diet_tags: set[str] | None = None) -> bool:
+def meal_is_safe(
+    meal: Meal,
+    allergen_set: set[str],
+    required_diet_tags: set[str] | None = None,
+    blocked_mask: int | None = None,
+) -> bool:
     """
     FAIL-CLOSED enforcement for BOTH:
       - allergens (must-not-contain)
       - diet tags (must-satisfy)
     """
-    return meal_rejection_reason(meal, allergen_set, required_diet_tags=required_diet_tags) is None
+    return meal_rejection_reason(
+        meal, allergen_set, required_diet_tags=required_diet_tags, blocked_mask=blocked_mask
+    ) is None
 
 
 def meal_rejection_reason(
     meal: Meal,
     allergen_set: set[str],
     required_diet_tags: set[str] | None = None,
+    blocked_mask: int | None = None,
 ) -> str | None:
     """
     Returns a deterministic reason string if meal is rejected; otherwise None.
     This keeps 'why rejected' centralized without changing API schema.
+
+    `blocked_mask` is allergen_mask(allergen_set); callers checking many
+    meals against one request compile it once and pass it in.
     """
     required_diet_tags = required_diet_tags or set()
+    if blocked_mask is None:
+        blocked_mask = allergen_mask(allergen_set)
+    if required_diet_tags == {"vegetarian"}:
+        # Special case: single "vegetarian" tag should accept vegan too (backward compat)
+        diet_accept = {"vegetarian", "vegan"}
+    else:
+        diet_accept = required_diet_tags
+    diet_mask = token_mask(diet_accept)
 
     if not isinstance(meal, dict):
         return "Rejected: invalid_meal_non_dict"
@@ -180,41 +271,35 @@ def meal_rejection_reason(
         if ing.get("is_compound") is True:
             return "Rejected: invalid_ingredient_compound"
 
-        contains = ing.get("contains")
-        if not _contains_list_is_valid(contains):
+        contains = _token_list_of(ing.get("contains"))
+        if contains is None or not contains.valid:
             return "Rejected: invalid_contains_list"
 
-        diet_tags = ing.get("diet_tags")
-        if not _diet_tags_list_is_valid(diet_tags):
+        diet_tags = _token_list_of(ing.get("diet_tags"))
+        if diet_tags is None or not diet_tags.valid:
             return "Rejected: invalid_diet_tags_list"
 
-        ing_tokens = {normalize_term(x) for x in contains}
+        ing_tokens = contains.tokens
         if "" in ing_tokens:
             return "Rejected: invalid_contains_empty_token"
 
         # HARD allergy rejection
-        hit = sorted(list(ing_tokens & allergen_set))
-        if hit:
+        if masks_overlap(contains.mask, ing_tokens, blocked_mask, allergen_set):
+            hit = sorted(list(ing_tokens & allergen_set))
             return f"Rejected: allergy_conflict blocked_by={hit}"
 
-        ing_diet = {normalize_term(x) for x in diet_tags}
+        ing_diet = diet_tags.tokens
         if "" in ing_diet:
             return "Rejected: invalid_diet_tags_empty_token"
 
         # Diet enforcement (fail-closed)
         # Ingredient must have AT LEAST ONE of the required diet tags
-        # Diet enforcement (fail-closed)
-        if required_diet_tags:
-            # Special case: single "vegetarian" tag should accept vegan too (backward compat)
+        if required_diet_tags and not masks_overlap(diet_tags.mask, ing_diet, diet_mask, diet_accept):
             if required_diet_tags == {"vegetarian"}:
-                if not (("vegetarian" in ing_diet) or ("vegan" in ing_diet)):
-                    return "Rejected: diet_conflict requires=vegetarian"
-            # General case: ingredient must have at least one required tag
-            else:
-                if not (ing_diet & required_diet_tags):
-                    req = sorted(list(required_diet_tags))
-                    ing = sorted(list(ing_diet))
-                    return f"Rejected: diet_conflict requires_one_of={req} ingredient_has={ing}"
+                return "Rejected: diet_conflict requires=vegetarian"
+            req = sorted(list(required_diet_tags))
+            ing = sorted(list(ing_diet))
+            return f"Rejected: diet_conflict requires_one_of={req} ingredient_has={ing}"
 
     return None
 
@@ -225,9 +310,10 @@ def enforce_allergies(meals: list[dict], allergen_set: set[str], required_diet_t
     """
     safe: list[dict] = []
     rejected: list[dict] = []
+    blocked_mask = allergen_mask(allergen_set)
 
     for meal in meals or []:
-        if meal_is_safe(meal, allergen_set, required_diet_tags=required_diet_tags):
+        if meal_is_safe(meal, allergen_set, required_diet_tags=required_diet_tags, blocked_mask=blocked_mask):
             safe.append(meal)
         else:
             rejected.append(meal)
@@ -0,0 +1,97 @@
+# apps/backend/services/nutrition/batch.py
+"""
+Fan-out runner for batch nutrition generation.
+
+Small batches run inline. Large ones go to one long-lived process pool
+shared by every request, started from the FastAPI lifespan (or on first
+use). Workers come from a forkserver/spawn context, never a fork of the
+multi-threaded server, so they don't inherit held locks or pooled SQLite
+connections; each worker builds the meal index, allergen bits and pantry
+columns once in its initializer. Jobs and results must pickle, and results
+computed in workers don't reach this process's generation cache. Results
+are yielded as each job finishes, tagged with the job's index, so callers
+can stream them.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator, Optional, Sequence, Tuple, TypeVar
+
+NUTRITION_BATCH_MAX_ITEMS = int(os.getenv("NUTRITION_BATCH_MAX_ITEMS", "100"))
+# Batches with at least this many jobs use the process pool.
+NUTRITION_BATCH_PROCESS_THRESHOLD = int(os.getenv("NUTRITION_BATCH_PROCESS_THRESHOLD", "16"))
+# Size of the shared pool; 0 means os.cpu_count().
+NUTRITION_BATCH_WORKERS = int(os.getenv("NUTRITION_BATCH_WORKERS", "0"))
+
+J = TypeVar("J")
+R = TypeVar("R")
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_size() -> int:
+    return NUTRITION_BATCH_WORKERS if NUTRITION_BATCH_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _warm_worker() -> None:
+    # Import-time work: meal index, frozen allergen bits, pantry columns.
+    import services.nutrition.stub_meals  # noqa: F401
+
+
+def start_batch_pool(workers: int = 0) -> ProcessPoolExecutor:
+    """Create the shared pool if it isn't running yet and return it."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers if workers > 0 else _pool_size(),
+                mp_context=_mp_context(),
+                initializer=_warm_worker,
+            )
+        return _POOL
+
+
+def shutdown_batch_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_batch(
+    fn: Callable[[J], R],
+    jobs: Sequence[J],
+    process_threshold: int = NUTRITION_BATCH_PROCESS_THRESHOLD,
+    pool: Optional[Executor] = None,
+) -> Iterator[Tuple[int, R]]:
+    """
+    Yield (index, fn(job)) in completion order.
+
+    `fn` must be a module-level function (it is pickled by reference) and
+    should return errors as values: an exception raised in a worker ends
+    the whole batch. Jobs not yet started are cancelled if the caller stops
+    iterating early.
+    """
+    if len(jobs) < max(process_threshold, 2) or (pool is None and _pool_size() == 1):
+        for i, job in enumerate(jobs):
+            yield i, fn(job)
+        return
+
+    pool = pool or start_batch_pool()
+    futures = {pool.submit(fn, job): i for i, job in enumerate(jobs)}
+    try:
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
+    finally:
+        for fut in futures:
+            fut.cancel()
@@ -0,0 +1,54 @@
+# apps/backend/services/nutrition/calorie_solver.py
+"""
+One-pass calorie closing.
+
+The day's adjustable ingredients (one carb base per meal) are listed in
+priority order with their kcal per gram and gram bounds. The solver walks
+that list once, giving each ingredient as much of the remaining calorie gap
+as its bounds allow (rounded to whole grams), until the gap is within
+tolerance. No macros are recomputed along the way: callers recompute only
+the meals whose grams changed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+
+@dataclass(frozen=True)
+class Adjustable:
+    meal: int          # index into the day's meals
+    ingredient: int    # index into that meal's ingredients
+    grams: float       # current grams
+    kcal_per_g: float  # calories moved per gram (same factors as meal macros)
+    max_step_g: float  # largest change allowed in one solve
+    max_g: float       # absolute upper bound (lower bound is 0)
+
+
+def solve_calorie_close(
+    adjustables: Sequence[Adjustable],
+    delta_kcal: float,
+    tolerance_kcal: float,
+) -> dict[tuple[int, int], int]:
+    """
+    Return {(meal, ingredient): new_grams} for the ingredients that change.
+
+    `delta_kcal` is target minus current total. Adjustables are used in the
+    order given; later ones only absorb what earlier ones could not.
+    """
+    out: dict[tuple[int, int], int] = {}
+    remaining = float(delta_kcal)
+    for a in adjustables:
+        if abs(remaining) <= tolerance_kcal:
+            break
+        if a.kcal_per_g <= 0:
+            continue
+        grams_now = max(0.0, float(a.grams))
+        change = remaining / a.kcal_per_g
+        change = max(-a.max_step_g, min(a.max_step_g, change))
+        grams_new = int(round(max(0.0, min(a.max_g, grams_now + change))))
+        if grams_new == int(round(grams_now)):
+            continue
+        out[(a.meal, a.ingredient)] = grams_new
+        remaining -= (grams_new - grams_now) * a.kcal_per_g
+    return out
@@ -6,7 +6,7 @@ import re
 from dataclasses import dataclass
 from typing import Callable, Optional
 
-from services.nutrition.allergens import build_allergen_set, meal_is_safe, meal_rejection_reason
+from services.nutrition.allergens import allergen_mask, build_allergen_set, meal_is_safe, meal_rejection_reason
 from services.nutrition.contracts import Meal
 
 
@@ -139,6 +139,7 @@ def generate_safe_meals(
         raise ValueError("batch_size must be > 0")
 
     allergen_set = build_allergen_set(req.allergies)
+    blocked_mask = allergen_mask(allergen_set)
     required_diet = required_diet_tags_for_user(req.diet)
 
     accepted: list[dict] = []
@@ -179,7 +180,9 @@ def generate_safe_meals(
 
         for meal in candidates:
             # Always validate safety first (allergies/diet are hard constraints)
-            reason = meal_rejection_reason(meal, allergen_set, required_diet_tags=required_diet)
+            reason = meal_rejection_reason(
+                meal, allergen_set, required_diet_tags=required_diet, blocked_mask=blocked_mask
+            )
             if reason is not None:
                 m = dict(meal) if isinstance(meal, dict) else {"raw": str(meal)}
                 m["rejection_reason"] = reason
@@ -0,0 +1,84 @@
+# apps/backend/services/nutrition/generation_cache.py
+"""
+In-process cache of stub generation results (generate_safe_meals + calorie
+boosters).
+
+Stub generation is deterministic in the request, so identical requests can
+share one result. Keys hold the canonical request (allergies normalized the
+same way _seed_string does) plus LIBRARY_VERSION, a digest of the meal
+library, pantry, aliases and boosters, so edits to any of them never serve
+stale plans. Results are deep-copied on the way in and out.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from services.lru_cache import LRUCache
+from services.nutrition.boosters import BOOSTERS
+from services.nutrition.generate import GenerationRequest, GenerationResult
+from services.nutrition.ingredients_pantry import INGREDIENT_PANTRY_PER_100G
+from services.nutrition.meal_library import MEAL_LIBRARY
+from services.nutrition.stub_meals import INGREDIENT_ALIASES, _normalize_tokens
+
+NUTRITION_GENERATION_CACHE_SIZE = int(os.getenv("NUTRITION_GENERATION_CACHE_SIZE", "256"))
+# Optional; unset means entries live until evicted.
+_TTL = os.getenv("NUTRITION_GENERATION_CACHE_TTL_SECONDS")
+NUTRITION_GENERATION_CACHE_TTL_SECONDS: Optional[float] = float(_TTL) if _TTL else None
+
+
+def _library_version() -> str:
+    blob = json.dumps(
+        [MEAL_LIBRARY, INGREDIENT_PANTRY_PER_100G, INGREDIENT_ALIASES, BOOSTERS],
+        sort_keys=True,
+        default=sorted,  # booster tag/allergen sets
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+LIBRARY_VERSION = _library_version()
+
+_CACHE = LRUCache(
+    maxsize=NUTRITION_GENERATION_CACHE_SIZE,
+    ttl_seconds=NUTRITION_GENERATION_CACHE_TTL_SECONDS,
+)
+
+
+def generation_cache_key(
+    req: GenerationRequest,
+    attempt_offset: int = 0,
+    booster_target: Optional[int] = None,
+) -> Hashable:
+    fields = asdict(req)
+    fields["allergies"] = sorted(_normalize_tokens(req.allergies))
+    return (
+        LIBRARY_VERSION,
+        json.dumps(fields, sort_keys=True),
+        int(attempt_offset),
+        booster_target,
+    )
+
+
+def cached_generation(
+    key: Hashable,
+    compute: Callable[[], GenerationResult],
+) -> GenerationResult:
+    """Return a private copy of the cached result for `key`, computing it on a miss."""
+    hit = _CACHE.get(key)
+    if hit is not None:
+        return copy.deepcopy(hit)
+    result = compute()
+    _CACHE.put(key, copy.deepcopy(result))
+    return result
+
+
+def generation_cache_stats() -> Dict[str, Any]:
+    return {"library_version": LIBRARY_VERSION, **_CACHE.stats()}
+
+
+def clear_generation_cache() -> None:
+    _CACHE.clear()
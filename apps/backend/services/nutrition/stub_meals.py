@@ -1,21 +1,40 @@
 # apps/backend/services/nutrition/stub_meals.py
 from __future__ import annotations
 
+import copy
 import hashlib
 import math
-from typing import Any, Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
 
 try:
     from .ingredients_pantry import INGREDIENT_PANTRY_PER_100G
     from .meal_library import MEAL_LIBRARY
-    from services.nutrition.allergens import build_allergen_set
+    from services.nutrition.allergens import (
+        allergen_mask,
+        build_allergen_set,
+        masks_overlap,
+        meal_rejection_reason,
+        token_mask,
+    )
+    from services.nutrition.calorie_solver import Adjustable, solve_calorie_close
+    from services.nutrition.variety import VarietyRules, schedule_variety
 except ImportError:
     # Fallback for standalone testing
     from meal_library import MEAL_LIBRARY
+    from allergens import (
+        allergen_mask,
+        build_allergen_set,
+        masks_overlap,
+        meal_rejection_reason,
+        token_mask,
+    )
+    from calorie_solver import Adjustable, solve_calorie_close
+    from variety import VarietyRules, schedule_variety
     # Create minimal mocks for testing
     INGREDIENT_PANTRY_PER_100G = {}
-    def build_allergen_set(allergies):
-        return set(str(a).lower() for a in allergies if a)
 
 
 # Ingredient name aliases: map common/shorthand names to pantry keys
@@ -84,33 +103,60 @@ def _stable_int_hash(s: str) -> int:
     return int(h[:16], 16)
 
 
+def _seeded_hash(seed: str):
+    """_stable_int_hash(seed + "::" + key) with the seed prefix hashed once."""
+    base = hashlib.sha256((seed + "::").encode("utf-8"))
+
+    def _hash(key: str) -> int:
+        h = base.copy()
+        h.update(key.encode("utf-8"))
+        return int.from_bytes(h.digest()[:8], "big")
+
+    return _hash
+
+
 def _round1(x: float) -> float:
     return float(round(x, 1))
 
 
-def _meal_macros_from_pantry(ingredients: list[dict[str, Any]], debug_meta: dict[str, Any] | None = None) -> dict[str, float]:
-    p = c = f = 0.0
-    for ing in ingredients:
-        name = ing["name"]
-        grams = float(ing.get("grams", 0.0))
+# ---------------------------------------------------------------------------
+# Compiled pantry
+# ---------------------------------------------------------------------------
+# INGREDIENT_PANTRY_PER_100G as parallel per-100g columns; PANTRY_ROW maps a
+# canonical key to its row. A meal is then (rows, grams) and its macros are a
+# single dot product per column. PANTRY_KCAL_PER_G uses the same 4/4/9
+# factors as meal macros, so it is exactly how far one gram moves
+# macros["calories"].
 
-        # Try alias first, then direct lookup
-        canonical_name = _canonical_pantry_key(name)
-        per100 = INGREDIENT_PANTRY_PER_100G.get(canonical_name)
+PANTRY_KEYS: tuple[str, ...] = tuple(k for k, v in INGREDIENT_PANTRY_PER_100G.items() if v)
+PANTRY_ROW: dict[str, int] = {k: i for i, k in enumerate(PANTRY_KEYS)}
+_PANTRY_PROTEIN = tuple(float(INGREDIENT_PANTRY_PER_100G[k].get("protein_g", 0.0)) for k in PANTRY_KEYS)
+_PANTRY_CARBS = tuple(float(INGREDIENT_PANTRY_PER_100G[k].get("carbs_g", 0.0)) for k in PANTRY_KEYS)
+_PANTRY_FAT = tuple(float(INGREDIENT_PANTRY_PER_100G[k].get("fat_g", 0.0)) for k in PANTRY_KEYS)
+PANTRY_KCAL_PER_G = tuple(
+    (p * 4 + c * 4 + f * 9) / 100.0 for p, c, f in zip(_PANTRY_PROTEIN, _PANTRY_CARBS, _PANTRY_FAT)
+)
 
-        # Track missing lookups for instrumentation
-        if not per100 and debug_meta is not None and grams > 0:
-            if "missing_ingredients" not in debug_meta:
-                debug_meta["missing_ingredients"] = []
-            if canonical_name not in debug_meta["missing_ingredients"]:
-                debug_meta["missing_ingredients"].append(canonical_name)
 
-        if not per100 or grams <= 0:
+@lru_cache(maxsize=4096)
+def _pantry_row_for_name(name: str) -> int:
+    """Pantry row for an ingredient name (aliases resolved), or -1 if unknown."""
+    return PANTRY_ROW.get(_canonical_pantry_key(name), -1)
+
+
+def _pantry_row(name: Any) -> int:
+    return _pantry_row_for_name(str(name or ""))
+
+
+def _macros_from_rows(rows: Iterable[int], grams: Iterable[float]) -> dict[str, float]:
+    p = c = f = 0.0
+    for row, g in zip(rows, grams):
+        if row < 0 or g <= 0:
             continue
-        factor = grams / 100.0
-        p += per100.get("protein_g", 0.0) * factor
-        c += per100.get("carbs_g", 0.0) * factor
-        f += per100.get("fat_g", 0.0) * factor
+        factor = g / 100.0
+        p += _PANTRY_PROTEIN[row] * factor
+        c += _PANTRY_CARBS[row] * factor
+        f += _PANTRY_FAT[row] * factor
     return {
         "calories": _round1(p * 4 + c * 4 + f * 9),
         "protein_g": _round1(p),
@@ -119,6 +165,23 @@ def _meal_macros_from_pantry(ingredients: list[dict[str, Any]], debug_meta: dict
     }
 
 
+def _meal_macros_from_pantry(ingredients: list[dict[str, Any]], debug_meta: dict[str, Any] | None = None) -> dict[str, float]:
+    rows = [_pantry_row(ing["name"]) for ing in ingredients]
+    grams = [float(ing.get("grams", 0.0)) for ing in ingredients]
+
+    # Track missing lookups for instrumentation
+    if debug_meta is not None:
+        for ing, row, g in zip(ingredients, rows, grams):
+            if row >= 0 or g <= 0:
+                continue
+            canonical_name = _canonical_pantry_key(ing["name"])
+            missing = debug_meta.setdefault("missing_ingredients", [])
+            if canonical_name not in missing:
+                missing.append(canonical_name)
+
+    return _macros_from_rows(rows, grams)
+
+
 def _sum_macros(meals: list[dict[str, Any]]) -> dict[str, float]:
     cals = p = c = f = 0.0
     for m in meals:
@@ -194,27 +257,6 @@ def _diet_required_tags(diet: Any) -> set[str]:
 
 
 
-def _meal_allowed_by_diet(meal: dict[str, Any], required: set[str]) -> bool:
-    if not required:
-        return True
-    # A meal is allowed if every ingredient has at least one acceptable diet tag
-    for ing in meal.get("ingredients", []):
-        tags = {t.lower() for t in (ing.get("diet_tags") or [])}
-        if not (tags & required):
-            return False
-    return True
-
-
-def _meal_allowed_by_allergies(meal: dict[str, Any], blocked_tokens: set[str]) -> bool:
-    if not blocked_tokens:
-        return True
-    for ing in meal.get("ingredients", []):
-        contains = {t.lower() for t in (ing.get("contains") or [])}
-        if contains & blocked_tokens:
-            return False
-    return True
-
-
 def _seed_string(req: Any, attempt: int) -> str:
     # Keep deterministic but sensitive to relevant user inputs.
     # Use getattr so we don't depend on exact schema.
@@ -229,7 +271,24 @@ def _seed_string(req: Any, attempt: int) -> str:
     return "|".join(parts)
 
 
-def _deterministic_pick(meals: list[dict[str, Any]], seed: str, k: int, goal: str = "maintenance") -> list[dict[str, Any]]:
+def _ranking_for(
+    m: dict[str, Any],
+    key: str,
+    ranking: Mapping[str, tuple[float, float]] | None,
+) -> tuple[float, float]:
+    if ranking is not None and key in ranking:
+        return ranking[key]
+    macros = m.get("_macros", {})
+    return float(m.get("_macro_score", 0.0)), float(macros.get("fat_g", 0.0))
+
+
+def _deterministic_pick(
+    meals: list[dict[str, Any]],
+    seed: str,
+    k: int,
+    goal: str = "maintenance",
+    ranking: Mapping[str, tuple[float, float]] | None = None,
+) -> list[dict[str, Any]]:
     if not meals:
         return []
 
@@ -240,7 +299,7 @@ def _deterministic_pick(meals: list[dict[str, Any]], seed: str, k: int, goal: st
         # 0 = pinned (test-compatible), 1 = normal
         bucket = 0 if key.startswith("-") else 1
 
-        macro_score = float(m.get("_macro_score", 0.0))
+        macro_score, fat_g = _ranking_for(m, key, ranking)
         hash_score = _stable_int_hash(seed + "::" + key)
         # Add goal-aware ranking: bulk favors higher macros, cut disfavors fat
         goal_bias = 0
@@ -248,8 +307,7 @@ def _deterministic_pick(meals: list[dict[str, Any]], seed: str, k: int, goal: st
             goal_bias = int(macro_score)  # higher scores for bulk
         elif goal == "cut":
             # For cut, penalize fat slightly to encourage leaner meals
-            macros = m.get("_macros", {})
-            fat_penalty = int(float(macros.get("fat_g", 0.0)) * 0.5)
+            fat_penalty = int(fat_g * 0.5)
             goal_bias = -fat_penalty
         scored.append(((bucket, goal_bias, -macro_score, hash_score), m))
 
@@ -265,27 +323,74 @@ def _deterministic_pick(meals: list[dict[str, Any]], seed: str, k: int, goal: st
         i += 1
     return out
 
+def _pick_one_for_slot(
+    meals: list[dict[str, Any]],
+    seed: str,
+    slot: str,
+    goal: str,
+    ranking: Mapping[str, tuple[float, float]] | None,
+) -> dict[str, Any]:
+    """
+    First element of _deterministic_pick_for_slot's ordering without sorting.
+
+    The hash only breaks ties (behind the bucket for snacks, behind the whole
+    macro ranking otherwise), so it is computed just for the candidates still
+    tied on everything ranked before it. `min` keeps the first of equal keys,
+    like the stable sort it replaces.
+    """
+    ranked = []
+    for m in meals:
+        key = str(m.get("key", m.get("name", "")))
+        bucket = 0 if key.startswith("-") else 1
+        macro_score, fat_g = _ranking_for(m, key, ranking)
+        if slot == "snack":
+            prefix: tuple = (bucket,)
+        else:
+            goal_bias = 0
+            if goal == "bulk":
+                goal_bias = int(macro_score)
+            elif goal == "cut":
+                goal_bias = -int(fat_g * 0.5)
+            prefix = (bucket, goal_bias, -macro_score)
+        ranked.append((prefix, key, macro_score, m))
+
+    best = min(r[0] for r in ranked)
+    tied = [r for r in ranked if r[0] == best]
+    if len(tied) == 1:
+        return tied[0][3]
+    hash_of = _seeded_hash(seed)
+    if slot == "snack":
+        return min(tied, key=lambda r: (hash_of(r[1]), -r[2]))[3]
+    return min(tied, key=lambda r: hash_of(r[1]))[3]
+
+
 def _deterministic_pick_for_slot(
     meals: list[dict[str, Any]],
     seed: str,
     k: int,
     slot: str,
     goal: str = "maintenance",
+    ranking: Mapping[str, tuple[float, float]] | None = None,
 ) -> list[dict[str, Any]]:
     """
     Deterministic slot-aware picker:
     - For snacks: prioritize variety (hash) over macro_score so you don't always get trail mix.
     - For other slots: keep existing behavior.
+
+    `ranking` maps template key -> (macro_score, fat_g) computed for this
+    request; without it the legacy `_macro_score` / `_macros` fields are read.
     """
     if not meals:
         return []
+    if int(k) == 1:
+        return [_pick_one_for_slot(meals, seed, slot, goal, ranking)]
 
     scored = []
     for m in meals:
         key = str(m.get("key", m.get("name", "")))
         bucket = 0 if key.startswith("-") else 1
 
-        macro_score = float(m.get("_macro_score", 0.0))
+        macro_score, fat_g = _ranking_for(m, key, ranking)
         hash_score = _stable_int_hash(seed + "::" + key)
 
         # Snack: variety-first (hash dominates), macro_score only as a weak tie-breaker
@@ -298,8 +403,7 @@ def _deterministic_pick_for_slot(
         if goal == "bulk":
             goal_bias = int(macro_score)
         elif goal == "cut":
-            macros = m.get("_macros", {})
-            fat_penalty = int(float(macros.get("fat_g", 0.0)) * 0.5)
+            fat_penalty = int(fat_g * 0.5)
             goal_bias = -fat_penalty
 
         scored.append(((bucket, goal_bias, -macro_score, hash_score), m))
@@ -478,12 +582,84 @@ def _scale_meal_ingredients(meal: dict[str, Any], scale: float) -> bool:
     return changed
 
 
-def _slot_tag_match(slot: str, tags: Iterable[str]) -> bool:
-    tset = {str(t).strip().lower() for t in (tags or [])}
-    if slot == "snack":
-        return bool(tset & {"snack", "dessert"})
-    return slot in tset
+# ---------------------------------------------------------------------------
+# Meal template index
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class MealTemplateEntry:
+    """
+    Everything about a MEAL_LIBRARY template that does not depend on the
+    request, computed once at import. `template` is the shared library dict
+    and must be treated as read-only.
+    """
+    position: int
+    key: str
+    template: Mapping[str, Any]
+    base_macros: Mapping[str, float]
+    pantry_keys: tuple[str, ...]
+    pantry_rows: tuple[int, ...]
+    slot_tags: frozenset[str]
+    ingredient_diet_tags: tuple[frozenset[str], ...]
+    diet_tags: frozenset[str]
+    allergen_tokens: frozenset[str]
+    # token bitmasks (services.nutrition.allergens.token_mask)
+    ingredient_diet_masks: tuple[int, ...]
+    contains_mask: int
+
+    def allowed_by_diet(self, required: set[str], required_mask: int) -> bool:
+        # every ingredient needs at least one acceptable diet tag
+        if not required:
+            return True
+        return all(
+            masks_overlap(mask, tags, required_mask, required)
+            for mask, tags in zip(self.ingredient_diet_masks, self.ingredient_diet_tags)
+        )
+
+    def allowed_by_allergies(self, blocked: set[str], blocked_mask: int) -> bool:
+        return not masks_overlap(self.contains_mask, self.allergen_tokens, blocked_mask, blocked)
+
+
+def _build_meal_index(library: list[dict[str, Any]]) -> tuple[MealTemplateEntry, ...]:
+    entries: list[MealTemplateEntry] = []
+    for position, m in enumerate(library):
+        ings = m.get("ingredients") or []
+        ing_diet = tuple(
+            frozenset(t.lower() for t in (ing.get("diet_tags") or [])) for ing in ings
+        )
+        contains = frozenset(t.lower() for ing in ings for t in (ing.get("contains") or []))
+        entries.append(
+            MealTemplateEntry(
+                position=position,
+                key=str(m.get("key") or m.get("name") or ""),
+                template=m,
+                base_macros=MappingProxyType(_meal_macros_from_pantry(ings)),
+                pantry_keys=tuple(_canonical_pantry_key(ing.get("name")) for ing in ings),
+                pantry_rows=tuple(_pantry_row(ing.get("name")) for ing in ings),
+                slot_tags=frozenset(str(t).strip().lower() for t in (m.get("tags") or [])),
+                ingredient_diet_tags=ing_diet,
+                diet_tags=frozenset().union(*ing_diet),
+                allergen_tokens=contains,
+                ingredient_diet_masks=tuple(token_mask(tags) for tags in ing_diet),
+                contains_mask=token_mask(contains),
+            )
+        )
+    return tuple(entries)
+
+
+# Built once; never mutated, so concurrent requests can share it freely.
+MEAL_INDEX: tuple[MealTemplateEntry, ...] = _build_meal_index(MEAL_LIBRARY)
+
+# Template name -> key, for snapshot meals that only carry a name.
+_TEMPLATE_KEY_BY_NAME: Mapping[str, str] = MappingProxyType(
+    {str(e.template.get("name") or ""): e.key for e in reversed(MEAL_INDEX)}
+)
+
 
+def _slot_entry_match(slot: str, entry: MealTemplateEntry) -> bool:
+    if slot == "snack":
+        return bool(entry.slot_tags & {"snack", "dessert"})
+    return slot in entry.slot_tags
 
 
 def _find_first_matching_ingredient_idx(meal: dict[str, Any], preferred_names: list[str]) -> int | None:
@@ -499,90 +675,48 @@ def _find_first_matching_ingredient_idx(meal: dict[str, Any], preferred_names: l
 
 
 
-def _clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
-
-
-def _apply_ingredient_grams_delta(
-    meal: dict[str, Any],
-    idx: int,
-    delta_g: float,
-    per_step_cap_g: float,
-    abs_cap_g: float,
-) -> bool:
-    # Returns True if we actually changed grams
-    ings = meal.get("ingredients", [])
-    if idx < 0 or idx >= len(ings):
-        return False
-
-    ing = ings[idx]
-    grams_now = float(ing.get("grams", 0.0))
-    if grams_now < 0:
-        grams_now = 0.0
-
-    delta_g = _clamp(delta_g, -per_step_cap_g, per_step_cap_g)
-    grams_new = _clamp(grams_now + delta_g, 0.0, abs_cap_g)
-
-    # deterministic integer grams
-    grams_new_i = int(round(grams_new))
-    if grams_new_i == int(round(grams_now)):
-        return False
-
-    ing["grams"] = grams_new_i
-    return True
-
-
 def _multi_meal_calorie_close_carbs(
     meals: list[dict[str, Any]],
     target_cals: float,
     tolerance_cals: float = 100.0,
+    per_step_cap_g: float = 500.0,
+    abs_cap_g: float = 1000.0,
 ) -> None:
     if not meals:
         return
 
-    # Walk meals last -> first for determinism
-    for _pass in range(6):  # two passes is enough for v1
-        totals = _sum_macros(meals)
-        delta = float(target_cals) - float(totals["calories"])
-        if abs(delta) <= tolerance_cals:
-            return
-
-        for meal in reversed(meals):
-            idx = _find_carb_adjust_ingredient(meal)
-            if idx is None:
-                continue
-
-            ing = meal["ingredients"][idx]
-            name = ing.get("name")
-            # Use alias for lookup
-            canonical_name = _canonical_pantry_key(name)
-            per100 = INGREDIENT_PANTRY_PER_100G.get(canonical_name)
-            if not per100:
-                continue
-
-            kcal_per_g = float(per100.get("calories", 0.0)) / 100.0
-            if kcal_per_g <= 0:
-                continue
-
-            # grams needed to fix remaining delta
-            grams_needed = delta / kcal_per_g
+    totals = _sum_macros(meals)
+    delta = float(target_cals) - float(totals["calories"])
+    if abs(delta) <= tolerance_cals:
+        return
 
-            changed = _apply_ingredient_grams_delta(
-                meal,
-                idx,
-                grams_needed,
-                per_step_cap_g=500.0,  # Increased from 250.0
-                abs_cap_g=1000.0,        # Increased from 650.0
+    # One carb base per meal, last meal first for determinism
+    adjustables: list[Adjustable] = []
+    for mi in range(len(meals) - 1, -1, -1):
+        meal = meals[mi]
+        idx = _find_carb_adjust_ingredient(meal)
+        if idx is None:
+            continue
+        ing = meal["ingredients"][idx]
+        row = _pantry_row(ing.get("name"))
+        if row < 0:
+            continue
+        adjustables.append(
+            Adjustable(
+                meal=mi,
+                ingredient=idx,
+                grams=float(ing.get("grams", 0.0)),
+                kcal_per_g=PANTRY_KCAL_PER_G[row],
+                max_step_g=per_step_cap_g,
+                max_g=abs_cap_g,
             )
-            if not changed:
-                continue
+        )
 
-            # recompute after each change
-            meal["macros"] = _meal_macros_from_pantry(meal["ingredients"])
-            totals = _sum_macros(meals)
-            delta = float(target_cals) - float(totals["calories"])
-            if abs(delta) <= tolerance_cals:
-                return
+    changes = solve_calorie_close(adjustables, delta, tolerance_cals)
+    for (mi, idx), grams in changes.items():
+        meals[mi]["ingredients"][idx]["grams"] = grams
+    for mi in {mi for mi, _ in changes}:
+        meals[mi]["macros"] = _meal_macros_from_pantry(meals[mi]["ingredients"])
 
 
 def _macro_close_v1(
@@ -604,61 +738,197 @@ def _macro_close_v1(
     tol_cals = 100.0
     _multi_meal_calorie_close_carbs(meals, target_cals, tolerance_cals=tol_cals)
 
-    # Final recompute to ensure consistency
-    for m in meals:
-        m["macros"] = _meal_macros_from_pantry(m["ingredients"])
-
 
 
-def generate_stub_meals(req: Any, attempt: int) -> dict[str, Any]:
-    # Determine constraints
+def _candidate_entries(req: Any) -> tuple[list[MealTemplateEntry], set[str], set[str]]:
+    """(diet/allergy-safe templates, blocked allergen tokens, required diet tags)."""
     blocked = build_allergen_set(list(getattr(req, "allergies", None) or []))
     diet = getattr(req, "diet", None)
     required = _diet_required_tags(diet)
 
     # Prefilter meals by diet BEFORE any selection attempts
-    def _meal_passes_diet(meal: dict) -> bool:
-        if not required:
-            return True
-        for ing in meal.get("ingredients", []):
-            tags = set(t.lower() for t in (ing.get("diet_tags") or []))
-            if tags.isdisjoint(required):
-                return False
-        return True
-
-    # Build diet-filtered candidate pool
-    diet_candidates = [m for m in MEAL_LIBRARY if _meal_passes_diet(m)]
-    
+    blocked_mask = token_mask(blocked)
+    required_mask = token_mask(required)
+    diet_candidates = [e for e in MEAL_INDEX if e.allowed_by_diet(required, required_mask)]
+
     # Fail-closed: if diet is specified but no meals are available, raise error
     if diet and not diet_candidates:
         raise ValueError(f"No meals available for diet={diet}")
-    
+
     # Use diet-filtered pool (or full library if no diet specified)
-    pool = diet_candidates if diet else MEAL_LIBRARY
+    pool = diet_candidates if diet else MEAL_INDEX
 
     # Candidate meals (apply allergy filtering to the diet-filtered pool)
-    candidates_by_key: dict[str, dict[str, Any]] = {}
-    for m in pool:
-        if not _meal_allowed_by_allergies(m, blocked):
+    entries_by_key: dict[str, MealTemplateEntry] = {}
+    for e in pool:
+        if not e.allowed_by_allergies(blocked, blocked_mask):
             continue
-
-        k = str(m.get("key") or m.get("name") or "")
-        if not k:
+        if not e.key:
             continue
-
         # keep first occurrence deterministically
-        if k not in candidates_by_key:
-            candidates_by_key[k] = m
+        if e.key not in entries_by_key:
+            entries_by_key[e.key] = e
 
-    candidates: list[dict[str, Any]] = list(candidates_by_key.values())
+    return list(entries_by_key.values()), blocked, required
 
+
+def _target_calories(req: Any) -> float | None:
     # Target calories (routes usually inject this into req)
     target = getattr(req, "calories", None) or getattr(req, "target_calories", None)
     try:
-        target_f = float(target) if target is not None else None
+        return float(target) if target is not None else None
     except Exception:
-        target_f = None
+        return None
+
+
+def _request_ranking(req: Any, entries: list[MealTemplateEntry]) -> tuple[str, dict[str, tuple[float, float]]]:
+    """Goal and per-template (macro_score, fat_g) for this request."""
+    goal = _infer_goal_from_targets(req)
+    wp, wc, wf = _macro_bias_from_goal(goal)
+
+    # Request-local: the shared templates are never written to.
+    ranking: dict[str, tuple[float, float]] = {}
+    for e in entries:
+        macros = e.base_macros
+        ranking[e.key] = (
+            wp * float(macros.get("protein_g", 0.0))
+            + wc * float(macros.get("carbs_g", 0.0))
+            + wf * float(macros.get("fat_g", 0.0)),
+            float(macros.get("fat_g", 0.0)),
+        )
+    return goal, ranking
 
+
+def _slot_pools(slots: list[str], entries: list[MealTemplateEntry]) -> dict[str, list[MealTemplateEntry]]:
+    # Built once per distinct slot; each pick only has to drop used templates.
+    pools: dict[str, list[MealTemplateEntry]] = {}
+    for slot in slots:
+        if slot not in pools:
+            pools[slot] = [e for e in entries if _slot_entry_match(slot, e)]
+    return pools
+
+
+def _pick_slot(
+    i: int,
+    slot: str,
+    pools: dict[str, list[MealTemplateEntry]],
+    entries: list[MealTemplateEntry],
+    used_template_keys: set[str],
+    seed: str,
+    goal: str,
+    ranking: Mapping[str, tuple[float, float]],
+    avoid_keys: frozenset[str] | set[str] = frozenset(),
+) -> dict[str, Any] | None:
+    # `avoid_keys` are templates to skip unless nothing else unused is left
+    # (regenerate passes the templates being replaced).
+    excluded = used_template_keys | avoid_keys if avoid_keys else used_template_keys
+
+    # First try: slot-match + unused templates
+    slot_entries = [e for e in pools[slot] if e.key not in excluded]
+
+    # Fallback: anything unused, else repeats (still deterministic)
+    if not slot_entries:
+        slot_entries = [e for e in entries if e.key not in excluded]
+        if not slot_entries and avoid_keys:
+            slot_entries = [e for e in entries if e.key not in used_template_keys]
+        if not slot_entries:
+            slot_entries = entries
+
+    one = _deterministic_pick_for_slot(
+        [e.template for e in slot_entries],
+        seed + f"|slot={slot}|i={i}",
+        1,
+        slot=slot,
+        goal=goal,
+        ranking=ranking,
+    )
+    return one[0] if one else None
+
+
+def _build_output_meal(tm: Mapping[str, Any], req: Any) -> dict[str, Any]:
+    # Copy the template so we can mutate grams
+    ingredients = [dict(ing) for ing in (tm.get("ingredients") or [])]
+    user_diet = (str(getattr(req, "diet", "") or "").strip().lower())
+    fail_open = user_diet not in {"vegan", "vegetarian", "pescatarian"}
+
+    if fail_open:
+        for ing in ingredients:
+            tags = list(ing.get("diet_tags") or [])
+            if "omnivore" not in {t.lower() for t in tags}:
+                tags.append("omnivore")
+            ing["diet_tags"] = tags
+
+    meal_contains: set[str] = set()
+    meal_diet_tags: set[str] = set()
+
+    for ing in ingredients:
+        for t in (ing.get("contains") or []):
+            s = str(t).strip().lower()
+            if s:
+                meal_contains.add(s)
+        for t in (ing.get("diet_tags") or []):
+            s = str(t).strip().lower()
+            if s:
+                meal_diet_tags.add(s)
+
+    if fail_open:
+        meal_diet_tags.add("omnivore")
+
+    macros = _meal_macros_from_pantry(ingredients)
+    return {
+        "key": tm.get("key"),
+        "name": tm.get("name"),
+        "tags": tm.get("tags", []),
+        "diet_tags": sorted(list(meal_diet_tags)),
+        "contains": sorted(list(meal_contains)),
+        "ingredients": ingredients,
+        "macros": macros,
+    }
+
+
+def _scale_to_budget(m: dict[str, Any], budget: int) -> None:
+    # Phase 4-D: scale the meal toward its slot calorie budget (scale ALL ingredients)
+    meal_cals = float((m.get("macros") or {}).get("calories", 0.0))
+    if meal_cals <= 0:
+        return
+
+    s = float(budget) / meal_cals
+    if s < 0.5:
+        s = 0.5
+    elif s > 3.0:
+        s = 3.0
+
+    if _scale_meal_ingredients(m, s):
+        m["macros"] = _meal_macros_from_pantry(m["ingredients"])
+
+
+def _finish_day(
+    picked: list[Mapping[str, Any]],
+    req: Any,
+    budgets: list[int],
+    target_f: float | None,
+    goal: str,
+) -> list[dict[str, Any]]:
+    """Build, scale and calorie-close one day's meals from its picked templates."""
+    out_meals = [_build_output_meal(tm, req) for tm in picked]
+
+    if target_f is not None and budgets:
+        for m, budget in zip(out_meals, budgets):
+            _scale_to_budget(m, budget)
+
+    # Day-level closing still runs after scaling
+    if target_f is not None:
+        _macro_close_v1(out_meals, goal=goal, target_cals=float(target_f))
+    else:
+        _calorie_close_by_adjusting_last_meal_carbs(out_meals, target_f)
+
+    # Recompute macros after any adjustment
+    for m in out_meals:
+        m["macros"] = _meal_macros_from_pantry(m["ingredients"])
+    return out_meals
+
+
+def _meals_needed_final(req: Any, target_f: float | None) -> int:
     # Phase 4-D: infer meals from calories unless meals_needed explicitly provided
     # Sentinel: meals_needed <= 0 means "infer from target_calories"
     raw_meals_needed = getattr(req, "meals_needed", None)
@@ -692,163 +962,246 @@ def generate_stub_meals(req: Any, attempt: int) -> dict[str, Any]:
             meals_needed_final = _clamp_int(batch_int, 2, 6)
         # else: sentinel (0 or negative) means don't override, keep meals_needed_final
 
+    return meals_needed_final
+
+
+def generate_stub_meals(req: Any, attempt: int) -> dict[str, Any]:
+    candidate_entries, blocked, required = _candidate_entries(req)
+    target_f = _target_calories(req)
+
+    meals_needed_final = _meals_needed_final(req, target_f)
+
     # Slots + budgets
     slots = _slots_for_meals_needed(meals_needed_final)
     budgets: list[int] = _slot_budgets(float(target_f), slots) if target_f is not None else []
 
     # Precompute macro scores for candidates (goal-aware ranking)
-    goal = _infer_goal_from_targets(req)
-    wp, wc, wf = _macro_bias_from_goal(goal)
-
-    def _macro_score_from_macros(macros: dict[str, float]) -> float:
-        return (
-            wp * float(macros.get("protein_g", 0.0))
-            + wc * float(macros.get("carbs_g", 0.0))
-            + wf * float(macros.get("fat_g", 0.0))
-        )
-
-    for tm in candidates:
-        ings = tm.get("ingredients") or []
-        macros = _meal_macros_from_pantry(ings)
-        tm["_macro_score"] = _macro_score_from_macros(macros)
-        tm["_macros"] = macros
+    goal, ranking = _request_ranking(req, candidate_entries)
 
     # Per-slot deterministic pick
     seed = _seed_string(req, attempt)
     picked: list[dict[str, Any]] = []
-    remaining = list(candidates)
-
     used_template_keys: set[str] = set()
-
-    def _tkey(m: dict[str, Any]) -> str:
-        return str(m.get("key") or m.get("name") or "")
+    pools = _slot_pools(slots, candidate_entries)
 
     for i, slot in enumerate(slots):
-        # First try: slot-match + unused templates
-        slot_candidates = [
-            m for m in remaining
-            if _slot_tag_match(slot, m.get("tags")) and _tkey(m) not in used_template_keys
-        ]
-
-        # Fallback 1: slot-match even if repeats (only if we ran out)
-        if not slot_candidates:
-            slot_candidates = [m for m in remaining if _slot_tag_match(slot, m.get("tags"))]
-
-        # Fallback 2: anything remaining (still deterministic)
-        if not slot_candidates:
-            if remaining:
-                slot_candidates = list(remaining)
-            else:
-                # Prefer unused candidates even when remaining is empty
-                unused_any = [m for m in candidates if _tkey(m) not in used_template_keys]
-                slot_candidates = unused_any if unused_any else list(candidates)
-
-
-        one = _deterministic_pick_for_slot(
-            slot_candidates,
-            seed + f"|slot={slot}|i={i}",
-            1,
-            slot=slot,
-            goal=goal,
-        )
-
-        if not one:
+        tm = _pick_slot(i, slot, pools, candidate_entries, used_template_keys, seed, goal, ranking)
+        if tm is None:
             continue
-
-        tm = one[0]
-        tk = _tkey(tm)
         picked.append(tm)
-        if tk:
-            used_template_keys.add(tk)
+        used_template_keys.add(str(tm.get("key") or tm.get("name") or ""))
 
-        # Remove by key (not object identity) so duplicates can't slip through
-        if tk:
-            remaining = [m for m in remaining if _tkey(m) != tk]
+    out_meals = _finish_day(picked, req, budgets, target_f, goal)
 
+    totals = _sum_macros(out_meals)
 
-    # Build output meals (copy templates so we can mutate grams)
-    out_meals: list[dict[str, Any]] = []
-    for tm in picked:
-        ingredients = [dict(ing) for ing in (tm.get("ingredients") or [])]
-        user_diet = (str(getattr(req, "diet", "") or "").strip().lower())
-        fail_open = user_diet not in {"vegan", "vegetarian", "pescatarian"}
+    return {
+        "meals": out_meals,
+        "totals": totals,
+        "meta": {
+            "seed": seed,
+            "slots": slots,
+            "slot_budgets": budgets if budgets else None,
+            "diet_required": sorted(list(required)),
+            "allergy_blocked": sorted(list(blocked)),
+            "candidate_count": len(candidate_entries),
+        },
+    }
 
-        if fail_open:
-            for ing in ingredients:
-                tags = list(ing.get("diet_tags") or [])
-                if "omnivore" not in {t.lower() for t in tags}:
-                    tags.append("omnivore")
-                ing["diet_tags"] = tags
 
-        meal_contains: set[str] = set()
-        meal_diet_tags: set[str] = set()
+def generate_stub_days(
+    req: Any,
+    days: int,
+    attempt: int,
+    rules: VarietyRules = VarietyRules(),
+) -> list[dict[str, Any]]:
+    """
+    Plan `days` days at once with cross-day variety (see schedule_variety).
 
-        for ing in ingredients:
-            for t in (ing.get("contains") or []):
-                s = str(t).strip().lower()
-                if s:
-                    meal_contains.add(s)
-            for t in (ing.get("diet_tags") or []):
-                s = str(t).strip().lower()
-                if s:
-                    meal_diet_tags.add(s)
-
-        if fail_open:
-            meal_diet_tags.add("omnivore")
-
-        macros = _meal_macros_from_pantry(ingredients)
-        out_meals.append(
-            {
-                "key": tm.get("key"),
-                "name": tm.get("name"),
-                "tags": tm.get("tags", []),
-                "diet_tags": sorted(list(meal_diet_tags)),
-                "contains": sorted(list(meal_contains)),
-                "ingredients": ingredients,
-                "macros": macros,
-            }
+    Each slot's preference order is the slot picker's ranking over its
+    matching templates, followed by every other candidate as fallback.
+    Every day is then built exactly like a generate_stub_meals day.
+    """
+    candidate_entries, blocked, required = _candidate_entries(req)
+    target_f = _target_calories(req)
+    slots = _slots_for_meals_needed(_meals_needed_final(req, target_f))
+    budgets: list[int] = _slot_budgets(float(target_f), slots) if target_f is not None else []
+    goal, ranking = _request_ranking(req, candidate_entries)
+    seed = _seed_string(req, attempt)
+    pools = _slot_pools(slots, candidate_entries)
+
+    def _order(templates: list[dict[str, Any]], slot: str) -> list[str]:
+        ordered = _deterministic_pick_for_slot(
+            templates, seed + f"|slot={slot}", len(templates), slot=slot, goal=goal, ranking=ranking
         )
+        return [str(tm.get("key") or tm.get("name") or "") for tm in ordered]
 
-    # Phase 4-D: scale each meal toward its slot calorie budget (scale ALL ingredients)
-    if target_f is not None and budgets:
-        for i, m in enumerate(out_meals):
-            if i >= len(budgets):
-                break
+    slot_orders: dict[str, list[str]] = {}
+    for slot, pool in pools.items():
+        own = _order([e.template for e in pool], slot)
+        own_keys = set(own)
+        rest = _order([e.template for e in candidate_entries if e.key not in own_keys], slot)
+        slot_orders[slot] = own + rest
 
-            meal_cals = float((m.get("macros") or {}).get("calories", 0.0))
-            if meal_cals <= 0:
-                continue
+    template_by_key = {e.key: e.template for e in candidate_entries}
+    plan = schedule_variety(slots, days, slot_orders, rules)
 
-            s = float(budgets[i]) / meal_cals
-            if s < 0.5:
-                s = 0.5
-            elif s > 3.0:
-                s = 3.0
+    out: list[dict[str, Any]] = []
+    for day, keys in enumerate(plan):
+        meals = _finish_day([template_by_key[k] for k in keys], req, budgets, target_f, goal)
+        out.append({
+            "meals": meals,
+            "totals": _sum_macros(meals),
+            "meta": {
+                "seed": seed,
+                "day": day + 1,
+                "slots": slots,
+                "slot_budgets": budgets if budgets else None,
+                "diet_required": sorted(list(required)),
+                "allergy_blocked": sorted(list(blocked)),
+                "candidate_count": len(candidate_entries),
+            },
+        })
+    return out
 
-            if _scale_meal_ingredients(m, s):
-                m["macros"] = _meal_macros_from_pantry(m["ingredients"])
 
-    # Day-level closing still runs after scaling
-    if target_f is not None:
-        _macro_close_v1(out_meals, goal=goal, target_cals=float(target_f))
-    else:
-        _calorie_close_by_adjusting_last_meal_carbs(out_meals, target_f)
+def _carried_meal(
+    prev: Mapping[str, Any],
+    entry: MealTemplateEntry,
+    req: Any,
+    blocked: set[str],
+    required: set[str],
+    blocked_mask: int,
+) -> dict[str, Any] | None:
+    """`prev` with its own ingredients and macros, if it has them and they still pass."""
+    ings = prev.get("ingredients")
+    macros = prev.get("macros")
+    if not isinstance(ings, list) or not ings or not isinstance(macros, dict):
+        return None
+    # Booster rows carry no contains/diet_tags; they were filtered on the
+    # request's allergies and diet when boosters.py added them.
+    own = [ing for ing in ings if not (isinstance(ing, dict) and ing.get("type") == "booster")]
+    if meal_rejection_reason({"ingredients": own}, blocked, required_diet_tags=required, blocked_mask=blocked_mask):
+        return None
+    m = _build_output_meal(entry.template, req)
+    m["ingredients"] = copy.deepcopy(ings)
+    m["macros"] = dict(macros)
+    return m
+
+
+def regenerate_stub_slots(
+    req: Any,
+    prev_meals: list[Mapping[str, Any]],
+    replace: Iterable[int],
+    attempt: int,
+) -> dict[str, Any]:
+    """
+    Re-pick only the slots in `replace`; every other slot keeps its previous
+    template (matched by name, as snapshots only store {key, name}).
+
+    Candidates are the templates that pass meal_rejection_reason for the
+    request, so every pick clears the route's safety check. A kept meal
+    whose template is gone or no longer passes is replaced as well. New
+    picks avoid the kept templates and the templates being replaced (one of
+    those is reused only when nothing else is left), and calories are
+    re-closed across the replaced meals only, against whatever the kept
+    meals leave of the target.
+
+    A kept meal that still has its previous `ingredients` and `macros` is
+    returned exactly as it was ("carried"); one without them (older
+    snapshots) is rebuilt from its template.
+    """
+    n = len(prev_meals)
+    if not 2 <= n <= 6:
+        raise ValueError(f"Incremental regenerate needs 2-6 previous meals, got {n}")
+
+    candidate_entries, blocked, required = _candidate_entries(req)
+    # The stub's own filter compares raw library tokens; the route checks
+    # normalized ones, so re-check with the same function the route uses.
+    blocked_mask = allergen_mask(blocked)
+    candidate_entries = [
+        e for e in candidate_entries
+        if meal_rejection_reason(e.template, blocked, required_diet_tags=required, blocked_mask=blocked_mask) is None
+    ]
+    target_f = _target_calories(req)
+    slots = _slots_for_meals_needed(n)
+    budgets: list[int] = _slot_budgets(float(target_f), slots) if target_f is not None else []
+    goal, ranking = _request_ranking(req, candidate_entries)
 
-    # Recompute macros after any adjustment
-    for m in out_meals:
-        m["macros"] = _meal_macros_from_pantry(m["ingredients"])
+    by_name: dict[str, MealTemplateEntry] = {}
+    for e in candidate_entries:
+        by_name.setdefault(str(e.template.get("name") or ""), e)
 
-    totals = _sum_macros(out_meals)
+    replaced = {int(i) for i in replace if 0 <= int(i) < n}
+    kept: dict[int, MealTemplateEntry] = {}
+    forced: list[int] = []
+    for i, prev in enumerate(prev_meals):
+        if i in replaced:
+            continue
+        e = by_name.get(str(prev.get("name") or ""))
+        if e is None:
+            replaced.add(i)
+            forced.append(i)
+        else:
+            kept[i] = e
+
+    # Templates the replaced slots had, so a re-pick doesn't hand them back.
+    previous_keys = {
+        _TEMPLATE_KEY_BY_NAME.get(str(prev_meals[i].get("name") or ""), "") for i in replaced
+    }
+    previous_keys.discard("")
+
+    seed = _seed_string(req, attempt)
+    used_template_keys = {e.key for e in kept.values()}
+    pools = _slot_pools(slots, candidate_entries)
+
+    out_meals: list[dict[str, Any]] = []
+    changed: list[dict[str, Any]] = []
+    carried: list[int] = []
+    for i, slot in enumerate(slots):
+        if i in kept:
+            m = _carried_meal(prev_meals[i], kept[i], req, blocked, required, blocked_mask)
+            if m is not None:
+                carried.append(i)
+                out_meals.append(m)
+                continue
+            tm = kept[i].template
+        else:
+            tm = _pick_slot(
+                i, slot, pools, candidate_entries, used_template_keys, seed, goal, ranking,
+                avoid_keys=previous_keys,
+            )
+            if tm is None:
+                raise ValueError(f"No meals available for slot {i}")
+            used_template_keys.add(str(tm.get("key") or tm.get("name") or ""))
+        m = _build_output_meal(tm, req)
+        if budgets:
+            _scale_to_budget(m, budgets[i])
+        out_meals.append(m)
+        if i in replaced:
+            changed.append(m)
+
+    if target_f is not None and changed:
+        kept_cals = sum(
+            float(m["macros"].get("calories", 0.0))
+            for i, m in enumerate(out_meals)
+            if i not in replaced
+        )
+        # Recomputes macros for the meals it touches; kept meals stay as built.
+        _macro_close_v1(changed, goal=goal, target_cals=float(target_f) - kept_cals)
 
     return {
         "meals": out_meals,
-        "totals": totals,
+        "totals": _sum_macros(out_meals),
         "meta": {
             "seed": seed,
             "slots": slots,
             "slot_budgets": budgets if budgets else None,
             "diet_required": sorted(list(required)),
             "allergy_blocked": sorted(list(blocked)),
-            "candidate_count": len(candidates),
+            "candidate_count": len(candidate_entries),
+            "replaced": sorted(replaced),
+            "forced_replace": forced,
+            "carried": carried,
         },
-    }
\ No newline at end of file
+    }
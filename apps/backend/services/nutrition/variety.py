@@ -0,0 +1,122 @@
+# apps/backend/services/nutrition/variety.py
+"""
+Cross-day variety scheduling for multi-day meal plans.
+
+All days x slots are filled in one pass. Each slot has a precomputed
+preference order of template keys (its own candidates first, then the rest
+as fallback); a position takes the best key that is not already used that
+day, has been used fewer than `max_repeats` times, and was last used at
+least `min_gap_days` days earlier.
+
+Picks are greedy with bounded lookahead: the best `beam` options for a
+position are each scored by their own rank plus a plain greedy rollout of
+the next `lookahead` positions, so an early pick doesn't starve a later
+slot. When nothing satisfies the rules they are relaxed in order (gap,
+then repeat count, then same-day repeats) and the relaxed pick is costed
+so any rule-abiding option wins.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Mapping, Sequence
+
+# Cost added per relaxed rule; far above any rank within one order.
+_RELAX_COST = 1_000_000
+
+
+@dataclass(frozen=True)
+class VarietyRules:
+    max_repeats: int = 2    # uses of one template across the whole plan
+    min_gap_days: int = 2   # days between two uses of one template
+    lookahead: int = 3      # positions rolled out per option
+    beam: int = 4           # options considered per position
+
+
+@dataclass
+class _State:
+    counts: dict[str, int]
+    last_day: dict[str, int]
+    day_keys: dict[int, set[str]]
+
+    def copy(self) -> "_State":
+        return _State(
+            dict(self.counts),
+            dict(self.last_day),
+            {d: set(keys) for d, keys in self.day_keys.items()},
+        )
+
+    def take(self, day: int, key: str) -> None:
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.last_day[key] = day
+        self.day_keys.setdefault(day, set()).add(key)
+
+
+def _options(
+    day: int,
+    order: Sequence[str],
+    state: _State,
+    rules: VarietyRules,
+    limit: int,
+) -> list[tuple[int, str]]:
+    """Up to `limit` (cost, key) options for one position, best first."""
+    today = state.day_keys.get(day, ())
+    for level in range(4):
+        out: list[tuple[int, str]] = []
+        for rank, key in enumerate(order):
+            if level < 3 and key in today:
+                continue
+            if level < 2 and state.counts.get(key, 0) >= rules.max_repeats:
+                continue
+            if level < 1:
+                last = state.last_day.get(key)
+                if last is not None and day - last < rules.min_gap_days:
+                    continue
+            out.append((level * _RELAX_COST + rank, key))
+            if len(out) >= limit:
+                break
+        if out:
+            return out
+    return []
+
+
+def schedule_variety(
+    slots: Sequence[str],
+    days: int,
+    slot_orders: Mapping[str, Sequence[str]],
+    rules: VarietyRules = VarietyRules(),
+) -> list[list[str]]:
+    """
+    Return one list of template keys per day, aligned with `slots`.
+
+    `slot_orders[slot]` is that slot's full preference order (best first).
+    """
+    positions = [(d, slot) for d in range(days) for slot in slots]
+    for slot in set(slots):
+        if not slot_orders.get(slot):
+            raise ValueError(f"No candidates for slot {slot}")
+
+    def rollout(start: int, state: _State) -> int:
+        cost = 0
+        for day, slot in positions[start:start + rules.lookahead]:
+            best = _options(day, slot_orders[slot], state, rules, 1)[0]
+            cost += best[0]
+            state.take(day, best[1])
+        return cost
+
+    state = _State({}, {}, {})
+    plan: list[list[str]] = [[] for _ in range(days)]
+    for p, (day, slot) in enumerate(positions):
+        opts = _options(day, slot_orders[slot], state, rules, max(1, rules.beam))
+        choice = opts[0]
+        if rules.lookahead > 0 and len(opts) > 1:
+            best_total = None
+            for cost, key in opts:
+                trial = state.copy()
+                trial.take(day, key)
+                total = cost + rollout(p + 1, trial)
+                # strict < keeps the better-ranked option on ties
+                if best_total is None or total < best_total:
+                    best_total, choice = total, (cost, key)
+        state.take(day, choice[1])
+        plan[day].append(choice[1])
+    return plan
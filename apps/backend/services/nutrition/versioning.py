@@ -27,12 +27,13 @@ class NutritionTargets(TypedDict):
     bulk: RateTargets
 
 
-class Meal(TypedDict):
+class Meal(TypedDict, total=False):
     key: str
     name: str
-    # optional future fields:
-    # macros: dict
-    # ingredients: list[str]
+    # accepted meals also carry these when known, so incremental regenerate
+    # can keep a meal exactly as the user had it
+    ingredients: list[dict]
+    macros: dict
 
 
 class NutritionVersionV1(TypedDict):
@@ -47,12 +48,13 @@ class NutritionVersionV1(TypedDict):
 # Snapshot helpers / builders
 # -------------------------
 
-def _snapshot_meal_list(meals: list[dict]) -> list[dict]:
+def _snapshot_meal_list(meals: list[dict], details: bool = False) -> list[dict]:
     """Return a stable snapshot list of meals preserving order.
 
-    Each output item is a dict containing exactly:
+    Each output item is a dict containing:
       - key: stable key (use normalize_meal_key(name) when missing/empty)
       - name: original meal name
+      - ingredients / macros: copies, only with `details` and when present
     """
     out: list[dict] = []
     for m in meals or []:
@@ -65,7 +67,13 @@ def _snapshot_meal_list(meals: list[dict]) -> list[dict]:
             key = (m.get("key") or "").strip()
             if not key:
                 key = normalize_meal_key(name)
-        out.append({"key": key, "name": name})
+        item: dict = {"key": key, "name": name}
+        if details and isinstance(m, dict):
+            if isinstance(m.get("ingredients"), list):
+                item["ingredients"] = [dict(ing) if isinstance(ing, dict) else ing for ing in m["ingredients"]]
+            if isinstance(m.get("macros"), dict):
+                item["macros"] = dict(m["macros"])
+        out.append(item)
     return out
 
 
@@ -85,7 +93,7 @@ def build_nutrition_version_v1(
     return {
         "version": version,
         "targets": targets,
-        "accepted_meals": _snapshot_meal_list(accepted_meals or []),
+        "accepted_meals": _snapshot_meal_list(accepted_meals or [], details=True),
         "rejected_meals": _snapshot_meal_list(rejected_meals or []),
         "constraints_snapshot": dict(constraints_snapshot) if constraints_snapshot is not None else {},
     }
@@ -0,0 +1,65 @@
+# apps/backend/services/pagination.py
+"""
+Opaque keyset cursors for id-ordered listings.
+
+A cursor encodes a direction ("before" = older ids, "after" = newer ids) and
+the boundary id. Clients must treat it as an opaque string.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import Optional, Tuple
+
+_DIRECTIONS = {"b": "before", "a": "after"}
+
+
+def encode_cursor(direction: str, boundary_id: int) -> str:
+    payload = json.dumps({direction[0]: int(boundary_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Return (direction, boundary_id). Raises ValueError on malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        (key, value), = data.items()
+        return _DIRECTIONS[key], int(value)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def resolve_keyset(
+    cursor: Optional[str],
+    before_id: Optional[int],
+    after_id: Optional[int],
+) -> Tuple[Optional[int], Optional[int]]:
+    """Merge an opaque cursor with explicit before_id/after_id params."""
+    if cursor:
+        direction, boundary = decode_cursor(cursor)
+        if direction == "before":
+            before_id = boundary
+        else:
+            after_id = boundary
+    if before_id is not None and after_id is not None:
+        raise ValueError("Use either before_id or after_id, not both")
+    return before_id, after_id
+
+
+def page_cursors(
+    items: list,
+    has_more: bool,
+    before_id: Optional[int],
+    after_id: Optional[int],
+    id_key: str = "id",
+) -> Tuple[Optional[str], Optional[str]]:
+    """(next_cursor, prev_cursor) for a newest-first page."""
+    if not items:
+        return None, None
+    first, last = items[0][id_key], items[-1][id_key]
+    if after_id is not None:
+        return encode_cursor("before", last), (encode_cursor("after", first) if has_more else None)
+    next_cursor = encode_cursor("before", last) if has_more else None
+    prev_cursor = encode_cursor("after", first) if before_id is not None else None
+    return next_cursor, prev_cursor
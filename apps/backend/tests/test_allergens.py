@@ -51,3 +51,50 @@ def test_diet_enforcement_requires_every_ingredient_to_have_required_tag():
 
     assert reason is not None
     assert "diet_conflict" in reason
+
+
+def test_mask_overlap_matches_set_overlap_including_overflow_bit():
+    from services.nutrition.allergens import OVERFLOW_BIT, allergen_mask, masks_overlap, token_mask
+
+    blocked = build_allergen_set(["dairy", "tree nuts"])
+    assert masks_overlap(token_mask({"dairy", "rice"}), {"dairy", "rice"}, allergen_mask(blocked), blocked)
+    assert not masks_overlap(token_mask({"rice"}), {"rice"}, allergen_mask(blocked), blocked)
+
+    # Tokens past the bit budget share OVERFLOW_BIT; the set check keeps it exact.
+    assert not masks_overlap(OVERFLOW_BIT, {"odd a"}, OVERFLOW_BIT, {"odd b"})
+    assert masks_overlap(OVERFLOW_BIT, {"odd a"}, OVERFLOW_BIT, {"odd a"})
+
+
+def test_rejection_reason_strings_are_unchanged():
+    meal = {
+        "ingredients": [
+            {"name": "tofu", "contains": ["Soy"], "diet_tags": ["Vegan"], "is_compound": False},
+            {"name": "cheese", "contains": ["dairy"], "diet_tags": ["vegetarian"], "is_compound": False},
+        ]
+    }
+
+    assert meal_rejection_reason(meal, {"soy"}) == "Rejected: allergy_conflict blocked_by=['soy']"
+    assert meal_rejection_reason(meal, set(), {"vegan"}) == (
+        "Rejected: diet_conflict requires_one_of=['vegan'] ingredient_has=['vegetarian']"
+    )
+    assert meal_rejection_reason(meal, set(), {"vegetarian"}) is None
+    meal["ingredients"][0]["contains"] = ["!!"]
+    assert meal_rejection_reason(meal, set()) == "Rejected: invalid_contains_list"
+
+
+def test_token_bits_are_frozen_to_library_tokens():
+    from services.nutrition import allergens
+
+    before = dict(allergens._TOKEN_BITS)
+    blocked = build_allergen_set([f"made up food {i}" for i in range(600)] + ["nuts"])
+    mask = allergens.allergen_mask(blocked)
+
+    assert dict(allergens._TOKEN_BITS) == before
+    assert allergens.token_bit("made up food 7") == allergens.OVERFLOW_BIT
+    assert allergens.token_bit("tree nut") not in (0, allergens.OVERFLOW_BIT)
+
+    # unknown request tokens share a bit but never match each other
+    rice = {"ingredients": [{"name": "x", "contains": ["made up food 9999"], "diet_tags": ["vegan"], "is_compound": False}]}
+    assert meal_rejection_reason(rice, blocked, blocked_mask=mask) is None
+    rice["ingredients"][0]["contains"] = ["made up food 7"]
+    assert meal_rejection_reason(rice, blocked, blocked_mask=mask) is not None
@@ -0,0 +1,39 @@
+from services.nutrition.calorie_solver import Adjustable, solve_calorie_close
+from services.nutrition.stub_meals import _meal_macros_from_pantry, _multi_meal_calorie_close_carbs, _sum_macros
+
+
+def _adj(meal, grams, kcal=1.3, step=500.0, cap=1000.0):
+    return Adjustable(meal=meal, ingredient=0, grams=grams, kcal_per_g=kcal, max_step_g=step, max_g=cap)
+
+
+def test_first_adjustable_absorbs_whole_gap():
+    assert solve_calorie_close([_adj(1, 200), _adj(0, 200)], delta_kcal=260.0, tolerance_kcal=10.0) == {(1, 0): 400}
+
+
+def test_caps_spill_the_remainder_to_later_adjustables():
+    changes = solve_calorie_close([_adj(1, 900), _adj(0, 100)], delta_kcal=1300.0, tolerance_kcal=10.0)
+    # meal 1 hits its 1000 g ceiling (+130 kcal); meal 0 takes the rest, capped by the per-step limit
+    assert changes == {(1, 0): 1000, (0, 0): 600}
+
+
+def test_within_tolerance_is_a_no_op():
+    assert solve_calorie_close([_adj(0, 200)], delta_kcal=40.0, tolerance_kcal=100.0) == {}
+
+
+def test_grams_never_go_negative():
+    assert solve_calorie_close([_adj(0, 100)], delta_kcal=-5000.0, tolerance_kcal=10.0) == {(0, 0): 0}
+
+
+def test_day_closes_in_one_solve():
+    meals = [
+        {"ingredients": [{"name": "chicken breast, cooked", "grams": 150}, {"name": "Rice", "grams": 150}]},
+        {"ingredients": [{"name": "oats, dry", "grams": 60}, {"name": "banana", "grams": 100}]},
+    ]
+    for m in meals:
+        m["macros"] = _meal_macros_from_pantry(m["ingredients"])
+
+    _multi_meal_calorie_close_carbs(meals, target_cals=2000.0, tolerance_cals=20.0)
+
+    assert abs(_sum_macros(meals)["calories"] - 2000.0) <= 20.0
+    for m in meals:
+        assert m["macros"] == _meal_macros_from_pantry(m["ingredients"])
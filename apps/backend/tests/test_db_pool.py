@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from services import db
+from services.db_pool import ConnectionPool
+
+
+@pytest.fixture()
+def pool(tmp_path):
+    p = ConnectionPool(lambda: tmp_path / "pool_test.db", size=1)
+    try:
+        yield p
+    finally:
+        p.close_all()
+
+
+def test_same_thread_reuses_one_connection(pool):
+    with pool.connection() as first:
+        first.execute("CREATE TABLE t(x INTEGER)")
+    with pool.connection() as second:
+        second.execute("INSERT INTO t(x) VALUES (1)")
+
+    assert first is second
+    stats = pool.stats()
+    assert stats["opened"] == 1
+    assert stats["reused"] == 1
+    assert stats["open"] == 1
+
+
+def test_pragmas_applied_once_per_connection(pool):
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_error_rolls_back_and_returns_connection(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t(x INTEGER)")
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t(x) VALUES (1)")
+            raise RuntimeError("boom")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_nested_lease_commits_once_at_outermost_exit(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t(x INTEGER)")
+
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO t(x) VALUES (1)")
+        with pool.connection() as inner:
+            assert inner is outer
+        assert outer.in_transaction
+    assert not outer.in_transaction
+
+
+def test_threads_beyond_size_get_overflow_connections(pool):
+    with pool.connection():
+        pass
+    seen: list[bool] = []
+
+    def worker():
+        lease = pool.connection()
+        seen.append(lease._overflow)
+        lease.close()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    stats = pool.stats()
+    assert seen == [True]
+    assert stats["overflow"] == 1
+    assert stats["open"] == 1
+
+
+def test_db_helpers_share_the_module_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "helpers.db")
+    db.init_db()
+    before = db.pool_stats()
+
+    db.add_log("Bench Press", 8, 80.0, 2, "upper")
+    db.get_logs()
+
+    after = db.pool_stats()
+    assert after["leases"] - before["leases"] == 2
+    assert after["opened"] == before["opened"]
+
+
+def test_close_all_counts_other_threads_connections_as_abandoned(tmp_path):
+    pool = ConnectionPool(lambda: tmp_path / "pool_test.db", size=2)
+    release = threading.Event()
+    leased = threading.Event()
+
+    def worker():
+        with pool.connection():
+            pass
+        leased.set()
+        release.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    leased.wait()
+    with pool.connection():
+        pass
+
+    pool.close_all()
+    release.set()
+    thread.join()
+
+    stats = pool.stats()
+    assert stats["closed"] == 1
+    assert stats["abandoned"] == 1
+    assert stats["open"] == 0
@@ -0,0 +1,87 @@
+import pytest
+
+from routes.rules.exercise_catalog import EXERCISES, KIND_COMPOUND
+from routes.rules.exercise_index import (
+    EQ_BARBELL,
+    EQ_BODYWEIGHT,
+    EQ_CABLE,
+    EQ_DUMBBELL,
+    EQ_MACHINE,
+    _BARBELL_TOKENS,
+    _BODYWEIGHT_TOKENS,
+    _CABLE_TOKENS,
+    _DUMBBELL_TOKENS,
+    _MACHINE_TOKENS,
+    _classify_uncached_name,
+    classify,
+)
+from routes.rules.engine import CHEST_COMPOUND, LATERAL, TRI_OVERHEAD, _expand_focus_set
+
+
+def _scan_bits(name: str) -> int:
+    """The substring rules the index replaces, spelled out the slow way."""
+    n = (name or "").strip().lower()
+    canon = next((k for k in EXERCISES if k.lower() == n), None)
+    tags = EXERCISES[canon].tags if canon else ()
+    bits = 0
+    if "machine" in tags or any(t in n for t in _MACHINE_TOKENS):
+        bits |= EQ_MACHINE
+    if "cable" in tags or any(t in n for t in _CABLE_TOKENS):
+        bits |= EQ_CABLE
+    if "dumbbell" in tags or any(t in n for t in _DUMBBELL_TOKENS):
+        bits |= EQ_DUMBBELL
+    if "bodyweight" in tags or any(t in n for t in _BODYWEIGHT_TOKENS):
+        bits |= EQ_BODYWEIGHT
+    if not ("dumbbell" in n or "db " in f"{n} ") and any(t in n for t in _BARBELL_TOKENS):
+        bits |= EQ_BARBELL
+    return bits
+
+
+NAMES = list(EXERCISES) + CHEST_COMPOUND + LATERAL + TRI_OVERHEAD + [
+    "  lat pulldown ", "Lateral Raises (DB)", "Mystery Move", "", "db row", "EZ Bar Curl",
+]
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_classify_matches_substring_rules(name):
+    cls = classify(name)
+    assert cls.equipment == _scan_bits(name)
+    canon = cls.canon
+    if canon is not None:
+        meta = EXERCISES[canon]
+        assert canon.lower() == name.strip().lower()
+        assert (cls.kind, cls.region, cls.tags) == (meta.kind, meta.region, meta.tags)
+    else:
+        assert name.strip().lower() not in {k.lower() for k in EXERCISES}
+        assert cls.tags == () and cls.kind is None
+
+
+def test_focus_tags_match_expanded_focus_sets():
+    for focus in (["legs"], ["back"], ["shoulders"], ["arms"], ["core"], ["chest", "calves"], ["lats"]):
+        expanded = _expand_focus_set(focus)
+        wanted = {m.lower() for m in focus}
+        for name in EXERCISES:
+            cls = classify(name)
+            assert bool(wanted & cls.focus_tags) == any(t in expanded for t in cls.tags), (focus, name)
+
+
+def test_allowed_for_equipment_masks():
+    assert classify("Push-Ups").allowed_for("bodyweight")
+    assert not classify("Lat Pulldown").allowed_for("bodyweight")
+    assert classify("Goblet Squat").allowed_for("dumbbells")
+    assert classify("Pull Ups").allowed_for("dumbbells")
+    assert not classify("Barbell Back Squat").allowed_for("dumbbells")
+    assert classify("Barbell Back Squat").allowed_for("full_gym")
+    assert classify("Barbell Back Squat").is_compound
+    assert classify("Barbell Back Squat").kind == KIND_COMPOUND
+
+
+def test_catalog_names_are_precompiled_and_others_cached():
+    _classify_uncached_name.cache_clear()
+    classify("Lat Pulldown")
+    classify("lat pulldown")
+    assert _classify_uncached_name.cache_info().currsize == 0
+
+    first = classify("Cable Overhead Triceps Extension")
+    assert classify("Cable Overhead Triceps Extension") is first
+    assert _classify_uncached_name.cache_info().hits == 1
@@ -0,0 +1,57 @@
+import pytest
+
+from services import db
+
+
+@pytest.fixture()
+def fresh_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "exercise_latest.db")
+    db.init_db()
+
+
+def _summary(name):
+    with db._conn() as conn:
+        return [
+            r["reps"]
+            for r in conn.execute(
+                "SELECT reps FROM exercise_latest WHERE name = ? ORDER BY timestamp DESC, log_id DESC",
+                (name,),
+            )
+        ]
+
+
+def test_insert_trigger_keeps_newest_sets(fresh_db):
+    db.add_logs_bulk([("Squat", reps, 100.0, 2, "lower") for reps in range(1, 9)])
+    db.add_log("Bench Press", 5, 80.0, 2, "upper")
+
+    assert _summary("Squat") == [8, 7, 6, 5, 4][: db.EXERCISE_LATEST_DEPTH]
+    assert _summary("Bench Press") == [5]
+
+
+def test_delete_and_update_refill_from_logs(fresh_db):
+    ids = db.add_logs_bulk([("Squat", reps, 100.0, 2, None) for reps in range(1, 9)])
+    with db._conn() as conn:
+        conn.execute("DELETE FROM logs WHERE id = ?", (ids[-1],))
+        conn.execute("UPDATE logs SET name = 'Front Squat' WHERE id = ?", (ids[-2],))
+
+    assert _summary("Squat") == [6, 5, 4, 3, 2]
+    assert _summary("Front Squat") == [7]
+
+
+def test_latest_by_exercise_matches_full_scan(fresh_db):
+    rows = [(name, reps, 50.0 + reps, 1, None) for reps in range(10) for name in ("Row", "Curl")]
+    db.add_logs_bulk(rows)
+
+    for n in (1, 3, db.EXERCISE_LATEST_DEPTH, db.EXERCISE_LATEST_DEPTH + 2):
+        latest = db.get_latest_by_exercise(n)
+        assert list(latest) == ["Curl", "Row"]
+        assert [s["reps"] for s in latest["Row"]] == list(range(9, 9 - n, -1))
+
+
+def test_recent_sets_map_respects_window_and_cap(fresh_db):
+    ids = db.add_logs_bulk([("Deadlift", reps, 140.0, 1, None) for reps in range(1, 5)])
+    with db._conn() as conn:
+        conn.execute("UPDATE logs SET timestamp = '2000-01-01 00:00:00' WHERE id = ?", (ids[0],))
+
+    assert [s["reps"] for s in db.get_recent_sets_map(days=14)["Deadlift"]] == [4, 3, 2]
+    assert [s["reps"] for s in db.get_recent_sets_map(days=14, limit_per_exercise=2)["Deadlift"]] == [4, 3]
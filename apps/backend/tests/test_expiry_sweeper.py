@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from deps import get_current_user
+from main import app
+from services import db
+from services.maintenance import ExpirySweeper
+
+
+def _ts(delta: timedelta) -> str:
+    return (datetime.now(timezone.utc) + delta).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@pytest.fixture()
+def temp_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "sweeper.db")
+    db.init_db()
+
+
+def _seed() -> int:
+    past, future = _ts(timedelta(minutes=-5)), _ts(timedelta(days=1))
+    with db._conn() as conn:
+        user_id = conn.execute("INSERT INTO users(email) VALUES ('sweep@example.com')").lastrowid
+        conn.executemany(
+            "INSERT INTO sessions(token, user_id, expires_at) VALUES (?, ?, ?)",
+            [("expired", user_id, past), ("live", user_id, future)],
+        )
+        conn.executemany(
+            "INSERT INTO login_codes(email, code_hash, expires_at, used) VALUES ('sweep@example.com', 'h', ?, ?)",
+            [(past, 0), (future, 1), (future, 0)],
+        )
+        for table in ("email_verification_tokens", "password_reset_tokens"):
+            conn.executemany(
+                f"INSERT INTO {table}(user_id, token_hash, expires_at) VALUES (?, 'h', ?)",
+                [(user_id, past), (user_id, future)],
+            )
+    return user_id
+
+
+def test_purge_expired_rows_counts_per_table(temp_db):
+    _seed()
+
+    counts = db.purge_expired_rows()
+
+    assert counts == {
+        "sessions": 1,
+        "login_codes": 2,
+        "email_verification_tokens": 1,
+        "password_reset_tokens": 1,
+    }
+    assert db.purge_expired_rows() == {k: 0 for k in counts}
+
+
+def test_sweeper_records_stats(temp_db):
+    _seed()
+    sweeper = ExpirySweeper(interval_seconds=60)
+
+    sweeper.run_once()
+    sweeper.run_once()
+
+    stats = sweeper.stats()
+    assert stats["runs"] == 2
+    assert stats["last_counts"]["sessions"] == 0
+    assert stats["total_deleted"]["login_codes"] == 2
+    assert stats["last_duration_ms"] is not None
+
+
+def test_sweeper_records_failures():
+    def boom():
+        raise RuntimeError("locked")
+
+    sweeper = ExpirySweeper(interval_seconds=60, purge=boom)
+    with pytest.raises(RuntimeError):
+        sweeper.run_once()
+
+    assert sweeper.stats()["errors"] == 1
+    assert sweeper.stats()["last_error"] == "locked"
+
+
+def test_sweeper_runs_on_lifespan():
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1, "email": "pytest@example.com"}
+    try:
+        with TestClient(app) as client:
+            body = client.get("/health/details").json()
+    finally:
+        app.dependency_overrides.clear()
+    assert body["expiry_sweeper"]["running"] is True
+    assert "last_error" not in body["expiry_sweeper"]
+
+
+def test_public_health_hides_internal_stats():
+    with TestClient(app) as client:
+        body = client.get("/health").json()
+        details = client.get("/health/details")
+    assert set(body) == {"status", "db", "version"}
+    assert details.status_code == 401
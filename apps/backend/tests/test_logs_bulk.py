@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import routes.logs as logs_routes
+from main import app
+from services import db
+
+
+@pytest.fixture()
+def logs_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "logs_bulk.db")
+    db.init_db()
+    return TestClient(app)
+
+
+def _set(name: str, reps: int = 8) -> dict:
+    return {"name": name, "reps": reps, "weight_kg": 60.0, "rir": 2, "focus": "upper"}
+
+
+def test_bulk_insert_returns_ids_in_order(logs_client):
+    db.add_log("Warmup", 10, 20.0, 4)
+    payload = [_set(f"Set {i}") for i in range(30)]
+
+    response = logs_client.post("/logs/bulk", json=payload)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["errors"] == []
+    assert [it["index"] for it in body["inserted"]] == list(range(30))
+    rows = {r["id"]: r["name"] for r in db.get_logs()}
+    assert [rows[it["id"]] for it in body["inserted"]] == [f"Set {i}" for i in range(30)]
+
+
+def test_bulk_reports_per_item_errors(logs_client):
+    payload = [_set("Good A"), {"name": "Bad", "reps": "lots"}, _set("Good B")]
+
+    body = logs_client.post("/logs/bulk", json=payload).json()
+
+    assert [it["index"] for it in body["inserted"]] == [0, 2]
+    assert [e["index"] for e in body["errors"]] == [1]
+    assert {tuple(err["loc"]) for err in body["errors"][0]["errors"]} >= {("reps",), ("weight_kg",)}
+    assert len(db.get_logs()) == 2
+
+
+def test_bulk_rejects_oversized_batches(logs_client, monkeypatch):
+    monkeypatch.setattr(logs_routes, "LOGS_BULK_MAX_ITEMS", 2)
+
+    response = logs_client.post("/logs/bulk", json=[_set("A"), _set("B"), _set("C")])
+
+    assert response.status_code == 413
+    assert db.get_logs() == []
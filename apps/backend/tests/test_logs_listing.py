@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import routes.logs as logs_routes
+from main import app
+from services import db
+
+
+@pytest.fixture()
+def logs_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "logs_listing.db")
+    db.init_db()
+    return TestClient(app)
+
+
+def _seed(n: int = 12):
+    ids = db.add_logs_bulk(
+        [(("Squat" if i % 2 else "Bench Press"), 5, 100.0 + i, 2, ("lower" if i % 2 else "upper")) for i in range(n)]
+    )
+    # Spread timestamps one day apart so time-range filters have something to cut.
+    with db._conn() as conn:
+        for day, log_id in enumerate(ids, start=1):
+            conn.execute(
+                "UPDATE logs SET timestamp = ? WHERE id = ?",
+                (f"2026-01-{day:02d} 12:00:00", log_id),
+            )
+    return ids
+
+
+def test_cursor_walk_returns_every_log_once(logs_client):
+    ids = _seed(12)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        body = logs_client.get("/logs/", params=params).json()
+        seen.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_filters_are_combined(logs_client):
+    _seed(12)
+    body = logs_client.get(
+        "/logs/",
+        params={"name": "Squat", "since": "2026-01-04T00:00:00", "until": "2026-01-10T00:00:00", "limit": 10},
+    ).json()
+    assert [(r["name"], r["timestamp"][:10]) for r in body["items"]] == [
+        ("Squat", "2026-01-08"),
+        ("Squat", "2026-01-06"),
+        ("Squat", "2026-01-04"),
+    ]
+    focus = logs_client.get("/logs/", params={"focus": "upper", "limit": 10}).json()["items"]
+    assert focus and {r["focus"] for r in focus} == {"upper"}
+
+
+def test_unpaged_request_keeps_legacy_list_shape(logs_client):
+    ids = _seed(12)
+    rows = logs_client.get("/logs/").json()
+    assert isinstance(rows, list)
+    assert [r["id"] for r in rows] == sorted(ids, reverse=True)
+    assert set(rows[0]) == {"id", "name", "reps", "weight_kg", "rir", "focus", "timestamp"}
+
+    squats = logs_client.get("/logs/", params={"name": "Squat"}).json()
+    assert [r["id"] for r in squats] == sorted(ids[1::2], reverse=True)
+
+
+def test_focus_filter_uses_index(logs_client):
+    with db._conn() as conn:
+        plan = " ".join(
+            r["detail"]
+            for r in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM logs WHERE focus = ? AND id < ? ORDER BY id DESC LIMIT 5",
+                ("upper", 100),
+            )
+        )
+    assert "idx_logs_focus_id" in plan
+
+
+def test_name_filter_pages_without_temp_sort(logs_client):
+    with db._conn() as conn:
+        plan = " ".join(
+            r["detail"]
+            for r in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM logs WHERE name = ? AND id < ? ORDER BY id DESC LIMIT 5",
+                ("Squat", 100),
+            )
+        )
+    assert "idx_logs_name_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_export_streams_ndjson_and_csv(logs_client, monkeypatch):
+    ids = _seed(7)
+    monkeypatch.setattr(logs_routes, "LOGS_EXPORT_CHUNK_SIZE", 3)
+
+    ndjson = logs_client.get("/logs/export", params={"format": "ndjson"})
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [r["id"] for r in rows] == sorted(ids, reverse=True)
+
+    exported = logs_client.get("/logs/export", params={"format": "csv", "focus": "lower"})
+    table = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [int(r["id"]) for r in table] == sorted(ids[1::2], reverse=True)
+    assert {r["name"] for r in table} == {"Squat"}
+
+
+def test_bad_cursor_is_rejected(logs_client):
+    assert logs_client.get("/logs/", params={"cursor": "nope"}).status_code == 400
@@ -0,0 +1,102 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import FrozenInstanceError
+from types import SimpleNamespace
+
+import pytest
+
+from services.nutrition.ingredients_pantry import INGREDIENT_PANTRY_PER_100G
+from services.nutrition.meal_library import MEAL_LIBRARY
+from services.nutrition.stub_meals import (
+    MEAL_INDEX,
+    PANTRY_KEYS,
+    _canonical_pantry_key,
+    _deterministic_pick_for_slot,
+    _meal_macros_from_pantry,
+    _round1,
+    generate_stub_meals,
+)
+
+
+def _req(goal: str, calories: int = 2400, diet=None, allergies=()):
+    return SimpleNamespace(
+        diet=diet,
+        allergies=list(allergies),
+        target_calories=calories,
+        meals_needed=4,
+        batch_size=4,
+        targets={goal: {"1": calories}} if goal != "maintenance" else {"maintenance": calories},
+    )
+
+
+def test_index_covers_library_and_is_frozen():
+    assert len(MEAL_INDEX) == len(MEAL_LIBRARY)
+    entry = MEAL_INDEX[0]
+    assert entry.template is MEAL_LIBRARY[0]
+    assert dict(entry.base_macros) == _meal_macros_from_pantry(MEAL_LIBRARY[0]["ingredients"])
+    with pytest.raises(FrozenInstanceError):
+        entry.key = "other"
+    with pytest.raises(TypeError):
+        entry.base_macros["calories"] = 0.0
+
+
+def test_generation_does_not_mutate_library():
+    before = copy.deepcopy(MEAL_LIBRARY)
+    for goal in ("cut", "bulk", "maintenance"):
+        generate_stub_meals(_req(goal), attempt=1)
+    assert MEAL_LIBRARY == before
+
+
+def test_concurrent_goals_match_sequential_results():
+    reqs = [_req(goal, calories) for goal in ("cut", "bulk", "maintenance") for calories in (1800, 2600, 3200)]
+    expected = [generate_stub_meals(r, attempt=1) for r in reqs]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        got = list(pool.map(lambda r: generate_stub_meals(r, attempt=1), reqs * 4))
+
+    assert got == expected * 4
+
+
+def _naive_macros(ingredients):
+    p = c = f = 0.0
+    for ing in ingredients:
+        per100 = INGREDIENT_PANTRY_PER_100G.get(_canonical_pantry_key(ing["name"]))
+        grams = float(ing.get("grams", 0.0))
+        if not per100 or grams <= 0:
+            continue
+        factor = grams / 100.0
+        p += per100["protein_g"] * factor
+        c += per100["carbs_g"] * factor
+        f += per100["fat_g"] * factor
+    return {"calories": _round1(p * 4 + c * 4 + f * 9), "protein_g": _round1(p), "carbs_g": _round1(c), "fat_g": _round1(f)}
+
+
+def test_compiled_pantry_matches_dict_lookups():
+    assert set(PANTRY_KEYS) == set(INGREDIENT_PANTRY_PER_100G)
+    for entry in MEAL_INDEX:
+        assert dict(entry.base_macros) == _naive_macros(entry.template["ingredients"])
+        assert len(entry.pantry_rows) == len(entry.template["ingredients"])
+
+
+def test_unknown_ingredients_are_reported_and_skipped():
+    meta: dict = {}
+    macros = _meal_macros_from_pantry(
+        [{"name": "Rice", "grams": 100}, {"name": "Dragonfruit Foam", "grams": 50}, {"name": "Mystery", "grams": 0}],
+        debug_meta=meta,
+    )
+    assert macros == _naive_macros([{"name": "white rice, cooked", "grams": 100}])
+    assert meta == {"missing_ingredients": ["dragonfruit foam"]}
+
+
+@pytest.mark.parametrize("slot", ["breakfast", "lunch", "snack"])
+@pytest.mark.parametrize("goal", ["maintenance", "cut", "bulk"])
+def test_single_pick_matches_full_sort(slot, goal):
+    templates = [e.template for e in MEAL_INDEX]
+    ranking = {e.key: (float(e.base_macros["protein_g"]) + float(e.base_macros["carbs_g"]), float(e.base_macros["fat_g"])) for e in MEAL_INDEX}
+    # flat scores force hash tie-breaks for the non-snack slots too
+    flat = {k: (0.0, 0.0) for k in ranking}
+    for seed in ("a", "b|slot=x|i=0", "diet=None|attempt=3"):
+        for scores in (ranking, flat):
+            one = _deterministic_pick_for_slot(templates, seed, 1, slot=slot, goal=goal, ranking=scores)
+            many = _deterministic_pick_for_slot(templates, seed, 3, slot=slot, goal=goal, ranking=scores)
+            assert one == many[:1]
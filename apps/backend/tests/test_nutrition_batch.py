@@ -0,0 +1,156 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import routes.nutrition as nutrition_routes
+from services import db
+from services.nutrition import batch
+from services.nutrition.batch import run_batch
+
+
+@pytest.fixture()
+def batch_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "nutrition_batch.db")
+
+
+def make_targets(maintenance: int):
+    return {
+        "maintenance": maintenance,
+        "cut": {"0.5": maintenance - 250, "1": maintenance - 500, "2": maintenance - 1000},
+        "bulk": {"0.5": maintenance + 250, "1": maintenance + 500, "2": maintenance + 1000},
+    }
+
+
+def _item(calories: int = 2400, diet=None) -> dict:
+    return {
+        "targets": make_targets(calories),
+        "target_calories": calories,
+        "diet": diet,
+        "allergies": [],
+        "meals_needed": 4,
+        "max_attempts": 3,
+        "batch_size": 4,
+    }
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_batch_streams_each_plan_then_saves_all(batch_db, client):
+    items = [_item(2000), _item(2600, diet="vegan")]
+
+    r = client.post("/nutrition/generate/batch", json={"items": items})
+
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(r)
+    results, final = lines[:-1], lines[-1]
+    assert sorted(x["index"] for x in results) == [0, 1]
+    assert all(x["ok"] for x in results)
+    assert final["done"] is True
+    assert len(final["plan_ids"]) == 2
+
+    single = client.post("/nutrition/generate", json=items[1]).json()
+    by_index = {x["index"]: x for x in results}
+    assert by_index[1]["output"] == single["output"]
+    plan = client.get(f"/nutrition/plans/{final['plan_ids'][0]}").json()
+    assert json.loads(plan["output_json"]) == by_index[0]["output"]
+
+
+def test_batch_days_plans_one_item_per_day(batch_db, client):
+    r = client.post("/nutrition/generate/batch", json={"items": [_item()], "days": 3})
+
+    lines = _lines(r)
+    assert sorted(x["day"] for x in lines[:-1]) == [1, 2, 3]
+    by_day = {x["day"]: {m["template_key"] for m in x["output"]["accepted"]} for x in lines[:-1]}
+    assert not by_day[1] & by_day[2]  # scheduled for variety, not re-seeded copies
+    titles = [client.get(f"/nutrition/plans/{pid}").json()["title"] for pid in lines[-1]["plan_ids"]]
+    assert [t.rsplit(" · ", 1)[1] for t in titles] == ["day 1", "day 2", "day 3"]
+
+
+def test_batch_validation(batch_db, client, monkeypatch):
+    r = client.post("/nutrition/generate/batch", json={"items": [_item(), _item()], "days": 2})
+    assert r.status_code == 422
+
+    monkeypatch.setattr(nutrition_routes, "NUTRITION_BATCH_MAX_ITEMS", 2)
+    r = client.post("/nutrition/generate/batch", json={"items": [_item()], "days": 3})
+    assert r.status_code == 413
+
+
+def test_run_batch_process_pool_matches_inline():
+    jobs = [(_item(1800 + 200 * i), 0, None) for i in range(4)]
+
+    inline = dict(run_batch(nutrition_routes._batch_job, jobs, process_threshold=100))
+    with ProcessPoolExecutor(max_workers=2, mp_context=batch._mp_context()) as pool:
+        pooled = dict(run_batch(nutrition_routes._batch_job, jobs, process_threshold=2, pool=pool))
+
+    assert pooled == inline
+    assert all(r["ok"] for r in pooled.values())
+
+
+def test_run_batch_shares_one_pool_across_calls(monkeypatch):
+    monkeypatch.setattr(batch, "NUTRITION_BATCH_WORKERS", 2)
+    jobs = [(_item(1800 + 200 * i), 0, None) for i in range(2)]
+    try:
+        first = dict(run_batch(nutrition_routes._batch_job, jobs, process_threshold=2))
+        pool = batch.start_batch_pool()
+        assert dict(run_batch(nutrition_routes._batch_job, jobs, process_threshold=2)) == first
+        assert batch.start_batch_pool() is pool
+    finally:
+        batch.shutdown_batch_pool()
+
+
+def test_batch_job_errors_become_lines(batch_db, client, monkeypatch):
+    real = nutrition_routes._generate_plan
+
+    def flaky(req, day_meals=None):
+        if req.target_calories == 2000:
+            raise RuntimeError("boom")
+        return real(req, day_meals=day_meals)
+
+    monkeypatch.setattr(nutrition_routes, "_generate_plan", flaky)
+    r = client.post("/nutrition/generate/batch", json={"items": [_item(2000), _item(2600)]})
+
+    assert r.status_code == 200
+    lines = _lines(r)
+    by_index = {x["index"]: x for x in lines[:-1]}
+    assert by_index[0] == {"index": 0, "ok": False, "status": 500, "detail": "Internal error: RuntimeError"}
+    assert by_index[1]["ok"] is True
+    assert lines[-1]["done"] is True
+    assert lines[-1]["plan_ids"][0] is None and lines[-1]["plan_ids"][1] is not None
+
+    bad = nutrition_routes._batch_job(({"targets": "nope"}, 0, None))
+    assert bad["ok"] is False and bad["status"] == 400
+
+
+def test_batch_saves_even_if_client_stops_reading(batch_db, client):
+    jobs = [(_item(1800 + 200 * i), 0, None) for i in range(3)]
+
+    def saved() -> int:
+        with db._conn() as conn:
+            return conn.execute("SELECT COUNT(*) FROM nutrition_plans WHERE owner_id = 1").fetchone()[0]
+
+    before = saved()
+    stream = nutrition_routes._batch_lines(jobs, 1, 1)
+    next(stream)
+    stream.close()
+
+    deadline = time.monotonic() + 5
+    while saved() < before + 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert saved() == before + 3
+
+
+def test_batch_reports_failed_save(batch_db, client, monkeypatch):
+    def broken(rows):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db, "add_nutrition_plans_bulk", broken)
+    r = client.post("/nutrition/generate/batch", json={"items": [_item(2000), _item(2600)]})
+
+    lines = _lines(r)
+    assert all(x["ok"] for x in lines[:-1])
+    assert lines[-1] == {"done": False, "error": "Saving plans failed: RuntimeError"}
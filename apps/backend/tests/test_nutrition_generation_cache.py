@@ -0,0 +1,76 @@
+import pytest
+
+from services import db
+from services.nutrition import generation_cache
+from services.nutrition.generate import GenerationRequest
+
+
+def make_targets(maintenance: int):
+    return {
+        "maintenance": maintenance,
+        "cut": {"0.5": maintenance - 250, "1": maintenance - 500, "2": maintenance - 1000},
+        "bulk": {"0.5": maintenance + 250, "1": maintenance + 500, "2": maintenance + 1000},
+    }
+
+
+@pytest.fixture()
+def isolated_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "generation_cache.db")
+    generation_cache.clear_generation_cache()
+    yield
+    generation_cache.clear_generation_cache()
+
+
+def _req(**overrides):
+    return {
+        "targets": make_targets(2600),
+        "target_calories": 2600,
+        "diet": None,
+        "allergies": ["Peanut"],
+        "meals_needed": 4,
+        "max_attempts": 3,
+        "batch_size": 4,
+        **overrides,
+    }
+
+
+def test_repeat_requests_hit_cache_and_still_save(isolated_db, client):
+    before = generation_cache.generation_cache_stats()
+
+    r1 = client.post("/nutrition/generate", json=_req())
+    r2 = client.post("/nutrition/generate", json=_req(allergies=[" peanut "]))
+
+    assert r1.status_code == r2.status_code == 200
+    b1, b2 = r1.json(), r2.json()
+    assert b1["output"] == b2["output"]
+    assert b1["plan_id"] != b2["plan_id"]
+
+    after = generation_cache.generation_cache_stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+
+def test_different_inputs_miss(isolated_db, client):
+    client.post("/nutrition/generate", json=_req())
+    before = generation_cache.generation_cache_stats()
+
+    client.post("/nutrition/generate", json=_req(diet="vegetarian"))
+
+    assert generation_cache.generation_cache_stats()["misses"] - before["misses"] == 1
+
+
+def test_cached_results_are_private_copies(isolated_db):
+    req = GenerationRequest(diet=None, allergies=[], meals_needed=1, max_attempts=1, batch_size=1)
+    key = generation_cache.generation_cache_key(req)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return generation_cache.GenerationResult(accepted=[{"name": "A"}], rejected=[], attempts_used=1)
+
+    first = generation_cache.cached_generation(key, compute)
+    first.accepted[0]["name"] = "mutated"
+    second = generation_cache.cached_generation(key, compute)
+
+    assert calls == [1]
+    assert second.accepted == [{"name": "A"}]
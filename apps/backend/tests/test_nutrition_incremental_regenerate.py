@@ -0,0 +1,159 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services.nutrition.stub_meals import generate_stub_meals, regenerate_stub_slots
+
+
+def make_targets(maintenance: int):
+    return {
+        "maintenance": maintenance,
+        "cut": {"0.5": maintenance - 250, "1": maintenance - 500, "2": maintenance - 1000},
+        "bulk": {"0.5": maintenance + 250, "1": maintenance + 500, "2": maintenance + 1000},
+    }
+
+
+def _req(**overrides):
+    base = dict(diet=None, allergies=[], target_calories=2400, meals_needed=4, batch_size=4, targets={})
+    base.update(overrides)
+    return SimpleNamespace(**base)
+
+
+def _prev(req):
+    return [{"key": f"meal_{i+1}_(attempt_1)", "name": m["name"]} for i, m in enumerate(generate_stub_meals(req, 1)["meals"])]
+
+
+def test_regenerate_stub_slots_keeps_locked_templates_and_avoids_them():
+    req = _req()
+    prev = _prev(req)
+    out = regenerate_stub_slots(req, prev, {1}, attempt=2)
+
+    names = [m["name"] for m in out["meals"]]
+    assert [names[i] for i in (0, 2, 3)] == [prev[i]["name"] for i in (0, 2, 3)]
+    assert names[1] not in {prev[i]["name"] for i in (0, 2, 3)}
+    assert out["meta"]["replaced"] == [1]
+    assert out["meta"]["forced_replace"] == []
+    assert abs(out["totals"]["calories"] - 2400) <= 150
+
+
+def test_regenerate_stub_slots_replaces_locked_meal_that_breaks_new_constraints():
+    prev = _prev(_req())
+    out = regenerate_stub_slots(_req(diet="vegan"), prev, set(), attempt=2)
+
+    forced = out["meta"]["forced_replace"]
+    assert forced  # the omnivore day has non-vegan meals
+    for i, m in enumerate(out["meals"]):
+        if i not in forced:
+            assert m["name"] == prev[i]["name"]
+
+
+def test_regenerate_stub_slots_rejects_bad_previous_length():
+    with pytest.raises(ValueError):
+        regenerate_stub_slots(_req(), [{"key": "k", "name": "x"}], {0}, attempt=2)
+
+
+def _generate(client, calories=2400, allergies=()):
+    r = client.post("/nutrition/generate", json={
+        "targets": make_targets(calories),
+        "target_calories": calories,
+        "diet": None,
+        "allergies": list(allergies),
+        "meals_needed": 4,
+        "max_attempts": 3,
+        "batch_size": 4,
+    })
+    assert r.status_code == 200
+    return r.json()["version_snapshot"]
+
+
+def _regen(prev, calories=2400, allergies=(), **extra):
+    return {
+        "prev_snapshot": prev,
+        "targets": make_targets(calories),
+        "target_calories": calories,
+        "diet": None,
+        "allergies": list(allergies),
+        "meals_needed": 4,
+        "max_attempts": 3,
+        "batch_size": 4,
+        **extra,
+    }
+
+
+def test_incremental_regenerate_route_only_touches_replaced_slots(client):
+    prev = _generate(client)
+    r = client.post("/nutrition/regenerate", json=_regen(prev, replace_slots=[2]))
+    assert r.status_code == 200
+    body = r.json()
+
+    meals = body["version_snapshot"]["accepted_meals"]
+    for i in (0, 1, 3):
+        assert meals[i] == prev["accepted_meals"][i]
+    assert meals[2]["key"] == "meal_3_(attempt_2)"
+    assert meals[2]["name"] != prev["accepted_meals"][2]["name"]
+    assert body["output"]["replaced_slots"] == [2]
+    assert [x["index"] for x in body["diff"].get("meals_replaced", [])] == [2]
+
+
+def test_regenerate_stub_slots_never_hands_back_the_replaced_meal():
+    for calories in (1800, 2400, 3000):
+        req = _req(target_calories=calories)
+        prev = _prev(req)
+        for i in range(len(prev)):
+            out = regenerate_stub_slots(req, prev, {i}, attempt=2)
+            assert out["meals"][i]["name"] != prev[i]["name"]
+
+
+@pytest.mark.parametrize("calories, allergies", [(2400, ["nuts"]), (1400, [])])
+def test_incremental_regenerate_route_allergy_and_low_calorie_targets(client, calories, allergies):
+    prev = _generate(client, calories, allergies)
+    for slot in range(len(prev["accepted_meals"])):
+        r = client.post(
+            "/nutrition/regenerate",
+            json=_regen(prev, calories, allergies, replace_slots=[slot]),
+        )
+        assert r.status_code == 200, r.text
+        output = r.json()["output"]
+        if output["replaced_slots"] == [slot]:
+            total = sum(m["macros"]["calories"] for m in output["accepted"])
+            assert abs(total - calories) <= 100
+        if allergies:
+            assert all(not {"tree_nut", "peanut"} & set(m["contains"]) for m in output["accepted"])
+
+
+def test_incremental_regenerate_route_lock_slots(client):
+    prev = _generate(client)
+    r = client.post("/nutrition/regenerate", json=_regen(prev, lock_slots=[0]))
+    assert r.status_code == 200
+    body = r.json()
+    assert body["version_snapshot"]["accepted_meals"][0] == prev["accepted_meals"][0]
+    assert body["output"]["replaced_slots"] == [1, 2, 3]
+
+
+def test_incremental_regenerate_keeps_locked_meals_exactly(client):
+    payload = _regen(None, calories=2600)
+    del payload["prev_snapshot"]
+    r = client.post("/nutrition/generate", json=payload)
+    assert r.status_code == 200
+    before = r.json()
+    prev = before["version_snapshot"]
+
+    r = client.post("/nutrition/regenerate", json=_regen(prev, calories=2600, lock_slots=[0, 1]))
+    assert r.status_code == 200
+    body = r.json()
+
+    assert body["output"]["replaced_slots"] == [2, 3]
+    for i in (0, 1):
+        kept = body["output"]["accepted"][i]
+        original = before["output"]["accepted"][i]
+        assert kept["ingredients"] == original["ingredients"]
+        assert kept["macros"] == original["macros"]
+        assert body["version_snapshot"]["accepted_meals"][i] == prev["accepted_meals"][i]
+
+
+def test_incremental_regenerate_route_validates_slots(client):
+    prev = _generate(client)
+    r = client.post("/nutrition/regenerate", json=_regen(prev, replace_slots=[9]))
+    assert r.status_code == 422
+    r = client.post("/nutrition/regenerate", json=_regen(prev, replace_slots=[0], lock_slots=[1]))
+    assert r.status_code == 422
@@ -0,0 +1,60 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from services.nutrition.stub_meals import generate_stub_days
+from services.nutrition.variety import VarietyRules, schedule_variety
+
+
+def _check_rules(plan, rules, gap=True):
+    counts = Counter(k for day in plan for k in day)
+    assert max(counts.values()) <= rules.max_repeats
+    last = {}
+    for d, day in enumerate(plan):
+        assert len(set(day)) == len(day)
+        for k in day:
+            if gap and k in last:
+                assert d - last[k] >= rules.min_gap_days
+            last[k] = d
+
+
+def test_schedule_respects_repeat_and_gap_rules():
+    orders = {"a": list("pqrstuvwxyz"), "b": list("qrsp") + list("tuvwxyz")}
+    rules = VarietyRules(max_repeats=2, min_gap_days=2)
+
+    plan = schedule_variety(["a", "b"], 5, orders, rules)
+
+    assert len(plan) == 5 and all(len(day) == 2 for day in plan)
+    _check_rules(plan, rules)
+    assert plan[0] == ["p", "q"]  # day one is the plain ranking
+
+
+def test_schedule_lookahead_keeps_scarce_slot_fed():
+    # Greedy alone hands "x" to slot a, leaving slot b only a relaxed pick.
+    orders = {"a": ["x", "y"], "b": ["x"]}
+    rules = VarietyRules(max_repeats=1, min_gap_days=1, lookahead=1)
+
+    assert schedule_variety(["a", "b"], 1, orders, rules) == [["y", "x"]]
+    greedy = schedule_variety(["a", "b"], 1, orders, VarietyRules(max_repeats=1, lookahead=0))
+    assert greedy == [["x", "x"]]  # relaxed as a last resort, never fails
+
+
+def test_schedule_rejects_empty_slot():
+    with pytest.raises(ValueError):
+        schedule_variety(["a"], 2, {"a": []})
+
+
+# vegan has 23 templates for 42 positions: the gap is the first rule relaxed
+@pytest.mark.parametrize("diet,gap", [(None, True), ("vegetarian", True), ("vegan", False)])
+def test_week_follows_variety_rules(diet, gap):
+    req = SimpleNamespace(diet=diet, allergies=[], target_calories=2800, meals_needed=6, batch_size=6, targets={})
+    rules = VarietyRules()
+
+    week = generate_stub_days(req, 7, attempt=1, rules=rules)
+
+    plan = [[m["key"] for m in day["meals"]] for day in week]
+    _check_rules(plan, rules, gap=gap)
+    assert [d["meta"]["day"] for d in week] == list(range(1, 8))
+    for day in week:
+        assert abs(day["totals"]["calories"] - 2800) <= 150
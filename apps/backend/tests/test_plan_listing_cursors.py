@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from deps import get_current_user
+from main import app
+from services import db
+from services.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture()
+def listing_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "listing.db")
+    db.init_db()
+    with db._conn() as conn:
+        conn.execute("INSERT INTO users(id, email) VALUES (1, 'me@example.com'), (2, 'other@example.com')")
+    plan_ids = [db.add_plan(f"Plan {i}", "{}", "{}", owner_id=1)["id"] for i in range(7)]
+    db.add_plan("Not mine", "{}", "{}", owner_id=2)
+    nutrition_ids = [db.add_nutrition_plan(f"N {i}", "{}", "{}", owner_id=1)["id"] for i in range(5)]
+    db.set_active_plan(1, plan_ids[2])
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1, "email": "me@example.com"}
+    try:
+        yield TestClient(app), plan_ids, nutrition_ids
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+
+def _walk(client, path, limit):
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get(path, params=params).json()
+        seen += body["items"]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen, pages, body
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("before", 42)) == ("before", 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_plans_cursor_walk_includes_active_plan(listing_client):
+    client, plan_ids, _ = listing_client
+
+    items, pages, last = _walk(client, "/plans", 3)
+
+    assert [it["plan_id"] for it in items] == list(reversed(plan_ids))
+    assert pages == 3
+    assert last["active_plan_id"] == plan_ids[2]
+
+
+def test_plans_prev_cursor_returns_newer_page(listing_client):
+    client, plan_ids, _ = listing_client
+    first = client.get("/plans", params={"limit": 3}).json()
+    second = client.get("/plans", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    back = client.get("/plans", params={"limit": 3, "cursor": second["prev_cursor"]}).json()
+
+    assert [it["plan_id"] for it in back["items"]] == [it["plan_id"] for it in first["items"]]
+    assert back["prev_cursor"] is None
+
+
+def test_empty_page_still_reports_active_plan(listing_client):
+    client, plan_ids, _ = listing_client
+
+    body = client.get("/plans", params={"before_id": min(plan_ids)}).json()
+
+    assert body["items"] == []
+    assert body["active_plan_id"] == plan_ids[2]
+
+
+def test_nutrition_plans_cursor_walk(listing_client):
+    client, _, nutrition_ids = listing_client
+
+    items, pages, _ = _walk(client, "/nutrition/plans", 2)
+
+    assert [it["id"] for it in items] == list(reversed(nutrition_ids))
+    assert pages == 3
+
+
+def test_bad_cursor_is_rejected(listing_client):
+    client, _, _ = listing_client
+
+    assert client.get("/plans", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/nutrition/plans", params={"before_id": 3, "after_id": 1}).status_code == 400
@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+from services import db
+from services.json_patch import apply_patch, make_patch
+
+
+@pytest.fixture()
+def temp_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "plan_versions.db")
+    monkeypatch.setattr(db, "PLAN_VERSION_KEYFRAME_INTERVAL", 5)
+    db.init_db()
+    db._PLAN_VERSION_CACHE.clear()
+    yield
+    db._PLAN_VERSION_CACHE.clear()
+
+
+def _input(n: int) -> dict:
+    return {
+        "goal": "hypertrophy",
+        "constraints_tokens": ["no_barbells"] if n % 2 else [],
+        "chat_history": [{"message": f"edit {i}", "patch": {}} for i in range(n)],
+    }
+
+
+def _output(n: int) -> dict:
+    return {
+        "title": "Plan",
+        "weekly_split": [
+            {"day": "Day 1", "main": [{"name": f"Press {n % 3}", "sets": 2}]},
+            {"day": "Day 2", "main": [{"name": "Row", "sets": 2 + (n % 2)}]},
+        ],
+    }
+
+
+def _make_plan(versions: int) -> int:
+    plan = db.add_plan("Delta", json.dumps(_input(0)), json.dumps(_output(0)), owner_id=None)
+    for v in range(2, versions + 1):
+        db.create_plan_version(plan["id"], v, _input(v - 1), _output(v - 1), diff={"n": v})
+    return plan["id"]
+
+
+def _storage(plan_id: int) -> dict[int, str]:
+    with db._conn() as conn:
+        rows = conn.execute(
+            "SELECT version, storage FROM plan_versions WHERE plan_id = ? ORDER BY version",
+            (plan_id,),
+        )
+        return {r["version"]: r["storage"] for r in rows}
+
+
+def test_json_patch_roundtrip():
+    src = {"a": [1, 2, 3], "b": {"x/y": 1, "t~": True}, "c": "gone"}
+    dst = {"a": [1, 5], "b": {"x/y": 2, "t~": 1}, "d": None}
+
+    patch = make_patch(src, dst)
+
+    assert apply_patch(json.loads(json.dumps(src)), patch) == dst
+    assert make_patch(dst, dst) == []
+
+
+@pytest.mark.parametrize(
+    "src, dst",
+    [
+        ({"b": 1, "c": 2}, {"a": 0, "b": 1, "c": 2}),  # new key first
+        ({"b": 1, "a": 2}, {"a": 2, "b": 1}),  # same items, reordered
+        ({"x": {"b": 1}, "y": [{"q": 1}]}, {"x": {"a": 0, "b": 1}, "y": [{"p": 0, "q": 1}], "z": 3}),
+        ({"a": 1}, {"a": 1, "z": 2}),  # plain append stays a single add
+    ],
+)
+def test_json_patch_roundtrip_preserves_key_order(src, dst):
+    patch = make_patch(src, dst)
+    rebuilt = apply_patch(json.loads(json.dumps(src)), patch)
+    assert json.dumps(rebuilt) == json.dumps(dst)
+
+
+def test_json_patch_appended_key_is_one_add():
+    assert make_patch({"a": 1}, {"a": 1, "z": 2}) == [{"op": "add", "path": "/z", "value": 2}]
+
+
+def test_cold_and_warm_reads_serialize_alike(temp_db):
+    plan = db.add_plan("Order", json.dumps(_input(0)), json.dumps(_output(0)), owner_id=None)
+    outputs = {1: _output(0)}
+    for v in range(2, 5):
+        out = {"summary": f"v{v}", **_output(v - 1)}  # new key ahead of existing ones
+        outputs[v] = out
+        db.create_plan_version(plan["id"], v, _input(v - 1), out, diff=None)
+
+    warm = {v: json.dumps(db.get_plan_version(plan["id"], v)["output"]) for v in outputs}
+    db._PLAN_VERSION_CACHE.clear()
+    cold = {v: json.dumps(db.get_plan_version(plan["id"], v)["output"]) for v in outputs}
+
+    assert cold == warm == {v: json.dumps(out) for v, out in outputs.items()}
+
+
+def test_versions_stored_as_keyframes_and_deltas(temp_db):
+    plan_id = _make_plan(12)
+
+    storage = _storage(plan_id)
+    assert [v for v, kind in storage.items() if kind == "full"] == [1, 6, 11]
+
+
+def test_reconstruction_is_transparent(temp_db):
+    plan_id = _make_plan(12)
+    db._PLAN_VERSION_CACHE.clear()
+
+    for v in range(1, 13):
+        got = db.get_plan_version(plan_id, v)
+        assert got["input"] == _input(v - 1)
+        assert got["output"] == _output(v - 1)
+
+    latest = db.get_latest_plan_version(plan_id)
+    assert latest["version"] == 12
+    assert latest["diff"] == {"n": 12}
+
+    db._PLAN_VERSION_CACHE.clear()
+    listed = db.list_plan_versions(plan_id)
+    assert [it["version"] for it in listed] == list(range(12, 0, -1))
+    assert all(it["input"] == _input(it["version"] - 1) for it in listed)
+
+
+def test_returned_versions_are_copies(temp_db):
+    plan_id = _make_plan(3)
+
+    db.get_plan_version(plan_id, 3)["output"]["weekly_split"].clear()
+
+    assert db.get_plan_version(plan_id, 3)["output"] == _output(2)
+
+
+def test_compaction_converts_full_rows(temp_db):
+    plan_id = _make_plan(1)
+    with db._conn() as conn:
+        for v in range(2, 9):
+            conn.execute(
+                "INSERT INTO plan_versions(plan_id, version, input_json, output_json) VALUES (?, ?, ?, ?)",
+                (plan_id, v, json.dumps(_input(v - 1)), json.dumps(_output(v - 1))),
+            )
+
+    stats = db.compact_plan_versions(keyframe_interval=4)
+
+    assert stats["versions"] == 8
+    assert stats["bytes_after"] < stats["bytes_before"]
+    assert [v for v, kind in _storage(plan_id).items() if kind == "full"] == [1, 5]
+    assert db.get_plan_version(plan_id, 8)["input"] == _input(7)
+    assert db.compact_plan_versions(keyframe_interval=4)["bytes_after"] == stats["bytes_after"]
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from deps import get_current_user
+from main import app
+from models.plans import extract_restore_meta
+from services import db
+
+
+@pytest.fixture()
+def plan_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "versions_page.db")
+    db.init_db()
+    with db._conn() as conn:
+        conn.execute("INSERT INTO users(id, email) VALUES (1, 'pages@example.com')")
+    plan = db.add_plan("Paged", json.dumps({"n": 1}), json.dumps({"weekly_split": []}), owner_id=1)
+    for v in range(2, 8):
+        diff = {"restored_from": 2} if v == 5 else {
+            "replaced_exercises": [{"from": "A", "to": "B"}] * (v % 3),
+            "removed_exercises": [],
+            "added_exercises": [{"name": "C"}],
+        }
+        db.create_plan_version(plan["id"], v, {"n": v}, {"weekly_split": [], "v": v}, diff=diff)
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1, "email": "pages@example.com"}
+    try:
+        yield TestClient(app), plan["id"]
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+
+def test_keyset_pages_walk_all_versions(plan_client):
+    client, plan_id = plan_client
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["before_version"] = cursor
+        body = client.get(f"/plans/{plan_id}/versions", params=params).json()
+        seen += [it["version"] for it in body["items"]]
+        assert all(it["input"] == {"n": it["version"]} for it in body["items"])
+        cursor = body["next_before_version"]
+        if cursor is None:
+            break
+
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_summary_view_skips_payloads(plan_client):
+    client, plan_id = plan_client
+
+    items = client.get(f"/plans/{plan_id}/versions", params={"view": "summary"}).json()["items"]
+
+    assert [it["version"] for it in items] == [7, 6, 5, 4, 3, 2, 1]
+    assert all("input" not in it and "output" not in it for it in items)
+    by_version = {it["version"]: it for it in items}
+    assert by_version[5]["is_restored"] is True and by_version[5]["restored_from"] == 2
+    assert by_version[4]["diff_summary"] == {"replaced": 1, "removed": 0, "added": 1}
+    assert by_version[1]["diff_summary"] == {"replaced": 0, "removed": 0, "added": 0}
+
+
+def test_single_version_fetched_on_demand(plan_client):
+    client, plan_id = plan_client
+
+    got = client.get(f"/plans/{plan_id}/versions/5").json()
+    assert got["input"] == {"n": 5}
+    assert got["is_restored"] is True
+
+    assert client.get(f"/plans/{plan_id}/versions/99").status_code == 404
+
+
+def test_unpaged_listing_unchanged(plan_client):
+    client, plan_id = plan_client
+
+    body = client.get(f"/plans/{plan_id}/versions").json()
+
+    assert [it["version"] for it in body["items"]] == [7, 6, 5, 4, 3, 2, 1]
+    assert body["next_before_version"] is None
+
+
+@pytest.mark.parametrize("restored_from", [3, "4", None, {"v": 1}, "x"])
+def test_summary_restore_meta_matches_full_view(monkeypatch, tmp_path, restored_from):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "restore_meta.db")
+    db.init_db()
+    plan = db.add_plan("R", json.dumps({"n": 1}), json.dumps({"weekly_split": []}))
+    db.create_plan_version(plan["id"], 2, {"n": 2}, {"weekly_split": []}, diff={"restored_from": restored_from})
+
+    summary = db.list_plan_version_summaries(plan["id"])[0]
+    full = db.list_plan_versions(plan["id"])[0]
+    assert (summary["is_restored"], summary["restored_from"]) == extract_restore_meta(full["diff"])
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import pytest
+
+from models.plans import DayPlan, ExerciseItem, GeneratePlanRequest, GeneratePlanResponse
+from routes.rules import engine
+from routes.rules.context import RuleContext
+from routes.rules.engine import _allowed_for_equipment, apply_rules_v1
+from routes.rules.exercise_catalog import EXERCISES
+
+
+def _req(**kw):
+    base = dict(
+        constraints="",
+        equipment="full_gym",
+        focus_muscles=None,
+        session_minutes=60,
+        avoid=[],
+        constraints_tokens=[],
+        preferences_tokens=[],
+    )
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+@pytest.mark.parametrize(
+    "kw, expected",
+    [
+        (dict(constraints="No dumbbells please"), {"no_dumbbells"}),
+        (dict(constraints="BANS: no_barbells"), {"no_barbells"}),
+        (dict(constraints="machines only"), {"prefer_machines"}),
+        (dict(preferences_tokens=["prefer_cables"]), {"prefer_cables"}),
+        (dict(avoid=["Shoulders"]), {"avoid_shoulders"}),
+        (dict(constraints="avoid shoulder"), {"avoid_shoulders"}),
+        (dict(equipment="dumbbells"), {"no_barbells"}),
+        (dict(equipment="bodyweight"), {"no_barbells", "no_dumbbells"}),
+        (dict(constraints="no dumbbellsx"), set()),
+    ],
+)
+def test_flags_parsed_from_text_tokens_avoid_and_equipment(kw, expected):
+    ctx = RuleContext.build(_req(**kw))
+    names = ("no_dumbbells", "no_barbells", "prefer_machines", "prefer_cables", "avoid_shoulders")
+    assert {n for n in names if getattr(ctx, n)} == expected
+
+
+def test_equipment_mask_matches_name_check_and_focus_is_expanded():
+    names = list(EXERCISES) + ["DB Lateral Raise", "Mystery Move", "ez bar curl"]
+    for equipment in ("full_gym", "dumbbells", "bodyweight"):
+        ctx = RuleContext.build(_req(equipment=equipment))
+        for name in names:
+            assert ctx.allows(name) == _allowed_for_equipment(name, equipment), (equipment, name)
+
+    ctx = RuleContext.build(_req(focus_muscles=["Arms", "glutes"]))
+    assert {"biceps", "triceps", "glutes"} <= ctx.focus_set
+
+
+def test_context_built_once_per_apply(monkeypatch):
+    calls = []
+    real_build = RuleContext.build.__func__
+
+    def counting_build(cls, req, has_sharms=False):
+        calls.append(req)
+        return real_build(cls, req, has_sharms)
+
+    monkeypatch.setattr(engine.RuleContext, "build", classmethod(counting_build))
+    plan = GeneratePlanResponse(
+        title="T",
+        summary="",
+        weekly_split=[
+            DayPlan(
+                day="Day 1",
+                focus="Upper",
+                warmup=[],
+                main=[ExerciseItem(name="Barbell Bench Press", sets=3, reps="6-8", rest_seconds=240)],
+                accessories=[],
+            )
+        ],
+    )
+    req = GeneratePlanRequest(days_per_week=5, constraints="no barbells, avoid shoulders", equipment="dumbbells")
+    apply_rules_v1(plan, req)
+    assert len(calls) == 1
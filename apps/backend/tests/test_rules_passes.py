@@ -0,0 +1,86 @@
+from models.plans import DayPlan, ExerciseItem, GeneratePlanRequest, GeneratePlanResponse
+from routes.rules.engine import apply_rules_v1
+from routes.rules.passes import DayJob, PassRunner, RulePass, RuleTrace
+
+
+def _day() -> DayPlan:
+    return DayPlan(
+        day="Day 1",
+        focus="Upper",
+        warmup=[],
+        main=[ExerciseItem(name="Barbell Bench Press", sets=3, reps="6-8", rest_seconds=240, notes="")],
+        accessories=[ExerciseItem(name="Cable Curl", sets=3, reps="8-12", rest_seconds=180, notes="")],
+    )
+
+
+def _plan() -> GeneratePlanResponse:
+    return GeneratePlanResponse(title="T", summary="", weekly_split=[_day()])
+
+
+def _rename(name: str) -> RulePass:
+    def run(job):
+        job.day.main[0].name = name
+    return RulePass(f"rename_{name}", run, reads=frozenset({"exercises"}), idempotent=True)
+
+
+def test_trace_does_not_change_output_and_counts_every_pass():
+    req = GeneratePlanRequest(days_per_week=4, session_minutes=45, equipment="dumbbells")
+    plain = apply_rules_v1(_plan(), req)
+
+    trace = RuleTrace()
+    traced = apply_rules_v1(_plan(), req, trace=trace)
+    assert traced.model_dump() == plain.model_dump()
+
+    # 4 training days, none CHEST_BACK: strict equipment is scheduled 5x and dedupe 3x per day
+    strict = trace.passes["strict_equipment"]
+    dedupe = trace.passes["dedupe"]
+    assert strict.runs + strict.skips == 5 * 4
+    assert dedupe.runs + dedupe.skips == 3 * 4
+    assert strict.skips > 0
+    assert trace.passes["session_minutes"].runs == 2 * 4
+
+    summary = trace.as_dict()
+    assert set(summary["passes"]["template"]) == {"runs", "skips", "changes", "ms"}
+    assert summary["converged"] is None
+
+
+def test_idempotent_pass_skipped_until_its_inputs_change():
+    calls = []
+
+    def count(job):
+        calls.append(job.day.main[0].name)
+
+    counted = RulePass("count", count, reads=frozenset({"exercises"}), idempotent=True)
+    sets_only = RulePass("sets", lambda job: setattr(job.day.main[0], "sets", 2))
+    trace = RuleTrace()
+    runner = PassRunner(DayJob(_day(), None, "UPPER_A"), trace)
+
+    runner.run_all([counted, sets_only, counted, _rename("Chest Press"), counted])
+
+    # the volume change is not an input; the rename is
+    assert calls == ["Barbell Bench Press", "Chest Press"]
+    assert trace.passes["count"].runs == 2
+    assert trace.passes["count"].skips == 1
+
+
+def test_fixed_point_converges_and_detects_oscillation():
+    trace = RuleTrace()
+    runner = PassRunner(DayJob(_day(), None, "UPPER_A"), trace)
+    assert runner.run_to_fixed_point([_rename("Chest Press")], max_rounds=4)
+    assert trace.fixed_point_rounds == 2 and trace.converged is True
+
+    trace = RuleTrace()
+    runner = PassRunner(DayJob(_day(), None, "UPPER_A"), trace)
+    assert not runner.run_to_fixed_point([_rename("Chest Press"), _rename("Push-Ups")], max_rounds=3)
+    assert trace.fixed_point_rounds == 3 and trace.converged is False
+
+
+def test_fixed_point_mode_keeps_hard_constraints_stable():
+    req = GeneratePlanRequest(days_per_week=3, session_minutes=60, equipment="dumbbells")
+    base = apply_rules_v1(_plan(), req)
+    trace = RuleTrace()
+    fixed = apply_rules_v1(_plan(), req, trace=trace, fixed_point=True)
+
+    assert trace.converged is True
+    assert trace.fixed_point_rounds == 1
+    assert fixed.model_dump() == base.model_dump()
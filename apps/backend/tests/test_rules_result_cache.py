@@ -0,0 +1,120 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from models.plans import DayPlan, ExerciseItem, GeneratePlanRequest, GeneratePlanResponse
+from routes.rules import result_cache
+from routes.rules.engine import apply_rules_v1
+from services import db
+from services.lru_cache import LRUCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    result_cache.clear_rules_cache()
+    yield
+    result_cache.clear_rules_cache()
+
+
+def _plan() -> GeneratePlanResponse:
+    return GeneratePlanResponse(
+        title="T",
+        summary="",
+        weekly_split=[
+            DayPlan(
+                day="Day 1",
+                focus="Upper",
+                warmup=[],
+                main=[
+                    ExerciseItem(name="Barbell Bench Press", sets=3, reps="6-8", rest_seconds=240, notes=""),
+                    ExerciseItem(name="Barbell Row", sets=3, reps="6-8", rest_seconds=240, notes=""),
+                ],
+                accessories=[ExerciseItem(name="Dumbbell Curl", sets=2, reps="8-12", rest_seconds=180, notes="")],
+            )
+        ],
+    )
+
+
+def _req(**kw):
+    fields = GeneratePlanRequest().model_dump()
+    fields.update(kw.pop("fields", {}))
+    return SimpleNamespace(**fields, **{"avoid": [], "constraints_tokens": [], "preferences_tokens": [], **kw})
+
+
+def test_hit_returns_private_copy_of_engine_result():
+    req = _req(avoid=["shoulders"], preferences_tokens=["prefer_cables"])
+    expected = apply_rules_v1(_plan(), req).model_dump()
+    before = result_cache.rules_cache_stats()
+
+    first = result_cache.cached_apply_rules(_plan(), req)
+    second = result_cache.cached_apply_rules(_plan(), req)
+    assert first.model_dump() == second.model_dump() == expected
+
+    second.weekly_split[0].main[0].name = "Mutated"
+    third = result_cache.cached_apply_rules(_plan(), req)
+    assert third.model_dump() == expected
+
+    after = result_cache.rules_cache_stats()
+    assert after["hits"] - before["hits"] == 2
+    assert after["misses"] - before["misses"] == 1
+
+
+def test_key_covers_effective_request_fields():
+    key = result_cache.rules_cache_key
+    base = key(_plan(), _req(constraints_tokens=["no_barbells", "no_dumbbells"]))
+
+    # the engine only tests token membership
+    assert key(_plan(), _req(constraints_tokens=["no_dumbbells", "no_barbells"])) == base
+
+    assert key(_plan(), _req(constraints_tokens=["no_barbells"])) != base
+    assert key(_plan(), _req(constraints_tokens=["no_barbells", "no_dumbbells"], avoid=["shoulders"])) != base
+    assert key(_plan(), _req(constraints_tokens=["no_barbells", "no_dumbbells"], fields={"session_minutes": 45})) != base
+
+    other_plan = _plan()
+    other_plan.weekly_split[0].main[0].sets = 2
+    assert key(other_plan, _req(constraints_tokens=["no_barbells", "no_dumbbells"])) != base
+
+    # a strict request without Phase 1 lists keys like empty lists
+    assert key(_plan(), GeneratePlanRequest()) == key(_plan(), _req())
+
+
+def test_evicts_by_size(monkeypatch):
+    monkeypatch.setattr(result_cache, "_CACHE", LRUCache(maxsize=2))
+    for minutes in (30, 45, 60):
+        result_cache.cached_apply_rules(_plan(), _req(fields={"session_minutes": minutes}))
+
+    stats = result_cache.rules_cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+
+
+@pytest.fixture()
+def isolated_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "rules_cache.db")
+    db.init_db()
+    with db._conn() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO users(id, email, password_hash, email_verified) VALUES (1, 'rules-cache@example.com', 'x', 1)"
+        )
+
+
+def test_repeat_apply_on_same_plan_version_hits_cache(isolated_db, client):
+    inp = GeneratePlanRequest().model_dump()
+    inp.update({"constraints_tokens": [], "preferences_tokens": [], "avoid": [], "base_constraints_text": "", "chat_history": []})
+    out = apply_rules_v1(_plan(), GeneratePlanRequest()).model_dump()
+    ids = [
+        db.add_plan(title="T", input_json=json.dumps(inp), output_json=json.dumps(out), owner_id=1)["id"]
+        for _ in range(2)
+    ]
+    patch = {"preferences_add": ["prefer_cables"], "avoid": ["shoulders"]}
+
+    before = result_cache.rules_cache_stats()
+    r1 = client.post(f"/plans/{ids[0]}/apply", json=patch)
+    r2 = client.post(f"/plans/{ids[1]}/apply", json=patch)
+    assert r1.status_code == r2.status_code == 200, (r1.text, r2.text)
+    assert r1.json()["output"] == r2.json()["output"]
+
+    after = result_cache.rules_cache_stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
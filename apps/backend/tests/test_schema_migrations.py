@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from services import db
+
+
+@pytest.fixture()
+def db_path(monkeypatch, tmp_path):
+    path = tmp_path / "migrations.db"
+    monkeypatch.setattr(db, "DB_PATH", path)
+    return path
+
+
+def _applied_versions() -> list[int]:
+    with db._conn() as conn:
+        return [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+
+
+def test_fresh_database_applies_every_step_once(db_path):
+    db.init_db()
+    db.init_db()
+
+    assert _applied_versions() == [v for v, _ in db.MIGRATIONS]
+
+
+def test_current_schema_is_a_single_version_check(db_path):
+    db.init_db()
+    statements: list[str] = []
+    with db._conn() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        db.init_db()
+    finally:
+        with db._conn() as conn:
+            conn.set_trace_callback(None)
+
+    assert [s for s in statements if "schema_version" in s] == statements
+    assert len(statements) == 1
+
+
+def test_legacy_database_is_upgraded(db_path):
+    legacy = sqlite3.connect(db_path)
+    legacy.executescript(
+        """
+        CREATE TABLE plans(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            title TEXT NOT NULL,
+            input_json TEXT NOT NULL,
+            output_json TEXT NOT NULL
+        );
+        CREATE TABLE users(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now'))
+        );
+        CREATE TABLE sessions(
+            token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
+            expires_at TEXT
+        );
+        INSERT INTO users(email) VALUES ('legacy@example.com');
+        INSERT INTO sessions(token, user_id) VALUES ('legacy-token', 1);
+        """
+    )
+    legacy.commit()
+    legacy.close()
+
+    db.init_db()
+
+    assert "owner_id" in db.table_columns("plans")
+    assert {"active_plan_id", "password_hash", "email_verified"} <= db.table_columns("users")
+    with db._conn() as conn:
+        cols = {r["name"]: r["notnull"] for r in conn.execute("PRAGMA table_info(sessions);")}
+        expires_at = conn.execute(
+            "SELECT expires_at FROM sessions WHERE token = 'legacy-token'"
+        ).fetchone()
+    assert cols["expires_at"] == 1
+    assert expires_at is not None
+    assert _applied_versions()[-1] == db.SCHEMA_VERSION
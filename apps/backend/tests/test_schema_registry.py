@@ -0,0 +1,48 @@
+import pytest
+
+from services import db
+
+
+@pytest.fixture()
+def temp_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "schema_registry.db")
+    db.init_db()
+    return tmp_path
+
+
+def _trace_statements():
+    statements: list[str] = []
+    with db._conn() as conn:
+        conn.set_trace_callback(statements.append)
+    return statements
+
+
+def _stop_trace():
+    with db._conn() as conn:
+        conn.set_trace_callback(None)
+
+
+def test_registry_caches_columns_after_init(temp_db):
+    assert "owner_id" in db.table_columns("plans")
+    assert {"active_plan_id", "password_hash", "email_verified"} <= db.table_columns("users")
+    assert db.table_columns("missing_table") == frozenset()
+
+
+def test_plan_reads_skip_table_info(temp_db):
+    plan = db.add_plan("Registry", "{}", "{}", owner_id=None)
+    statements = _trace_statements()
+    try:
+        db.list_plans(owner_id=1)
+        db.get_plan(plan["id"])
+    finally:
+        _stop_trace()
+
+    assert not any("table_info" in s for s in statements)
+    assert sum(1 for s in statements if s.lstrip().upper().startswith("SELECT")) == 2
+
+
+def test_invalidate_forces_reintrospection(temp_db):
+    db.table_columns("plans")
+    db.invalidate_schema()
+    assert db._SCHEMA is None
+    assert "owner_id" in db.table_columns("plans")
@@ -0,0 +1,101 @@
+import pytest
+
+from services import db
+
+
+@pytest.fixture()
+def temp_db(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "session_cache.db")
+    db.init_db()
+    db._SESSION_CACHE.clear()
+    yield
+    db._SESSION_CACHE.clear()
+
+
+def _user(email: str = "cache@example.com") -> int:
+    return db.get_or_create_user(email)["id"]
+
+
+def test_repeat_lookup_is_served_from_cache(temp_db):
+    token = db.create_session(_user())
+    before = db.session_cache_stats()
+
+    first = db.get_user_by_session(token)
+    leases = db.pool_stats()["leases"]
+    second = db.get_user_by_session(token)
+
+    after = db.session_cache_stats()
+    assert first == second == {"id": first["id"], "email": "cache@example.com"}
+    assert db.pool_stats()["leases"] == leases
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+
+def test_logout_invalidates_cached_session(temp_db):
+    token = db.create_session(_user())
+    assert db.get_user_by_session(token)
+
+    db.delete_session(token)
+
+    assert db.get_user_by_session(token) is None
+
+
+def test_user_wide_invalidation(temp_db):
+    user_id = _user()
+    other_id = _user("other@example.com")
+    tokens = [db.create_session(user_id) for _ in range(2)]
+    other = db.create_session(other_id)
+    for t in tokens + [other]:
+        assert db.get_user_by_session(t)
+
+    db.delete_all_sessions_for_user(user_id)
+
+    assert all(db.get_user_by_session(t) is None for t in tokens)
+    assert db.get_user_by_session(other)["id"] == other_id
+
+
+def test_delete_user_invalidates_cached_sessions(temp_db):
+    user_id = _user()
+    token = db.create_session(user_id)
+    assert db.get_user_by_session(token)
+
+    db.delete_user(user_id)
+
+    assert db.get_user_by_session(token) is None
+
+
+def test_cached_entry_respects_session_expiry(temp_db):
+    user_id = _user()
+    token = db.create_session(user_id)
+    assert db.get_user_by_session(token)
+
+    with db._conn() as conn:
+        conn.execute(
+            "UPDATE sessions SET expires_at = '2000-01-01T00:00:00Z' WHERE token = ?",
+            (token,),
+        )
+    # Force the cached expiry into the past as well.
+    cached = db._SESSION_CACHE.get(token)
+    db._SESSION_CACHE.put(token, (cached[0], cached[1], cached[2].replace(year=2000)))
+
+    assert db.get_user_by_session(token) is None
+
+
+def test_invalidation_between_db_read_and_cache_put_wins(temp_db, monkeypatch):
+    user_id = _user()
+    token = db.create_session(user_id)
+    other = db.create_session(_user("other@example.com"))
+    real_cache_session = db._cache_session
+
+    def invalidate_then_cache(*args):
+        # password change lands after the miss read the row, before the put
+        db.update_password_hash(user_id, "new-hash")
+        real_cache_session(*args)
+
+    monkeypatch.setattr(db, "_cache_session", invalidate_then_cache)
+    assert db.get_user_by_session(token)["id"] == user_id
+    assert db.get_user_by_session(other)
+
+    assert db._SESSION_CACHE.get(token) is None
+    # other users' entries are still cached
+    assert db._SESSION_CACHE.get(other) is not None